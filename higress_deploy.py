@@ -6,29 +6,1996 @@ Higress EKS Deployment CLI Tool
 
 import click
 import yaml
+import asyncio
+import base64
 import subprocess
+import functools
+import gzip
+import hashlib
+import itertools
 import json
+import math
+import os
+import re
+import threading
 import time
 import sys
+import shutil
+import random
+import tarfile
+import tempfile
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+
+# 在 eksctl ClusterConfig 中声明的托管 addon，随集群创建并行安装
+EKS_ADDONS = ['vpc-cni', 'coredns', 'kube-proxy', 'aws-ebs-csi-driver']
+
+# ALB Controller v2.7.0 官方策略中缺失的 ELB 权限
+ALB_ADDITIONAL_PERMISSIONS = [
+    "elasticloadbalancing:DescribeListenerAttributes",
+    "elasticloadbalancing:ModifyListenerAttributes",
+    "elasticloadbalancing:DescribeListenerCertificates",
+    "elasticloadbalancing:ModifyListenerCertificates"
+]
+
+# 外部制品：固定版本，下载后按 SHA-256 内容寻址缓存，校验和记录在 artifacts.lock.json
+# version 为 None 时首次使用会解析为最新版本并写入锁文件，之后一直使用锁定的版本
+ARTIFACTS = {
+    'alb-iam-policy': {
+        'type': 'url',
+        'version': 'v2.7.0',
+        'url': 'https://raw.githubusercontent.com/kubernetes-sigs/aws-load-balancer-controller/{version}/docs/install/iam_policy.json'
+    },
+    'ebs-csi-iam-policy': {
+        'type': 'url',
+        'version': 'v1.28.0',
+        'url': 'https://raw.githubusercontent.com/kubernetes-sigs/aws-ebs-csi-driver/{version}/docs/example-iam-policy.json'
+    },
+    'aws-load-balancer-controller-chart': {
+        'type': 'helm',
+        'version': '1.7.0',
+        'repo_url': 'https://aws.github.io/eks-charts',
+        'chart': 'aws-load-balancer-controller'
+    },
+    'aws-node-termination-handler-chart': {
+        'type': 'helm',
+        'version': '0.21.0',
+        'repo_url': 'https://aws.github.io/eks-charts',
+        'chart': 'aws-node-termination-handler'
+    },
+    'higress-chart': {
+        'type': 'helm',
+        'version': None,
+        'repo_url': 'https://higress.io/helm-charts',
+        'chart': 'higress'
+    },
+}
+
+# 预检使用的服务配额代码
+QUOTA_EC2_STANDARD_VCPU = 'L-1216C47A'   # Running On-Demand Standard instances (vCPU)
+QUOTA_EC2_SPOT_VCPU = 'L-34B43A08'       # All Standard Spot Instance Requests (vCPU)
+QUOTA_ALB_PER_REGION = 'L-53DA6B97'      # Application Load Balancers per Region
+QUOTA_EIP_PER_REGION = 'L-0263D0A3'      # EC2-VPC Elastic IPs
+
+# 支持的可用区数量范围
+MIN_AZ_COUNT = 2
+MAX_AZ_COUNT = 6
+
+# 子网可用区缓存文件（子网所属可用区创建后不会改变，可以长期缓存）
+SUBNET_AZ_CACHE_FILE = 'subnet-azs.json'
+
+# 镜像预热 DaemonSet 需要从 Chart 中提取镜像的核心工作负载
+PREWARM_WORKLOADS = ['higress-gateway', 'higress-controller']
+# 预热容器不依赖目标镜像中的 shell：先从该镜像把静态链接的 busybox 复制到 emptyDir，
+# 再以 true 的名字执行（busybox 按 argv[0] 选择命令），distroless 镜像同样适用
+PREWARM_TOOLS_IMAGE = 'public.ecr.aws/docker/library/busybox:1.36.1-musl'
+PREWARM_TOOLS_DIR = '/prewarm-tools'
+
+# Spot 节点组：默认实例类型（同架构、相近规格，分散容量池降低同时回收的概率）、容量类型标签和污点
+# 只有容忍该污点的 Console/监控组件会调度到 Spot 节点，Gateway 和 Controller 固定在按需节点
+SPOT_INSTANCE_TYPES = ['m6i.large', 'm6a.large', 'm5.large', 'm5a.large', 'm7i.large']
+CAPACITY_TYPE_LABEL = 'eks.amazonaws.com/capacityType'
+SPOT_NODE_TAINT = 'higress.io/spot'
+
+# CPU 架构：Kubernetes 架构名，以及 Graviton 实例族（c7g、m7g、c6gn、t4g 等，实例族代数后带 g）
+ARCHITECTURES = ['amd64', 'arm64']
+GRAVITON_FAMILY_PATTERN = re.compile(r'^(a1|[a-z]+\d+[a-z]*g[a-z]*)\.')
+
+# 镜像仓库 API 接受的清单类型（多架构索引和单架构清单）
+IMAGE_MANIFEST_MEDIA_TYPES = [
+    'application/vnd.oci.image.index.v1+json',
+    'application/vnd.docker.distribution.manifest.list.v2+json',
+    'application/vnd.oci.image.manifest.v1+json',
+    'application/vnd.docker.distribution.manifest.v2+json',
+]
+
+# 优先级类层级：gateway > controller > console > monitoring > headroom
+# 数值越大越优先调度；preemptionPolicy 为 Never 的工作负载不会抢占其他 Pod
+PRIORITY_CLASSES = {
+    'higress-gateway': (1000000, 'PreemptLowerPriority', 'Higress Gateway，承载业务流量'),
+    'higress-controller': (900000, 'PreemptLowerPriority', 'Higress Controller，下发网关配置'),
+    'higress-console': (500000, 'Never', 'Higress Console'),
+    'higress-monitoring': (100000, 'Never', '监控组件（Prometheus、Grafana、Loki）'),
+    'higress-headroom': (-10, 'Never', '扩容预留占位 Pod，随时可被抢占'),
+}
+
+# 监控存储：gp3 基线性能和可配置范围（吞吐量不能超过 IOPS x 0.25 MiB/s）、卷绑定模式
+GP3_BASELINE = {'iops': 3000, 'throughput': 125}
+GP3_LIMITS = {'iops': (3000, 16000), 'throughput': (125, 1000)}
+VOLUME_BINDING_MODES = ['WaitForFirstConsumer', 'Immediate']
+STORAGE_CLASS_FILE = 'higress-storage-classes.yaml'
+
+# Prometheus/Loki 容量估算：每个样本的磁盘字节数、WAL 中每个样本的字节数、日志压缩比、
+# 压缩/WAL/突发写入的余量系数，以及默认的负载假设（与原先固定的 20Gi、15 天 / 24 小时相当）
+PROMETHEUS_BYTES_PER_SAMPLE = 2
+PROMETHEUS_WAL_BYTES_PER_SAMPLE = 16
+LOKI_COMPRESSION_RATIO = 5
+STORAGE_HEADROOM = 1.3
+STORAGE_BURST_FACTOR = 2
+STORAGE_MIN_GI = 20
+STORAGE_IO_KIB = 16  # WAL 和 chunk 刷盘的典型 IO 大小，用于估算 IOPS
+MONITORING_STORAGE_DEFAULTS = {
+    'prometheus': {'active_series': 100000, 'scrape_interval': '15s', 'retention': '15d'},
+    'loki': {'log_lines_per_second': 200, 'avg_line_bytes': 400, 'retention': '24h'},
+}
+
+# 带持久卷的监控组件资源默认值：内存 request 等于 limit，节点内存压力时不会被优先驱逐
+MONITORING_RESOURCES = {
+    'grafana': {
+        'requests': {'cpu': '100m', 'memory': '256Mi'},
+        'limits': {'cpu': '500m', 'memory': '256Mi'}
+    },
+    'prometheus': {
+        'requests': {'cpu': '500m', 'memory': '2Gi'},
+        'limits': {'cpu': '1000m', 'memory': '2Gi'}
+    },
+    'loki': {
+        'requests': {'cpu': '250m', 'memory': '1Gi'},
+        'limits': {'cpu': '1000m', 'memory': '1Gi'}
+    }
+}
+
+# 监控档位（monitoring.profile）：采集间隔、保留时长、丢弃的高基数 Envoy 指标、Loki 写入限速和访问日志采样比例
+# perf-report 用到的指标（downstream_rq_total/xx、upstream_rq_time_bucket、downstream_cx_active）在所有档位都保留
+ENVOY_DROP_METRICS_STANDARD = [
+    'envoy_cluster_(lb|circuit_breakers|outlier_detection|health_check|membership|update|assignment|bind|'
+    'original_dst|version|init|warming)_.*',
+    'envoy_cluster_manager_.*',
+    'envoy_listener_manager_.*',
+    'envoy_server_(initialization|dynamic_unknown|static_unknown|compilation)_.*',
+]
+ENVOY_DROP_METRICS_MINIMAL = ENVOY_DROP_METRICS_STANDARD + [
+    'envoy_cluster_upstream_cx_.*',
+    'envoy_cluster_upstream_rq_(retry|timeout|pending|cancelled|tx_reset|rx_reset|per_try)_.*',
+    'envoy_http_downstream_(cx_length_ms|rq_time)_bucket',
+    'envoy_listener_.*',
+]
+MONITORING_PROFILES = {
+    'minimal': {
+        'scrape_interval': '60s', 'retention': '3d', 'drop_metrics': ENVOY_DROP_METRICS_MINIMAL,
+        'loki_ingestion_rate_mb': 4, 'loki_ingestion_burst_mb': 8, 'access_log_sampling': 0.01
+    },
+    'standard': {
+        'scrape_interval': '30s', 'retention': '7d', 'drop_metrics': ENVOY_DROP_METRICS_STANDARD,
+        'loki_ingestion_rate_mb': 8, 'loki_ingestion_burst_mb': 16, 'access_log_sampling': 0.1
+    },
+    'full': {
+        'scrape_interval': '15s', 'retention': '15d', 'drop_metrics': [],
+        'loki_ingestion_rate_mb': 16, 'loki_ingestion_burst_mb': 32, 'access_log_sampling': 1.0
+    },
+}
+MONITORING_DEFAULT_PROFILE = 'full'  # 与未引入档位前的行为一致
+MONITORING_BUDGET_PERCENT = 5  # 监控组件 CPU request 占节点总 CPU 的上限
+
+# 每个节点预留的子网 IP 数（VPC CNI 会为 Pod 预热分配 IP）
+PREFLIGHT_IPS_PER_NODE = 30
+
+# perf-report：Prometheus 服务（higress-console 随 o11y 部署）和报表指标
+PROMETHEUS_SERVICE = 'higress-console-prometheus:9090'
+PROMETHEUS_PATH_PREFIX = '/prometheus'
+PERF_METRICS = ['rps', 'p50_ms', 'p99_ms', 'rps_5xx', 'error_ratio', 'active_connections', 'cpu_throttled_ratio']
+
+# Controller 规格（higress.controller）：路由数量多时需要更多 CPU 计算和下发 xDS；
+# pilot 的去抖和推送并发参数映射到对应的环境变量
+CONTROLLER_DEFAULTS = {
+    'replicas': 2, 'cpu_request': '500m', 'memory_request': '1Gi', 'cpu_limit': '1000m', 'memory_limit': '2Gi'
+}
+PILOT_ENV_OPTIONS = {
+    'debounce_after': 'PILOT_DEBOUNCE_AFTER',
+    'debounce_max': 'PILOT_DEBOUNCE_MAX',
+    'push_throttle': 'PILOT_PUSH_THROTTLE',
+}
+
+# config-latency：标记路由（按路径匹配，转发到 Console）和探测使用的 Gateway 端口
+CONFIG_LATENCY_INGRESS = 'higress-config-latency'
+CONFIG_LATENCY_FILE = 'higress-config-latency.yaml'
+CONFIG_LATENCY_PATH_PREFIX = '/higress-config-latency'
+CONFIG_LATENCY_BACKEND = ('higress-console', 8080)
+GATEWAY_HTTP_PORT = 80
+
+# routes sync：server-side apply 的字段管理者、标记同步集合的标签（--prune 只删除带该标签的对象）和默认批次
+ROUTE_SYNC_FIELD_MANAGER = 'higress-deploy'
+ROUTE_SYNC_LABEL = 'higress.io/route-set'
+ROUTE_SYNC_HASH_ANNOTATION = 'higress.io/route-sync-hash'  # 上次同步的对象内容哈希，用于发现删除的字段
+ROUTE_SYNC_RESOURCES = ['ingress.networking.k8s.io']  # prune 时始终按集合标签检查的类型
+ROUTE_SYNC_RECORD_NAMESPACE = 'higress-system'  # 记录每个路由集合同步过的类型的 ConfigMap 所在命名空间
+ROUTE_SYNC_BATCH_SIZE = 200
+ROUTE_SYNC_CONCURRENCY = 4
+
+# logs analyze：分位数草图精度、路由数量上限（超出的路由计入 (other)，保证内存有界）
+LOG_SKETCH_RELATIVE_ACCURACY = 0.01
+LOG_SKETCH_MAX_BUCKETS = 2048
+LOG_MAX_ROUTES = 5000
+
+# benchmark：结果库文件，以及比较的指标和更优方向
+BENCHMARK_STORE_FILE = 'benchmarks.jsonl'
+BENCHMARK_METRICS = {'rps': 'higher', 'p50_ms': 'lower', 'p99_ms': 'lower', 'error_ratio': 'lower'}
+BENCHMARK_ERROR_RATIO_THRESHOLD = 0.5  # 错误率上升超过 0.5 个百分点视为回归
+
+# benchmark matrix：候选实例类型（与 test_capcity.py 一致）、专用节点组的名称前缀和污点
+BENCHMARK_CANDIDATE_TYPES = ['m5.large', 'm5.xlarge', 'm6i.large', 'm6i.xlarge', 'm6i.2xlarge',
+                             'm7i.xlarge', 'm7i.2xlarge', 'm7a.xlarge', 'm7g.xlarge', 'm7g.2xlarge', 'c7g.xlarge']
+BENCHMARK_NODEGROUP_PREFIX = 'higress-bench'
+BENCHMARK_NODE_TAINT = 'higress.io/benchmark'
+BENCHMARK_SYSTEM_CPU_MILLICORES = 500  # 节点上为 kubelet 和 DaemonSet 预留的 CPU，其余分给 Gateway
+PRICING_API_REGION = 'us-east-1'
+
+# 离线模拟：场景文件、工作目录和被替换的命令行工具
+SIMULATION_SCENARIO_FILE = 'simulation.example.yaml'
+SIMULATION_DIR = '.higress-sim'
+SIMULATED_TOOLS = ['aws', 'kubectl', 'eksctl', 'helm', 'curl', 'hey']
+
+# AWS Load Balancer Controller 为其创建的负载均衡器、目标组和安全组打的标签
+ELB_OWNER_TAG = 'elbv2.k8s.aws/cluster'
+ELB_STACK_TAGS = ('ingress.k8s.aws/stack', 'service.k8s.aws/stack')
+
+# 删除时等待 AWS 资源真正释放的超时和轮询间隔（秒）
+TEARDOWN_TIMEOUT = 300
+TEARDOWN_POLL_INTERVAL = 5
+
+
+class StepTracer:
+    """记录部署步骤和命令执行的耗时，导出 JSON 时间线和 OTLP 追踪文件"""
+    
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.trace_id = os.urandom(16).hex()
+    
+    def current_span_id(self) -> Optional[str]:
+        """当前线程正在执行的区间 ID，用于把工作线程中的区间挂到调用方下"""
+        stack = getattr(self._local, 'stack', None)
+        return stack[-1]['span_id'] if stack else None
+    
+    @contextmanager
+    def span(self, name: str, kind: str = 'step', parent_id: Optional[str] = None,
+             detached: bool = False, **attributes):
+        """记录一个操作区间；嵌套调用自动建立父子关系
+        
+        detached=True 时区间不入栈，用于同一线程中交错执行的协程，父区间需显式传入。
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        if stack and parent_id is None:
+            parent_id = stack[-1]['span_id']
+        
+        span = {
+            'span_id': os.urandom(8).hex(),
+            'parent_id': parent_id,
+            'name': name,
+            'kind': kind,
+            'start': time.time(),
+            'duration': None,
+            **attributes
+        }
+        if kind == 'command':
+            # 同一步骤内重复执行的同一命令（轮询等待）计为重试
+            with self._lock:
+                span['retries'] = sum(
+                    1 for s in self.spans
+                    if s['kind'] == 'command' and s['name'] == name and s['parent_id'] == parent_id
+                )
+        
+        if not detached:
+            stack.append(span)
+        started = time.monotonic()
+        try:
+            yield span
+        except SystemExit as e:
+            span['error'] = f"SystemExit({e.code})"
+            raise
+        except BaseException as e:
+            span['error'] = type(e).__name__
+            raise
+        finally:
+            span['duration'] = time.monotonic() - started
+            if not detached:
+                stack.pop()
+            with self._lock:
+                self.spans.append(span)
+    
+    def timeline(self) -> List[Dict[str, Any]]:
+        """按开始时间排序的全部区间"""
+        with self._lock:
+            return sorted(self.spans, key=lambda s: s['start'])
+    
+    def slowest(self, count: int = 10) -> List[Dict[str, Any]]:
+        """耗时最长的操作"""
+        return sorted(self.timeline(), key=lambda s: s['duration'], reverse=True)[:count]
+    
+    def export_json(self, path: str):
+        """导出 JSON 时间线"""
+        spans = self.timeline()
+        origin = spans[0]['start'] if spans else 0
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'trace_id': self.trace_id,
+                'spans': [dict(span, offset=span['start'] - origin) for span in spans]
+            }, f, indent=2, ensure_ascii=False)
+    
+    def export_otlp(self, path: str):
+        """导出 OpenTelemetry OTLP/JSON 格式，可直接导入 Jaeger、Tempo 等后端"""
+        otlp_spans = []
+        for span in self.timeline():
+            start_ns = int(span['start'] * 1e9)
+            attributes = []
+            for key, value in span.items():
+                if key in ('span_id', 'parent_id', 'name', 'start', 'duration') or value is None:
+                    continue
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    attributes.append({'key': key, 'value': {'stringValue': str(value)}})
+                elif isinstance(value, int):
+                    attributes.append({'key': key, 'value': {'intValue': str(value)}})
+                else:
+                    attributes.append({'key': key, 'value': {'doubleValue': value}})
+            failed = span.get('error') or span.get('exit_code') not in (None, 0)
+            otlp_span = {
+                'traceId': self.trace_id,
+                'spanId': span['span_id'],
+                'name': span['name'],
+                'kind': 1,
+                'startTimeUnixNano': str(start_ns),
+                'endTimeUnixNano': str(start_ns + int(span['duration'] * 1e9)),
+                'attributes': attributes,
+                'status': {'code': 2 if failed else 1}
+            }
+            if span['parent_id']:
+                otlp_span['parentSpanId'] = span['parent_id']
+            otlp_spans.append(otlp_span)
+        
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'resourceSpans': [{
+                    'resource': {
+                        'attributes': [{'key': 'service.name', 'value': {'stringValue': 'higress-deploy'}}]
+                    },
+                    'scopeSpans': [{'scope': {'name': 'higress-deploy'}, 'spans': otlp_spans}]
+                }]
+            }, f, indent=2, ensure_ascii=False)
+
+
+# 全局追踪器：同一次 CLI 调用中的所有部署器共享
+TRACER = StepTracer()
+
+
+def traced_step(func):
+    """将部署步骤记录为追踪区间"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with TRACER.span(func.__name__, kind='step'):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+@dataclass
+class CommandResult:
+    """异步命令执行结果"""
+    argv: List[str]
+    returncode: Optional[int]
+    stdout: str
+    stderr: str
+    duration: float
+    timed_out: bool = False
+    
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+    
+    def check(self) -> 'CommandResult':
+        """失败时抛出 CommandError，成功时返回自身"""
+        if not self.ok:
+            raise CommandError(self)
+        return self
+
+
+class CommandError(Exception):
+    """命令执行失败"""
+    
+    def __init__(self, result: CommandResult):
+        self.result = result
+        if result.timed_out:
+            reason = "超时"
+        else:
+            reason = f"退出码 {result.returncode}"
+        super().__init__(f"{' '.join(result.argv)}（{reason}）")
+
+
+class AsyncCommandRunner:
+    """基于 asyncio 的命令执行器
+    
+    直接执行 argv 列表（不经过 shell），逐行输出 stdout/stderr 并加上步骤前缀，
+    支持单次调用超时、任务取消，以及全局并发上限。失败时返回结果对象而不是退出进程。
+    """
+    
+    READ_CHUNK_BYTES = 65536
+    
+    def __init__(self, max_concurrency: int = 8, stream: bool = True):
+        self.max_concurrency = max_concurrency
+        self.stream = stream
+        self._semaphores = {}
+    
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Semaphore 与事件循环绑定，每个事件循环各自创建一个
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+    
+    async def _pump(self, stream: asyncio.StreamReader, lines: List[str], prefix: str, err: bool, echo: bool,
+                    log=None):
+        """逐行读取输出，边读边打印
+        
+        按块读取后自行切分行，不受 StreamReader.readline 的 64 KiB 行长限制（单行 JSON 响应可能很长）。
+        """
+        def emit(raw: bytes):
+            text = raw.decode('utf-8', errors='replace')
+            lines.append(text)
+            if log:
+                log.write(text + '\n')
+                log.flush()
+            if echo:
+                click.echo(f"{prefix}{text}", err=err)
+        
+        pending = b''
+        while True:
+            chunk = await stream.read(self.READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            pending += chunk
+            *complete, pending = pending.split(b'\n')
+            for raw in complete:
+                emit(raw)
+        if pending:
+            emit(pending)
+    
+    async def run(self, argv: List[str], step: Optional[str] = None, timeout: Optional[float] = None,
+                  stream: Optional[bool] = None, parent_id: Optional[str] = None,
+                  cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+                  log_path: Optional[str] = None) -> CommandResult:
+        """执行一条命令；被取消时会终止子进程后再向上传播 CancelledError
+        
+        log_path 不为空时，stdout/stderr 同时逐行写入该日志文件。
+        """
+        echo = self.stream if stream is None else stream
+        prefix = f"[{step}] " if step else ''
+        stdout_lines, stderr_lines = [], []
+        log = open(log_path, 'a', encoding='utf-8') if log_path else None
+        
+        async with self._semaphore():
+            with TRACER.span(' '.join(argv), kind='command', parent_id=parent_id, detached=True) as span:
+                started = time.monotonic()
+                if echo:
+                    click.echo(f"{prefix}执行: {' '.join(argv)}")
+                try:
+                    process = await asyncio.create_subprocess_exec(
+                        *argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                        cwd=cwd, env=env
+                    )
+                except FileNotFoundError:
+                    span['exit_code'] = 127
+                    if log:
+                        log.close()
+                    return CommandResult(argv, 127, '', f"{argv[0]}: command not found",
+                                         time.monotonic() - started)
+                
+                timed_out = False
+                read_error = None
+                try:
+                    await asyncio.wait_for(asyncio.gather(
+                        self._pump(process.stdout, stdout_lines, prefix, False, echo, log),
+                        self._pump(process.stderr, stderr_lines, prefix, True, echo, log),
+                        process.wait()
+                    ), timeout)
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    process.kill()
+                    await process.wait()
+                except (asyncio.LimitOverrunError, ValueError) as e:
+                    # 读取输出失败时终止子进程，返回失败结果而不是抛出异常
+                    read_error = f"读取命令输出失败: {e}"
+                    if process.returncode is None:
+                        process.kill()
+                    await process.wait()
+                except asyncio.CancelledError:
+                    process.kill()
+                    await process.wait()
+                    raise
+                finally:
+                    if log:
+                        log.close()
+                
+                if read_error:
+                    stderr_lines.append(read_error)
+                result = CommandResult(
+                    argv=argv,
+                    returncode=process.returncode if not read_error else (process.returncode or 1),
+                    stdout='\n'.join(stdout_lines),
+                    stderr='\n'.join(stderr_lines),
+                    duration=time.monotonic() - started,
+                    timed_out=timed_out
+                )
+                span['exit_code'] = result.returncode
+                span['output_bytes'] = len(result.stdout) + len(result.stderr)
+                if timed_out:
+                    span['error'] = 'TimeoutExpired'
+                elif read_error:
+                    span['error'] = 'OutputReadError'
+                return result
+    
+    async def run_all(self, commands: List[Tuple[str, List[str]]], timeout: Optional[float] = None,
+                      stream: Optional[bool] = None) -> List[CommandResult]:
+        """并发执行多条 (步骤名, argv) 命令，按输入顺序返回结果"""
+        parent_id = TRACER.current_span_id()
+        return await asyncio.gather(*[
+            self.run(argv, step=step, timeout=timeout, stream=stream, parent_id=parent_id)
+            for step, argv in commands
+        ])
+
+
+class StatusDashboard:
+    """基于 kubectl watch 事件的实时状态面板
+    
+    每类资源保持一个长连接 watch，收到事件后只重绘发生变化的行；
+    ALB 目标健康无法 watch，按固定间隔轮询一次。
+    """
+    
+    WATCHES = [
+        ('nodes', None),
+        ('pods', 'higress-system'),
+        ('hpa', 'higress-system'),
+        ('ingresses', 'higress-system'),
+        ('events', 'higress-system'),
+    ]
+    EVENT_ROWS = 6
+    TARGET_HEALTH_INTERVAL = 30
+    
+    def __init__(self, deployer: 'HigressDeployer'):
+        self.deployer = deployer
+        self.state = {resource: {} for resource, _ in self.WATCHES}
+        self.targets = {}
+        self._lines = []
+        self._changed = None
+    
+    @staticmethod
+    def _decode_stream(buffer: str, decoder: json.JSONDecoder) -> Tuple[List[Any], str]:
+        """从缓冲区中解析出所有完整的 JSON 对象，返回 (对象列表, 剩余内容)"""
+        objects = []
+        buffer = buffer.lstrip()
+        while buffer:
+            try:
+                obj, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                break
+            objects.append(obj)
+            buffer = buffer[end:].lstrip()
+        return objects, buffer
+    
+    def apply_event(self, resource: str, event: Dict[str, Any]):
+        """把一个 watch 事件合并到本地状态"""
+        obj = event.get('object', {})
+        key = obj.get('metadata', {}).get('name')
+        if not key:
+            return
+        if event.get('type') == 'DELETED':
+            self.state[resource].pop(key, None)
+        else:
+            self.state[resource][key] = obj
+    
+    def _hpa_rows(self) -> List[str]:
+        rows = []
+        for name, hpa in sorted(self.state['hpa'].items()):
+            spec, status = hpa.get('spec', {}), hpa.get('status', {})
+            targets = {
+                m['resource']['name']: m['resource']['target'].get('averageUtilization')
+                for m in spec.get('metrics', []) if m.get('type') == 'Resource'
+            }
+            current = {
+                m['resource']['name']: m['resource']['current'].get('averageUtilization')
+                for m in status.get('currentMetrics') or [] if m.get('type') == 'Resource'
+            }
+            metrics = '  '.join(
+                f"{metric} {current.get(metric, '?')}%/{target}%" for metric, target in sorted(targets.items())
+            )
+            rows.append(
+                f"  {name:30} 副本 {status.get('currentReplicas', 0)}/{status.get('desiredReplicas', 0)} "
+                f"(min {spec.get('minReplicas', 1)}, max {spec.get('maxReplicas', '?')})  {metrics}"
+            )
+        return rows
+    
+    def render(self) -> List[str]:
+        """根据当前状态生成面板的所有行"""
+        summary = HigressDeployer._summarize_resources(
+            list(self.state['nodes'].values()) + list(self.state['pods'].values())
+            + list(self.state['ingresses'].values())
+        )
+        lines = [f"Higress 实时状态  {time.strftime('%H:%M:%S')}  (Ctrl+C 退出)", '']
+        
+        ready_nodes = sum(1 for node in summary['nodes'] if node['ready'])
+        lines.append(f"【节点】 {ready_nodes}/{len(summary['nodes'])} Ready")
+        for node in sorted(summary['nodes'], key=lambda n: n['name']):
+            ready = 'Ready' if node['ready'] else 'NotReady'
+            lines.append(f"  {node['name']:45} {ready:9} {node['instance_type']:13} {node['arch']:6} {node['zone']}")
+        
+        running = sum(1 for pod in summary['pods'] if pod['phase'] == 'Running')
+        lines.append(f"【Pods】 {running}/{len(summary['pods'])} Running")
+        for pod in sorted(summary['pods'], key=lambda p: p['name']):
+            lines.append(f"  {pod['name']:55} {pod['ready']:5} {pod['phase'] or '':10} 重启 {pod['restarts']}")
+        
+        lines.append("【HPA】")
+        lines.extend(self._hpa_rows())
+        
+        lines.append("【Ingress / ALB 目标】")
+        for ingress in sorted(summary['ingresses'], key=lambda i: i['name']):
+            lines.append(f"  {ingress['name']:30} {ingress['hostname']}")
+        for target, health in sorted(self.targets.items()):
+            lines.append(f"    {target:40} {health}")
+        
+        lines.append("【最近事件】")
+        events = sorted(
+            self.state['events'].values(),
+            key=lambda e: e.get('lastTimestamp') or e.get('eventTime') or ''
+        )[-self.EVENT_ROWS:]
+        for event in events:
+            involved = event.get('involvedObject', {})
+            lines.append(
+                f"  {event.get('type', ''):8} {event.get('reason', ''):20} "
+                f"{involved.get('kind', '')}/{involved.get('name', '')}: {event.get('message', '')[:80]}"
+            )
+        return lines
+    
+    def redraw(self):
+        """只重写发生变化的行（ANSI 光标定位）"""
+        lines = self.render()
+        output = []
+        for row, line in enumerate(lines):
+            if row >= len(self._lines) or self._lines[row] != line:
+                output.append(f"\033[{row + 1};1H{line}\033[K")
+        if len(lines) < len(self._lines):
+            output.append(f"\033[{len(lines) + 1};1H\033[J")
+        if output:
+            sys.stdout.write(''.join(output))
+            sys.stdout.flush()
+        self._lines = lines
+    
+    async def _watch(self, resource: str, namespace: Optional[str]):
+        """保持一个 kubectl watch 进程，连接断开后自动重连"""
+        argv = ['kubectl', 'get', resource, '--watch', '--output-watch-events', '-o', 'json']
+        if namespace:
+            argv += ['-n', namespace]
+        decoder = json.JSONDecoder()
+        while True:
+            process = await asyncio.create_subprocess_exec(
+                *argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+            )
+            # 重连时 kubectl 会重新发送全部对象的 ADDED 事件
+            self.state[resource] = {}
+            buffer = ''
+            try:
+                while True:
+                    chunk = await process.stdout.read(65536)
+                    if not chunk:
+                        break
+                    events, buffer = self._decode_stream(buffer + chunk.decode('utf-8', errors='replace'), decoder)
+                    for event in events:
+                        self.apply_event(resource, event)
+                    if events:
+                        self._changed.set()
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                await process.wait()
+            await asyncio.sleep(1)
+    
+    async def _poll_target_health(self):
+        """定期查询 ALB 目标组健康状态"""
+        region = self.deployer.config['aws']['region']
+        target_groups = []
+        while True:
+            hostname = next((
+                (ingress.get('status', {}).get('loadBalancer', {}).get('ingress') or [{}])[0].get('hostname')
+                for ingress in self.state['ingresses'].values()
+            ), None)
+            if hostname and not target_groups:
+                lbs = await self.deployer.runner.run(
+                    ['aws', 'elbv2', 'describe-load-balancers', '--region', region, '--output', 'json'],
+                    timeout=15, stream=False
+                )
+                if lbs.ok:
+                    arn = next((lb['LoadBalancerArn'] for lb in json.loads(lbs.stdout)['LoadBalancers']
+                                if lb['DNSName'] == hostname), None)
+                    if arn:
+                        tgs = await self.deployer.runner.run(
+                            ['aws', 'elbv2', 'describe-target-groups', '--load-balancer-arn', arn,
+                             '--region', region, '--output', 'json'], timeout=15, stream=False
+                        )
+                        if tgs.ok:
+                            target_groups = [tg['TargetGroupArn'] for tg in json.loads(tgs.stdout)['TargetGroups']]
+            
+            targets = {}
+            results = await asyncio.gather(*[
+                self.deployer.runner.run(
+                    ['aws', 'elbv2', 'describe-target-health', '--target-group-arn', arn,
+                     '--region', region, '--output', 'json'], timeout=15, stream=False
+                ) for arn in target_groups
+            ])
+            for result in results:
+                if not result.ok:
+                    continue
+                for description in json.loads(result.stdout)['TargetHealthDescriptions']:
+                    target = description['Target']
+                    targets[f"{target['Id']}:{target.get('Port', '')}"] = description['TargetHealth']['State']
+            if targets != self.targets:
+                self.targets = targets
+                self._changed.set()
+            await asyncio.sleep(self.TARGET_HEALTH_INTERVAL)
+    
+    async def _main(self):
+        self._changed = asyncio.Event()
+        tasks = [asyncio.create_task(self._watch(resource, namespace)) for resource, namespace in self.WATCHES]
+        tasks.append(asyncio.create_task(self._poll_target_health()))
+        sys.stdout.write("\033[2J")
+        try:
+            while True:
+                # 没有事件时每秒刷新一次时钟行，事件密集时合并为最多每 0.2 秒重绘一次
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=1)
+                except asyncio.TimeoutError:
+                    pass
+                self._changed.clear()
+                self.redraw()
+                await asyncio.sleep(0.2)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def run(self):
+        if not shutil.which('kubectl'):
+            click.echo("✗ kubectl 未安装", err=True)
+            sys.exit(1)
+        try:
+            asyncio.run(self._main())
+        except KeyboardInterrupt:
+            sys.stdout.write(f"\033[{len(self._lines) + 1};1H\n")
+
+
+class ArtifactError(Exception):
+    """制品下载或校验失败"""
+
+
+class ArtifactCache:
+    """本地制品缓存：按 SHA-256 内容寻址存储，锁文件固定版本和校验和
+    
+    目录结构：<root>/sha256/<hash>/<文件名>。离线模式下只使用缓存，不访问网络。
+    fleet 通过环境变量把清单目录下的缓存目录和锁文件（绝对路径）传给各集群的子进程，
+    所有集群共用同一份缓存和版本锁定。
+    """
+    
+    ENV_ROOT = 'HIGRESS_CACHE_DIR'
+    ENV_LOCK_FILE = 'HIGRESS_LOCK_FILE'
+    
+    def __init__(self, root: str = '.higress-cache', lock_file: str = 'artifacts.lock.json',
+                 offline: bool = False, pinned: Optional[Dict[str, str]] = None):
+        self.root = Path(root)
+        self.lock_file = Path(lock_file)
+        self.offline = offline
+        self.pinned = pinned or {}
+        self._lock = self._load_lock()
+    
+    def _load_lock(self) -> Dict[str, Dict[str, str]]:
+        if not self.lock_file.exists():
+            return {}
+        with open(self.lock_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _save_lock(self):
+        with open(self.lock_file, 'w', encoding='utf-8') as f:
+            json.dump(self._lock, f, indent=2, sort_keys=True)
+            f.write('\n')
+    
+    @staticmethod
+    def _sha256(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def key(name: str, version: Optional[str]) -> str:
+        return f"{name}@{version or 'latest'}"
+    
+    def _cached_path(self, entry: Dict[str, str]) -> Path:
+        return self.root / 'sha256' / entry['sha256'] / entry['file']
+    
+    def _fetch(self, spec: Dict[str, Any], version: Optional[str], workdir: Path) -> Tuple[Path, Optional[str]]:
+        """下载制品到临时目录，返回 (文件路径, 实际版本)"""
+        if spec['type'] == 'url':
+            url = spec['url'].format(version=version)
+            dest = workdir / url.rsplit('/', 1)[-1]
+            result = subprocess.run(['curl', '-fsSL', '--max-time', '30', '-o', str(dest), url],
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                raise ArtifactError(f"下载 {url} 失败: {result.stderr.strip() or result.returncode}")
+            return dest, version
+        
+        # helm pull --repo 直接从仓库地址下载，不需要 helm repo add/update
+        cmd = ['helm', 'pull', spec['chart'], '--repo', spec['repo_url'], '-d', str(workdir)]
+        if version:
+            cmd += ['--version', version]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+        if result.returncode != 0:
+            raise ArtifactError(f"helm pull {spec['chart']} 失败: {result.stderr.strip()}")
+        dest = next(workdir.glob('*.tgz'))
+        # 文件名形如 higress-2.0.0.tgz，从中解析实际版本
+        resolved = dest.name[len(spec['chart']) + 1:-len('.tgz')]
+        return dest, resolved
+    
+    def get(self, name: str, version: Optional[str] = None, refresh: bool = False) -> Path:
+        """获取制品的本地路径；缓存缺失时下载并校验"""
+        spec = ARTIFACTS[name]
+        version = version or spec['version']
+        key = self.key(name, version)
+        entry = self._lock.get(key)
+        
+        if entry and not refresh:
+            path = self._cached_path(entry)
+            if path.exists():
+                if self._sha256(path) != entry['sha256']:
+                    raise ArtifactError(f"{key} 缓存文件校验失败: {path}")
+                return path
+        
+        if self.offline:
+            raise ArtifactError(f"{key} 不在本地缓存中（离线模式），请先运行 artifacts prefetch")
+        
+        # 多个 fleet 子进程共用锁文件：下载前加锁并重新读取，先到的进程解析出的版本由其余进程复用
+        import fcntl
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._lock = self._load_lock()
+            entry = self._lock.get(key)
+            if entry and not refresh:
+                path = self._cached_path(entry)
+                if path.exists() and self._sha256(path) == entry['sha256']:
+                    return path
+            return self._download(spec, key, version, entry, refresh)
+    
+    def _download(self, spec: Dict[str, Any], key: str, version: Optional[str],
+                  entry: Optional[Dict[str, str]], refresh: bool) -> Path:
+        """下载制品、校验并写入缓存和锁文件（调用方持有锁）"""
+        with tempfile.TemporaryDirectory() as tmp:
+            downloaded, resolved = self._fetch(spec, entry['version'] if entry and not refresh else version, Path(tmp))
+            sha256 = self._sha256(downloaded)
+            expected = self.pinned.get(key) or (entry['sha256'] if entry and not refresh else None)
+            if expected and sha256 != expected:
+                raise ArtifactError(f"{key} 校验和不匹配: 期望 {expected}，实际 {sha256}")
+            
+            entry = {'sha256': sha256, 'file': downloaded.name, 'version': resolved or ''}
+            path = self._cached_path(entry)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(downloaded), path)
+        
+        self._lock[key] = entry
+        self._save_lock()
+        return path
+    
+    def entry(self, name: str, version: Optional[str] = None) -> Optional[Dict[str, str]]:
+        """锁文件中的记录"""
+        return self._lock.get(self.key(name, version or ARTIFACTS[name]['version']))
+
+
+class CommandSimulator:
+    """离线模拟后端：用假的 aws/kubectl/eksctl/helm/curl 按场景文件回放响应
+    
+    激活后在 .higress-sim/bin 下生成同名可执行脚本并放到 PATH 最前面，因此 shell 命令、
+    异步命令、watch 以及 fleet 子进程都无需修改即可走模拟后端。场景中的每条规则按正则匹配
+    命令行（先匹配先生效），可以配置延迟分布、失败概率，以及相对某个事件的阶段性响应
+    （例如 addon 在集群创建后 90 秒内保持 CREATING）。
+    """
+    
+    ENV_DIR = 'HIGRESS_SIM_DIR'
+    ENV_SCENARIO = 'HIGRESS_SIM_SCENARIO'
+    ENV_TIME_SCALE = 'HIGRESS_SIM_TIME_SCALE'
+    ENV_CONTEXT = 'HIGRESS_SIM_CONTEXT'
+    
+    def __init__(self, scenario_path: str, time_scale: Optional[float] = None, keep_state: bool = False):
+        self.scenario_path = Path(scenario_path).resolve()
+        self.time_scale = time_scale
+        self.keep_state = keep_state
+        # fleet 子进程继承父进程的模拟目录，共用同一次运行的状态
+        self.inherited = bool(os.environ.get(self.ENV_DIR))
+        self.root = Path(os.environ[self.ENV_DIR]) if self.inherited else Path(SIMULATION_DIR).resolve()
+    
+    @classmethod
+    def active(cls) -> bool:
+        return bool(os.environ.get(cls.ENV_DIR))
+    
+    def activate(self):
+        """生成替身脚本并修改当前进程（及其子进程）的 PATH"""
+        if not self.scenario_path.exists():
+            raise click.ClickException(f"模拟场景文件不存在: {self.scenario_path}")
+        bin_dir = self.root / 'bin'
+        bin_dir.mkdir(parents=True, exist_ok=True)
+        module_dir = Path(__file__).resolve().parent
+        for tool in SIMULATED_TOOLS:
+            shim = bin_dir / tool
+            shim.write_text(
+                "#!/bin/sh\n"
+                f"exec \"{sys.executable}\" -c 'import sys; sys.path.insert(0, \"{module_dir}\"); "
+                f"from higress_deploy import simulate_command; sys.exit(simulate_command(sys.argv[1:]))' "
+                f"{tool} \"$@\"\n",
+                encoding='utf-8'
+            )
+            shim.chmod(0o755)
+        
+        # 顶层运行从全新状态开始：调用计数决定随机种子，事件时间决定阶段响应，沿用上次运行的状态
+        # 会改变采样结果，并让所有 since 阶段一开始就已经结束。keep_state 时保留事件（模拟的集群沿用
+        # 上次运行的结果，如先 install-all 再单独 deploy），调用计数仍然清零
+        state_file = self.root / 'state.json'
+        if not self.inherited:
+            if self.keep_state and state_file.exists():
+                state = json.loads(state_file.read_text(encoding='utf-8'))
+                state['calls'] = 0
+                state_file.write_text(json.dumps(state, indent=2), encoding='utf-8')
+            else:
+                state_file.unlink(missing_ok=True)
+        
+        if self.time_scale is None:
+            with open(self.scenario_path, 'r', encoding='utf-8') as f:
+                self.time_scale = (yaml.safe_load(f) or {}).get('time_scale', 1.0)
+        os.environ['PATH'] = f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+        os.environ[self.ENV_DIR] = str(self.root)
+        os.environ[self.ENV_SCENARIO] = str(self.scenario_path)
+        os.environ[self.ENV_TIME_SCALE] = str(self.time_scale)
+        click.echo(f"⚠ 模拟模式：命令由场景 {self.scenario_path.name} 回放，不会访问 AWS", err=True)
+    
+    @classmethod
+    def sleep(cls, seconds: float):
+        """部署流程中的等待：模拟模式下按 --sim-time-scale 缩放，与回放的命令延迟保持一致"""
+        if cls.active():
+            seconds *= float(os.environ.get(cls.ENV_TIME_SCALE) or 1.0)
+        time.sleep(seconds)
+    
+    @classmethod
+    def set_context(cls, config: Dict[str, Any]):
+        """把集群配置传给替身脚本，用于填充响应模板中的 ${cluster_name} 等变量"""
+        account_id = str(config.get('aws', {}).get('account_id', '')).strip()
+        vpc = config.get('vpc', {})
+        os.environ[cls.ENV_CONTEXT] = json.dumps({
+            'cluster_name': config.get('eks', {}).get('cluster_name', 'higress-cluster'),
+            'region': config.get('aws', {}).get('region', 'us-east-1'),
+            'account_id': account_id if account_id.isdigit() else '123456789012',
+            'vpc_id': vpc.get('vpc_id', 'vpc-simulated'),
+            'instance_type': config.get('eks', {}).get('instance_type', ''),
+            'public_subnets': vpc.get('public_subnets', []),
+            'private_subnets': vpc.get('private_subnets', []),
+        })
+
+
+def _simulation_sample_latency(spec: Any, rng: random.Random) -> float:
+    """按场景中的延迟描述采样一次延迟（秒）"""
+    if spec is None:
+        return 0.0
+    if isinstance(spec, (int, float)):
+        return float(spec)
+    dist = spec.get('dist', 'fixed')
+    if dist == 'uniform':
+        value = rng.uniform(spec['min'], spec['max'])
+    elif dist == 'normal':
+        value = rng.gauss(spec['mean'], spec.get('stddev', 0))
+    elif dist == 'lognormal':
+        value = spec['median'] * math.exp(rng.gauss(0, spec.get('sigma', 0.5)))
+    elif dist == 'exponential':
+        value = rng.expovariate(1 / spec['mean'])
+    else:
+        value = spec.get('value', 0)
+    return max(0.0, value)
+
+
+def _simulation_options(argv: List[str]) -> Dict[str, str]:
+    """把 argv 中的选项解析为字典（支持 --name value 和 --name=value）"""
+    options = {}
+    for i, arg in enumerate(argv):
+        if not arg.startswith('-'):
+            continue
+        if '=' in arg:
+            key, value = arg.split('=', 1)
+            options[key] = value
+        elif i + 1 < len(argv) and not argv[i + 1].startswith('-'):
+            options[arg] = argv[i + 1]
+        else:
+            options[arg] = ''
+    return options
+
+
+def _simulation_render(template: str, argv: List[str], context: Dict[str, Any]) -> str:
+    """填充响应模板：${cluster_name} 等上下文变量、${opt:--name} 选项值、${arg:N} 位置参数"""
+    options = _simulation_options(argv)
+    
+    def replace(match):
+        key, param = match.group(1), match.group(2)
+        if key == 'opt':
+            return options.get(param, '')
+        if key == 'arg':
+            index = int(param)
+            return argv[index] if index < len(argv) else ''
+        return str(context.get(key, match.group(0)))
+    
+    return re.sub(r'\$\{(\w+)(?::([^}]*))?\}', replace, template)
+
+
+def _simulate_describe_subnets(argv: List[str], context: Dict[str, Any], params: Dict[str, Any],
+                               rng: random.Random) -> str:
+    """按请求的子网 ID 生成 describe-subnets 响应，可用区轮流分配"""
+    subnet_ids = []
+    for arg in argv[argv.index('--subnet-ids') + 1:] if '--subnet-ids' in argv else []:
+        if arg.startswith('-'):
+            break
+        subnet_ids.append(arg)
+    
+    subnets = []
+    for group in ('public_subnets', 'private_subnets'):
+        for index, subnet_id in enumerate(context.get(group, [])):
+            if subnet_id in subnet_ids:
+                subnets.append({
+                    'SubnetId': subnet_id,
+                    'VpcId': context.get('vpc_id'),
+                    'AvailabilityZone': f"{context.get('region')}{'abcdef'[index % 6]}",
+                    'AvailableIpAddressCount': 4000
+                })
+    return json.dumps({'Subnets': subnets})
+
+
+def _simulate_helm_pull(argv: List[str], context: Dict[str, Any], params: Dict[str, Any],
+                        rng: random.Random) -> str:
+    """在 -d 指定的目录生成一个最小的 Chart 包"""
+    options = _simulation_options(argv)
+    chart = argv[2]
+    version = options.get('--version') or '0.0.0-sim'
+    dest = Path(options.get('-d', '.')) / f"{chart}-{version}.tgz"
+    with tempfile.TemporaryDirectory() as tmp:
+        chart_dir = Path(tmp) / chart
+        chart_dir.mkdir()
+        (chart_dir / 'Chart.yaml').write_text(
+            f"apiVersion: v2\nname: {chart}\nversion: {version}\n", encoding='utf-8'
+        )
+        with tarfile.open(dest, 'w:gz') as tar:
+            tar.add(chart_dir, arcname=chart)
+    return ''
+
+
+def _simulate_download(argv: List[str], context: Dict[str, Any], params: Dict[str, Any],
+                       rng: random.Random) -> str:
+    """curl -o：写入一个最小的 IAM 策略文档"""
+    policy = {
+        'Version': '2012-10-17',
+        'Statement': [{
+            'Effect': 'Allow',
+            'Action': ['elasticloadbalancing:DescribeLoadBalancers', 'ec2:DescribeSubnets'],
+            'Resource': '*'
+        }]
+    }
+    Path(_simulation_options(argv)['-o']).write_text(json.dumps(policy, indent=2), encoding='utf-8')
+    return ''
+
+
+def _simulate_hey(argv: List[str], context: Dict[str, Any], params: Dict[str, Any],
+                  rng: random.Random) -> str:
+    """生成 hey 的汇总输出；rps/p50_ms/p99_ms 可以是数值或按实例类型的字典（default 为缺省值）"""
+    def pick(key, default):
+        value = params.get(key, default)
+        if isinstance(value, dict):
+            value = value.get(context.get('instance_type'), value.get('default', default))
+        return value
+    
+    noise = params.get('noise', 0.03)
+    duration = HigressDeployer._parse_go_duration(_simulation_options(argv).get('-z', '30s')) or 30.0
+    rps = max(1.0, rng.gauss(pick('rps', 5000), pick('rps', 5000) * noise))
+    p50 = max(0.1, rng.gauss(pick('p50_ms', 8), pick('p50_ms', 8) * noise)) / 1000
+    p99 = max(p50, rng.gauss(pick('p99_ms', 45), pick('p99_ms', 45) * noise) / 1000)
+    total = int(rps * duration)
+    errors = int(total * params.get('error_ratio', 0.0005))
+    return (
+        f"\nSummary:\n  Total:\t{duration:.4f} secs\n  Slowest:\t{p99 * 3:.4f} secs\n"
+        f"  Fastest:\t{p50 / 5:.4f} secs\n  Average:\t{p50 * 1.2:.4f} secs\n  Requests/sec:\t{rps:.4f}\n\n"
+        f"Latency distribution:\n  10% in {p50 * 0.5:.4f} secs\n  50% in {p50:.4f} secs\n"
+        f"  90% in {p99 * 0.6:.4f} secs\n  99% in {p99:.4f} secs\n\n"
+        f"Status code distribution:\n  [200]\t{total - errors} responses\n  [503]\t{errors} responses\n"
+    )
+
+
+def _simulate_describe_instance_types(argv: List[str], context: Dict[str, Any], params: Dict[str, Any],
+                                     rng: random.Random) -> str:
+    """按实例规格推算 vCPU 数（large=2、xlarge=4、Nxlarge=4N），按实例族推断架构"""
+    instance_types = []
+    for arg in argv[argv.index('--instance-types') + 1:] if '--instance-types' in argv else []:
+        if arg.startswith('-'):
+            break
+        instance_types.append(arg)
+    
+    def vcpus(instance_type):
+        size = instance_type.split('.')[-1]
+        if size == 'large':
+            return 2
+        match = re.match(r'(\d*)xlarge$', size)
+        return 4 * int(match.group(1) or 1) if match else 1
+    
+    return json.dumps({'InstanceTypes': [
+        {'InstanceType': t, 'VCpuInfo': {'DefaultVCpus': params.get('vcpus', {}).get(t, vcpus(t))},
+         'ProcessorInfo': {'SupportedArchitectures': [
+             'arm64' if _instance_architecture(t) == 'arm64' else 'x86_64'
+         ]}}
+        for t in instance_types
+    ]})
+
+
+def _simulate_pricing(argv: List[str], context: Dict[str, Any], params: Dict[str, Any],
+                      rng: random.Random) -> str:
+    """按 params.prices 生成 Pricing API 的按需价格；未配置的实例类型返回空列表"""
+    match = re.search(r'Field=instanceType,Value=(\S+)', ' '.join(argv))
+    price = params.get('prices', {}).get(match.group(1)) if match else None
+    if price is None:
+        return json.dumps({'PriceList': []})
+    product = {'terms': {'OnDemand': {'SIM': {'priceDimensions': {'SIM.HOURLY': {
+        'unit': 'Hrs', 'pricePerUnit': {'USD': f"{price:.10f}"}
+    }}}}}}
+    return json.dumps({'PriceList': [json.dumps(product)]})
+
+
+def _simulate_helm_release_json(argv: List[str], context: Dict[str, Any], params: Dict[str, Any],
+                                rng: random.Random) -> str:
+    """helm upgrade --dry-run -o json：按 params.manifest 生成 Release 的 JSON"""
+    return json.dumps({'name': 'higress', 'info': {'status': 'pending-upgrade'}, 'manifest': params.get('manifest', '')})
+
+
+# 场景规则可以通过 handler 引用这些内置响应生成器，处理需要根据参数动态生成的输出
+SIMULATION_HANDLERS = {
+    'describe-subnets': _simulate_describe_subnets,
+    'helm-pull': _simulate_helm_pull,
+    'download': _simulate_download,
+    'hey': _simulate_hey,
+    'describe-instance-types': _simulate_describe_instance_types,
+    'pricing': _simulate_pricing,
+    'helm-release-json': _simulate_helm_release_json,
+}
+
+
+def simulate_command(argv: List[str]) -> int:
+    """替身脚本的入口：按场景规则回放一条命令，返回退出码"""
+    import fcntl
+    
+    with open(os.environ[CommandSimulator.ENV_SCENARIO], 'r', encoding='utf-8') as f:
+        scenario = yaml.safe_load(f) or {}
+    time_scale = float(os.environ.get(CommandSimulator.ENV_TIME_SCALE) or scenario.get('time_scale', 1.0))
+    context = json.loads(os.environ.get(CommandSimulator.ENV_CONTEXT) or '{}')
+    command = ' '.join(argv)
+    
+    rule_index, rule = next(
+        ((index, rule) for index, rule in enumerate(scenario.get('rules', []))
+         if re.search(rule['match'], command)),
+        (-1, {})
+    )
+    
+    # 状态文件记录调用次数和事件时间，多个命令可能并发执行，读写时加锁
+    state_dir = Path(os.environ[CommandSimulator.ENV_DIR])
+    state_dir.mkdir(parents=True, exist_ok=True)
+    with open(state_dir / 'state.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        state_file = state_dir / 'state.json'
+        state = json.loads(state_file.read_text(encoding='utf-8')) if state_file.exists() else {}
+        state['calls'] = state.get('calls', 0) + 1
+        first_seen = state.setdefault('first_seen', {}).setdefault(str(rule_index), time.time())
+        state_file.write_text(json.dumps(state, indent=2), encoding='utf-8')
+    
+    rng = random.Random(f"{scenario.get('seed', 0)}:{state['calls']}")
+    
+    # 阶段响应：since 事件发生后按经过的时间选择最后一个已到达的阶段；未指定 since 时从首次调用开始计时
+    response = dict(rule)
+    if 'phases' in rule:
+        since = rule.get('since')
+        started = state.get('events', {}).get(since) if since else first_seen
+        if started is not None:
+            elapsed = (time.time() - started) / time_scale if time_scale > 0 else float('inf')
+            for phase in rule['phases']:
+                if elapsed >= phase.get('after', 0):
+                    response.update(phase)
+    
+    if rng.random() < rule.get('failure_rate', 0):
+        response.update({'stdout': '', 'stderr': '', **rule.get('failure', {'exit_code': 1})})
+    
+    time.sleep(_simulation_sample_latency(response.get('latency', scenario.get('default_latency')), rng) * time_scale)
+    
+    stdout = _simulation_render(response.get('stdout', ''), argv, context)
+    if response.get('handler'):
+        stdout = SIMULATION_HANDLERS[response['handler']](argv, context, response.get('params', {}), rng) or stdout
+    if stdout:
+        sys.stdout.write(stdout if stdout.endswith('\n') else stdout + '\n')
+    stderr = _simulation_render(response.get('stderr', ''), argv, context)
+    if stderr:
+        sys.stderr.write(stderr if stderr.endswith('\n') else stderr + '\n')
+    exit_code = int(response.get('exit_code', 0))
+    
+    # 成功的命名规则记录事件时间，供其他规则的 since 引用
+    if rule.get('name') and exit_code == 0:
+        with open(state_dir / 'state.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            state = json.loads((state_dir / 'state.json').read_text(encoding='utf-8'))
+            state.setdefault('events', {})[rule['name']] = time.time()
+            (state_dir / 'state.json').write_text(json.dumps(state, indent=2), encoding='utf-8')
+    return exit_code
+
+
+class QuantileSketch:
+    """DDSketch：相对误差有界、可合并的分位数草图
+    
+    值 x 落入下标为 ceil(log_gamma(x)) 的桶，任意分位数的相对误差不超过 relative_accuracy；
+    桶数超过 max_buckets 时合并最低的桶（只影响最小的分位数）。两个草图按桶相加即可合并。
+    """
+    
+    def __init__(self, relative_accuracy: float = LOG_SKETCH_RELATIVE_ACCURACY,
+                 max_buckets: int = LOG_SKETCH_MAX_BUCKETS):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+    
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= 1e-9:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+    
+    def _collapse(self):
+        keys = sorted(self.buckets)
+        target = keys[len(keys) - self.max_buckets]
+        for key in keys[:len(keys) - self.max_buckets]:
+            self.buckets[target] += self.buckets.pop(key)
+    
+    def merge(self, other: 'QuantileSketch'):
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+    
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+class LogStats:
+    """按路由和上游聚合的请求数、5xx 数和延迟草图，可跨文件合并"""
+    
+    def __init__(self, max_routes: int = LOG_MAX_ROUTES):
+        self.max_routes = max_routes
+        self.routes: Dict[str, Dict[str, Any]] = {}
+        self.upstreams: Dict[str, Dict[str, Any]] = {}
+        self.lines = 0
+        self.skipped = 0
+    
+    @staticmethod
+    def _bucket(table: Dict[str, Dict[str, Any]], key: str, limit: int) -> Dict[str, Any]:
+        if key not in table and len(table) >= limit:
+            key = '(other)'
+        if key not in table:
+            table[key] = {'count': 0, 'errors': 0, 'sketch': QuantileSketch()}
+        return table[key]
+    
+    def add(self, route: str, upstream: str, status: int, latency_ms: Optional[float]):
+        for table, key in ((self.routes, route), (self.upstreams, upstream)):
+            bucket = self._bucket(table, key, self.max_routes)
+            bucket['count'] += 1
+            if status >= 500:
+                bucket['errors'] += 1
+            if latency_ms is not None:
+                bucket['sketch'].add(latency_ms)
+    
+    def merge(self, other: 'LogStats'):
+        self.lines += other.lines
+        self.skipped += other.skipped
+        for table, other_table in ((self.routes, other.routes), (self.upstreams, other.upstreams)):
+            for key, other_bucket in other_table.items():
+                bucket = self._bucket(table, key, self.max_routes)
+                bucket['count'] += other_bucket['count']
+                bucket['errors'] += other_bucket['errors']
+                bucket['sketch'].merge(other_bucket['sketch'])
+    
+    @staticmethod
+    def summarize(table: Dict[str, Dict[str, Any]], min_count: int = 1) -> List[Dict[str, Any]]:
+        rows = []
+        for key, bucket in table.items():
+            if bucket['count'] < min_count:
+                continue
+            sketch = bucket['sketch']
+            quantiles = {f"p{int(q * 100)}_ms": sketch.quantile(q) for q in (0.5, 0.9, 0.99)}
+            rows.append({
+                'name': key,
+                'count': bucket['count'],
+                'error_ratio': round(bucket['errors'] / bucket['count'], 6),
+                **{name: round(value, 3) if value is not None else None for name, value in quantiles.items()},
+                'max_ms': sketch.max if sketch.count else None,
+            })
+        return sorted(rows, key=lambda row: row['p99_ms'] or 0, reverse=True)
+
+
+_LOG_TOKEN = re.compile(r'"[^"]*"|\S+')
+_ENVOY_TEXT_LOG = re.compile(
+    r'^\[[^\]]+\] "(?P<method>\S+) (?P<path>\S+) [^"]*" (?P<code>\d+) \S+ \d+ \d+ (?P<duration>\d+) \S+ '
+    r'"[^"]*" "[^"]*" "[^"]*" "[^"]*" "(?P<upstream>[^"]*)"'
+)
+_ROUTE_ID_SEGMENT = re.compile(r'^(\d+|[0-9a-fA-F-]{16,}|[0-9a-fA-F]{8}-[0-9a-fA-F-]{27})$')
+
+
+def _normalize_route(method: str, url: str) -> str:
+    """METHOD /path：去掉协议、主机和查询参数，数字和 ID 段替换为 {id}，控制路由数量"""
+    path = urllib.parse.urlsplit(url).path if '://' in url else url.split('?', 1)[0]
+    segments = ['{id}' if _ROUTE_ID_SEGMENT.match(segment) else segment for segment in path.split('/')]
+    return f"{method} {'/'.join(segments) or '/'}"
+
+
+def _parse_alb_log_line(line: str) -> Optional[Tuple[str, str, int, Optional[float]]]:
+    """解析 ALB 访问日志，返回 (路由, 上游, 状态码, 延迟毫秒)"""
+    fields = _LOG_TOKEN.findall(line)
+    if len(fields) < 13:
+        return None
+    times = [float(value) for value in fields[5:8]]
+    latency = sum(times) * 1000 if min(times) >= 0 else None
+    request = fields[12].strip('"').split(' ')
+    if len(request) < 2:
+        return None
+    status = int(fields[8]) if fields[8].isdigit() else 0
+    return _normalize_route(request[0], request[1]), fields[4], status, latency
+
+
+def _parse_envoy_log_line(line: str) -> Optional[Tuple[str, str, int, Optional[float]]]:
+    """解析 Higress/Envoy 访问日志（JSON 或 Envoy 默认文本格式）"""
+    if line.startswith('{'):
+        entry = json.loads(line)
+        route = entry.get('route_name') or _normalize_route(entry.get('method', '-'), entry.get('path', '/'))
+        upstream = entry.get('upstream_cluster') or entry.get('upstream_host') or '-'
+        duration = entry.get('duration')
+        return route, upstream, int(entry.get('response_code') or 0), \
+            float(duration) if duration not in (None, '-', '') else None
+    match = _ENVOY_TEXT_LOG.match(line)
+    if not match:
+        return None
+    return _normalize_route(match['method'], match['path']), match['upstream'] or '-', \
+        int(match['code']), float(match['duration'])
+
+
+def _iter_log_lines(path: str):
+    """逐行读取日志文件，按魔数自动识别 gzip 压缩"""
+    with open(path, 'rb') as f:
+        compressed = f.read(2) == b'\x1f\x8b'
+    opener = gzip.open if compressed else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def _iter_log_records(lines, log_format: str = 'auto'):
+    """把日志行解析为 (路由, 上游, 状态码, 延迟毫秒)；无法解析的行产出 None"""
+    for line in lines:
+        if log_format == 'alb' or (log_format == 'auto' and not line.startswith(('{', '['))):
+            parser = _parse_alb_log_line
+        else:
+            parser = _parse_envoy_log_line
+        try:
+            yield parser(line)
+        except (ValueError, KeyError, TypeError, IndexError):
+            yield None
+
+
+def _analyze_log_file(path: str, log_format: str = 'auto', max_routes: int = LOG_MAX_ROUTES) -> LogStats:
+    """分析单个日志文件（进程池 worker）"""
+    stats = LogStats(max_routes)
+    for record in _iter_log_records(_iter_log_lines(path), log_format):
+        stats.lines += 1
+        if record is None:
+            stats.skipped += 1
+            continue
+        stats.add(*record)
+    return stats
+
+
+def _parse_hey_output(output: str) -> Optional[Dict[str, float]]:
+    """从 hey 的汇总输出中提取 RPS、延迟分位数和错误率"""
+    rps = re.search(r'Requests/sec:\s+([\d.]+)', output)
+    if not rps:
+        return None
+    latencies = {int(p): float(v) * 1000 for p, v in re.findall(r'(\d+)% in ([\d.]+) secs', output)}
+    codes = {int(code): int(count) for code, count in re.findall(r'\[(\d{3})\]\s+(\d+) responses', output)}
+    # Error distribution 中的条目是连接错误等没有状态码的失败
+    error_section = output.split('Error distribution:', 1)[1] if 'Error distribution:' in output else ''
+    failures = sum(int(count) for count in re.findall(r'^\s*\[(\d+)\]', error_section, re.MULTILINE))
+    total = sum(codes.values()) + failures
+    bad = sum(count for code, count in codes.items() if code >= 500) + failures
+    return {
+        'rps': float(rps.group(1)),
+        'p50_ms': latencies.get(50),
+        'p99_ms': latencies.get(99),
+        'requests': total,
+        'error_ratio': bad / total if total else 0.0,
+    }
+
+
+def _permutation_pvalue(baseline: List[float], candidate: List[float], better: str) -> Optional[float]:
+    """单侧置换检验：candidate 的均值比 baseline 更差的显著性（p 值）
+    
+    试验次数少时穷举所有分组，否则随机抽样 10000 次；任一侧少于 2 次试验时返回 None。
+    """
+    if len(baseline) < 2 or len(candidate) < 2:
+        return None
+    sign = -1 if better == 'higher' else 1
+    pooled = baseline + candidate
+    n = len(candidate)
+    
+    def worse_by(indices):
+        chosen = set(indices)
+        group = [pooled[i] for i in chosen]
+        rest = [pooled[i] for i in range(len(pooled)) if i not in chosen]
+        return sign * (sum(group) / len(group) - sum(rest) / len(rest))
+    
+    observed = worse_by(range(len(baseline), len(pooled)))
+    if math.comb(len(pooled), n) <= 20000:
+        splits = list(itertools.combinations(range(len(pooled)), n))
+    else:
+        rng = random.Random(0)
+        splits = [rng.sample(range(len(pooled)), n) for _ in range(10000)]
+    extreme = sum(1 for split in splits if worse_by(split) >= observed - 1e-12)
+    return extreme / len(splits)
+
+
+class BenchmarkStore:
+    """基准测试结果库（JSON Lines，每行一次运行），按集群、配置哈希、Chart 版本和实例类型记录"""
+    
+    def __init__(self, path: str = BENCHMARK_STORE_FILE):
+        self.path = Path(path)
+    
+    def append(self, record: Dict[str, Any]):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    
+    def load(self) -> List[Dict[str, Any]]:
+        if not self.path.exists():
+            return []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    
+    def get(self, run_id: str) -> Dict[str, Any]:
+        """按 ID（或唯一前缀）查找运行记录"""
+        matches = [record for record in self.load() if record['id'].startswith(run_id)]
+        if len(matches) != 1:
+            raise click.ClickException(f"{'找不到' if not matches else '存在多个匹配的'}运行记录: {run_id}")
+        return matches[0]
+    
+    @staticmethod
+    def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float = 5.0,
+                alpha: float = 0.05) -> List[Dict[str, Any]]:
+        """逐项比较两次运行；变差超过 threshold% 且置换检验显著时判定为回归
+        
+        任一侧少于 2 次试验时无法做显著性检验，超过阈值的变化标记为 insufficient，不判定为回归。
+        """
+        rows = []
+        for metric, better in BENCHMARK_METRICS.items():
+            base_values = [t[metric] for t in baseline['trials'] if t.get(metric) is not None]
+            cand_values = [t[metric] for t in candidate['trials'] if t.get(metric) is not None]
+            if not base_values or not cand_values:
+                continue
+            base, cand = _median(base_values), _median(cand_values)
+            change = (cand - base) / base * 100 if base else 0.0
+            worse = -change if better == 'higher' else change
+            limit = threshold
+            if metric == 'error_ratio':
+                # 错误率的基数很小，按绝对变化（百分点）判断
+                worse, limit = (cand - base) * 100, BENCHMARK_ERROR_RATIO_THRESHOLD
+            p_value = _permutation_pvalue(base_values, cand_values, better)
+            regression = worse > limit and p_value is not None and p_value < alpha
+            rows.append({
+                'metric': metric, 'baseline': base, 'candidate': cand, 'change_pct': round(change, 2),
+                'p_value': p_value, 'regression': regression,
+                'insufficient': worse > limit and p_value is None
+            })
+        return rows
+
+
+def _parse_retention(value: Any) -> float:
+    """解析 Prometheus 风格的时长（如 15d、36h、1w2d），返回秒数；数字按秒处理"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    units = {'w': 604800, 'd': 86400, 'h': 3600, 'm': 60, 's': 1}
+    parts = re.findall(r'(\d+(?:\.\d+)?)([wdhms])', str(value))
+    if not parts or ''.join(number + unit for number, unit in parts) != str(value).strip():
+        raise ValueError(f"无效的时长: {value}")
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+
+def _format_retention(seconds: float) -> str:
+    """把秒数格式化为 Prometheus/Loki 都接受的时长（整天用 d，否则取整到小时）"""
+    hours = max(1, int(seconds // 3600))
+    return f"{hours // 24}d" if hours % 24 == 0 else f"{hours}h"
+
+
+def _rendered_strings(obj: Any) -> List[str]:
+    """渲染对象中的所有字符串值（含 ConfigMap 内嵌的配置文件和解码后的 Secret data），用于查找设置"""
+    if isinstance(obj, dict):
+        strings = [text for value in obj.values() for text in _rendered_strings(value)]
+        if obj.get('kind') == 'Secret':
+            for value in (obj.get('data') or {}).values():
+                try:
+                    strings.append(base64.b64decode(value).decode('utf-8', errors='replace'))
+                except (ValueError, TypeError):
+                    pass
+        return strings
+    if isinstance(obj, list):
+        return [text for value in obj for text in _rendered_strings(value)]
+    return [obj] if isinstance(obj, str) else []
+
+
+def _size_volume(bytes_per_second: float, retention: Optional[float], size_gi: Optional[int]) -> Tuple[int, float]:
+    """按写入速率计算卷容量（GiB）和保留时长（秒）：给定容量时反推保留时长，否则按保留时长计算容量"""
+    if size_gi:
+        return size_gi, size_gi * 2 ** 30 / STORAGE_HEADROOM / max(bytes_per_second, 1e-9)
+    size = math.ceil(bytes_per_second * retention * STORAGE_HEADROOM / 2 ** 30)
+    return max(STORAGE_MIN_GI, size), retention
+
+
+def _prometheus_storage(active_series: int, scrape_interval: float, retention: Optional[float] = None,
+                        size_gi: Optional[int] = None) -> Dict[str, Any]:
+    """按活跃序列数和采集间隔估算 Prometheus 的卷容量、保留时长和写入吞吐"""
+    samples_per_second = active_series / scrape_interval
+    size, retention = _size_volume(samples_per_second * PROMETHEUS_BYTES_PER_SAMPLE, retention, size_gi)
+    write = samples_per_second * (PROMETHEUS_WAL_BYTES_PER_SAMPLE + PROMETHEUS_BYTES_PER_SAMPLE)
+    return {
+        'size_gi': size,
+        'retention': retention,
+        'write_mib_per_second': write * STORAGE_BURST_FACTOR / 2 ** 20,
+        'write_iops': math.ceil(write * STORAGE_BURST_FACTOR / (STORAGE_IO_KIB * 1024)),
+    }
+
+
+def _loki_storage(lines_per_second: float, avg_line_bytes: int, retention: Optional[float] = None,
+                  size_gi: Optional[int] = None) -> Dict[str, Any]:
+    """按日志速率估算 Loki 的卷容量、保留时长和写入吞吐（WAL 写原始数据，chunk 写压缩后的数据）"""
+    raw = lines_per_second * avg_line_bytes
+    size, retention = _size_volume(raw / LOKI_COMPRESSION_RATIO, retention, size_gi)
+    write = raw * (1 + 1 / LOKI_COMPRESSION_RATIO) * STORAGE_BURST_FACTOR
+    return {
+        'size_gi': size,
+        'retention': retention,
+        'write_mib_per_second': write / 2 ** 20,
+        'write_iops': math.ceil(write / (STORAGE_IO_KIB * 1024)),
+    }
+
+
+def _cpu_millicores(value: Any) -> int:
+    """把 Kubernetes CPU 数量（如 500m、2）转换为毫核"""
+    text = str(value)
+    return int(text[:-1]) if text.endswith('m') else int(float(text) * 1000)
+
+
+def _load_route_documents(sources: List[str], namespace: str) -> Tuple[Dict[Tuple[str, str, str, str], Dict[str, Any]], List[str]]:
+    """读取文件、目录（递归查找 .yaml/.yml/.json）或标准输入（-）中的对象，展开 List
+    
+    返回按 (API 组, kind, 命名空间, 名称) 索引的对象和警告；同一对象出现多次时后出现的生效。
+    """
+    paths = []
+    for source in sources:
+        path = Path(source)
+        if source != '-' and path.is_dir():
+            paths.extend(sorted(p for p in path.rglob('*') if p.suffix in ('.yaml', '.yml', '.json')))
+        else:
+            paths.append(source)
+    
+    objects, warnings = {}, []
+    for path in paths:
+        text = sys.stdin.read() if path == '-' else Path(path).read_text(encoding='utf-8')
+        for doc in yaml.safe_load_all(text):
+            if not doc:
+                continue
+            if not isinstance(doc, dict):
+                raise ValueError(f"{path}: 文档不是 Kubernetes 对象")
+            for obj in (doc.get('items') or []) if doc.get('kind') == 'List' else [doc]:
+                if not isinstance(obj, dict) or not obj.get('apiVersion') or not obj.get('kind') or not obj.get('metadata', {}).get('name'):
+                    raise ValueError(f"{path}: 对象缺少 apiVersion、kind 或 metadata.name")
+                obj['metadata'].setdefault('namespace', namespace)
+                key = _route_key(obj)
+                if key in objects:
+                    warnings.append(f"{path}: {key[1]} {key[2]}/{key[3]} 重复定义，使用后出现的版本")
+                objects[key] = obj
+    return objects, warnings
+
+
+def _route_key(obj: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    api_version = obj['apiVersion']
+    group = api_version.split('/')[0] if '/' in api_version else ''
+    metadata = obj['metadata']
+    return group, obj['kind'], metadata.get('namespace', ''), metadata['name']
+
+
+def _route_resource(group: str, kind: str) -> str:
+    """kubectl 使用的资源名（带 API 组，避免与同名的其他资源混淆）"""
+    return f"{kind.lower()}.{group}" if group else kind.lower()
+
+
+def _route_differs(desired: Any, live: Any) -> bool:
+    """desired 中的字段在 live 中是否有缺失或不同（live 中额外的默认值和状态字段不算差异）"""
+    if isinstance(desired, dict):
+        return not isinstance(live, dict) or any(_route_differs(value, live.get(key)) for key, value in desired.items())
+    return desired != live
+
+
+def _stamp_route(obj: Dict[str, Any], route_set: str) -> Dict[str, Any]:
+    """给对象加上路由集合标签和内容哈希注解（哈希不包含注解本身）"""
+    metadata = obj['metadata']
+    metadata.setdefault('labels', {})[ROUTE_SYNC_LABEL] = route_set
+    annotations = metadata.setdefault('annotations', {})
+    annotations.pop(ROUTE_SYNC_HASH_ANNOTATION, None)
+    canonical = json.dumps(obj, sort_keys=True, separators=(',', ':'), default=str)
+    annotations[ROUTE_SYNC_HASH_ANNOTATION] = hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+    return obj
+
+
+def _route_changed(desired: Dict[str, Any], live: Dict[str, Any]) -> bool:
+    """对象是否需要重新应用
+    
+    内容哈希与线上注解不同说明输入有变化（包括删除了字段或注解，子集比较发现不了）；
+    哈希相同时再比较 spec 等顶层字段以及 labels/annotations，发现线上被其他人修改的情况，
+    忽略服务端维护的元数据和默认值。
+    """
+    live_hash = (live.get('metadata', {}).get('annotations') or {}).get(ROUTE_SYNC_HASH_ANNOTATION)
+    if live_hash != desired['metadata'].get('annotations', {}).get(ROUTE_SYNC_HASH_ANNOTATION):
+        return True
+    fields = {key: value for key, value in desired.items() if key not in ('apiVersion', 'kind', 'metadata', 'status')}
+    for key in ('labels', 'annotations'):
+        if desired['metadata'].get(key):
+            fields.setdefault('metadata', {})[key] = desired['metadata'][key]
+    return _route_differs(fields, live)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """最近秩法分位数（q 取 0-1）"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def _median(values: List[float]) -> float:
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def _instance_architecture(instance_type: str) -> str:
+    """按实例族推断 CPU 架构（Graviton 为 arm64，其余为 amd64）"""
+    return 'arm64' if GRAVITON_FAMILY_PATTERN.match(instance_type) else 'amd64'
+
+
+def _parse_image_reference(image: str) -> Tuple[str, str, str]:
+    """把镜像地址拆分为 (仓库域名, 镜像路径, tag 或 digest)，Docker Hub 镜像补全默认前缀"""
+    name, reference = (image.split('@', 1) + [''])[:2]
+    if not reference:
+        last = name.rsplit('/', 1)[-1]
+        if ':' in last:
+            name, reference = name.rsplit(':', 1)
+        else:
+            reference = 'latest'
+    first, _, rest = name.partition('/')
+    if rest and ('.' in first or ':' in first or first == 'localhost'):
+        return first, rest, reference
+    return 'registry-1.docker.io', name if '/' in name else f"library/{name}", reference
+
+
+def _parse_curl_response(output: str) -> Tuple[int, Dict[str, str], str]:
+    """解析 curl -D - 的输出（可能包含多段重定向响应头），返回最后一段的 (状态码, 响应头, 响应体)"""
+    status, headers, body = 0, {}, output
+    while body.startswith('HTTP/'):
+        parts = re.split(r'\r?\n\r?\n', body, maxsplit=1)
+        head, body = parts[0], parts[1] if len(parts) > 1 else ''
+        lines = head.splitlines()
+        fields = lines[0].split()
+        status = int(fields[1]) if len(fields) > 1 and fields[1].isdigit() else 0
+        headers = {}
+        for line in lines[1:]:
+            key, _, value = line.partition(':')
+            headers[key.strip().lower()] = value.strip()
+    return status, headers, body
+
+
+def _matrix_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    """由一次矩阵压测记录计算每 vCPU 的 RPS 和每百万请求成本"""
+    matrix = record['matrix']
+    rps = record['summary'].get('rps') or 0
+    vcpus = matrix['vcpus'] * matrix['nodes']
+    price = matrix.get('hourly_price')
+    cost = price * matrix['nodes'] / (rps * 3600) * 1e6 if price and rps else None
+    return {
+        'instance_type': record['instance_type'],
+        'id': record['id'],
+        'nodes': matrix['nodes'],
+        'vcpus': vcpus,
+        'rps': round(rps, 1),
+        'rps_per_vcpu': round(rps / vcpus, 1) if vcpus else None,
+        'p99_ms': record['summary'].get('p99_ms'),
+        'error_ratio': record['summary'].get('error_ratio'),
+        'hourly_price': price,
+        'cost_per_million': round(cost, 4) if cost is not None else None,
+    }
+
+
+def _rank_matrix(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """按每百万请求成本升序排名；没有价格的排在后面并按每 vCPU 的 RPS 降序"""
+    ranked = sorted(rows, key=lambda row: (
+        row['cost_per_million'] is None,
+        row['cost_per_million'] if row['cost_per_million'] is not None else -(row['rps_per_vcpu'] or 0),
+        row['p99_ms'] if row['p99_ms'] is not None else float('inf'),
+    ))
+    for rank, row in enumerate(ranked, 1):
+        row['rank'] = rank
+    return ranked
+
+
+def deep_merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    """递归合并配置，override 中的值优先；列表整体替换"""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class FleetRunner:
+    """多集群编排：基于共享基础配置和单集群覆盖项，分批并行执行 CLI 命令
+    
+    每个集群在独立的工作目录中运行（生成的配置文件、kubeconfig、日志互不干扰），
+    同一批次内按并发上限并行执行，批次之间串行，可在失败时停止后续批次。
+    """
+    
+    def __init__(self, inventory_path: str, global_args: Optional[List[str]] = None):
+        self.inventory_path = Path(inventory_path)
+        self.global_args = global_args or []
+        self.inventory = self._load_inventory()
+        self.workdir = self.inventory_path.parent / self.inventory.get('workdir', 'fleet')
+    
+    def _load_inventory(self) -> Dict[str, Any]:
+        try:
+            with open(self.inventory_path, 'r', encoding='utf-8') as f:
+                inventory = yaml.safe_load(f) or {}
+        except FileNotFoundError:
+            click.echo(f"✗ 集群清单不存在: {self.inventory_path}", err=True)
+            sys.exit(1)
+        except yaml.YAMLError as e:
+            click.echo(f"✗ 集群清单格式错误: {e}", err=True)
+            sys.exit(1)
+        
+        names = [cluster.get('name') for cluster in inventory.get('clusters', [])]
+        if not names or not all(names):
+            click.echo("✗ 集群清单中每个集群都需要 name", err=True)
+            sys.exit(1)
+        if len(set(names)) != len(names):
+            click.echo("✗ 集群清单中存在重复的 name", err=True)
+            sys.exit(1)
+        return inventory
+    
+    def _base_config(self) -> Dict[str, Any]:
+        """基础配置：可以是文件路径，也可以直接内联"""
+        base = self.inventory.get('base', {})
+        if isinstance(base, str):
+            with open(self.inventory_path.parent / base, 'r', encoding='utf-8') as f:
+                return yaml.safe_load(f) or {}
+        return base
+    
+    def prepare(self) -> Dict[str, Path]:
+        """为每个集群生成合并后的 config.yaml，返回 集群名 -> 工作目录"""
+        base = self._base_config()
+        cluster_dirs = {}
+        for cluster in self.inventory['clusters']:
+            cluster_dir = self.workdir / cluster['name']
+            cluster_dir.mkdir(parents=True, exist_ok=True)
+            with open(cluster_dir / 'config.yaml', 'w', encoding='utf-8') as f:
+                yaml.dump(deep_merge(base, cluster.get('overrides', {})), f,
+                          default_flow_style=False, allow_unicode=True)
+            cluster_dirs[cluster['name']] = cluster_dir
+        return cluster_dirs
+    
+    def plan_waves(self, wave_size: Optional[int] = None) -> List[List[str]]:
+        """批次划分：清单中显式的 waves 优先，其次按 wave_size 切分，默认全部一批"""
+        names = [cluster['name'] for cluster in self.inventory['clusters']]
+        if self.inventory.get('waves'):
+            waves = [list(wave) for wave in self.inventory['waves']]
+            unknown = {name for wave in waves for name in wave} - set(names)
+            if unknown:
+                click.echo(f"✗ waves 中包含未定义的集群: {', '.join(sorted(unknown))}", err=True)
+                sys.exit(1)
+            return waves
+        if wave_size:
+            return [names[i:i + wave_size] for i in range(0, len(names), wave_size)]
+        return [names]
+    
+    def _artifact_env(self) -> Dict[str, str]:
+        """所有集群共用清单目录下的制品缓存和锁文件，避免各自解析出不同的 Chart 版本"""
+        artifacts_config = self._base_config().get('artifacts', {})
+        inventory_dir = self.inventory_path.parent.resolve()
+        return {
+            ArtifactCache.ENV_ROOT: os.environ.get(ArtifactCache.ENV_ROOT)
+            or str(inventory_dir / artifacts_config.get('cache_dir', '.higress-cache')),
+            ArtifactCache.ENV_LOCK_FILE: os.environ.get(ArtifactCache.ENV_LOCK_FILE)
+            or str(inventory_dir / artifacts_config.get('lock_file', 'artifacts.lock.json')),
+        }
+    
+    async def _run_cluster(self, runner: AsyncCommandRunner, name: str, cluster_dir: Path,
+                           args: List[str], wave: int) -> Dict[str, Any]:
+        """在集群工作目录中执行一条 CLI 命令"""
+        config = yaml.safe_load((cluster_dir / 'config.yaml').read_text(encoding='utf-8'))
+        env = dict(os.environ, KUBECONFIG=str((cluster_dir / 'kubeconfig').resolve()), **self._artifact_env())
+        log_path = str(cluster_dir / f"{args[0]}-{time.strftime('%Y%m%d-%H%M%S')}.log")
+        
+        # 已有集群先刷新独立的 kubeconfig；创建集群时由 eksctl 写入
+        if args[0] not in ('install-all', 'create'):
+            await runner.run([
+                'aws', 'eks', 'update-kubeconfig',
+                '--name', config['eks']['cluster_name'],
+                '--region', config['aws']['region'],
+                '--kubeconfig', env['KUBECONFIG']
+            ], step=name, stream=False, env=env, log_path=log_path)
+        
+        result = await runner.run(
+            [sys.executable, str(Path(__file__).resolve()), *self.global_args, *args],
+            step=name, stream=False, cwd=str(cluster_dir), env=env, log_path=log_path
+        )
+        outcome = {
+            'cluster': name,
+            'wave': wave,
+            'ok': result.ok,
+            'exit_code': result.returncode,
+            'duration': round(result.duration, 1),
+            'log': log_path
+        }
+        # status -o json 的输出直接汇总
+        if args[0] == 'status' and 'json' in args:
+            try:
+                outcome['status'] = json.loads(result.stdout)
+            except json.JSONDecodeError:
+                pass
+        click.echo(f"  {'✓' if result.ok else '✗'} [{name}] {args[0]} ({result.duration:.0f}秒) 日志: {log_path}")
+        return outcome
+    
+    async def _run(self, args: List[str], waves: List[List[str]], parallelism: int,
+                   halt_on_failure: bool) -> List[Dict[str, Any]]:
+        cluster_dirs = self.prepare()
+        runner = AsyncCommandRunner(max_concurrency=parallelism, stream=False)
+        results = []
+        for index, wave in enumerate(waves, 1):
+            click.echo(f"\n【批次 {index}/{len(waves)}】{', '.join(wave)}")
+            wave_results = await asyncio.gather(*[
+                self._run_cluster(runner, name, cluster_dirs[name], args, index) for name in wave
+            ])
+            results.extend(wave_results)
+            if halt_on_failure and not all(r['ok'] for r in wave_results):
+                skipped = [name for later in waves[index:] for name in later]
+                if skipped:
+                    click.echo(f"\n✗ 批次 {index} 存在失败，停止后续批次: {', '.join(skipped)}")
+                    results.extend({'cluster': name, 'wave': None, 'ok': False, 'exit_code': None,
+                                    'duration': 0, 'log': None, 'skipped': True} for name in skipped)
+                break
+        return results
+    
+    def run(self, args: List[str], parallelism: Optional[int] = None, wave_size: Optional[int] = None,
+            halt_on_failure: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """在所有集群上执行命令，返回每个集群的结果"""
+        if parallelism is None:
+            parallelism = self.inventory.get('parallelism', 4)
+        if halt_on_failure is None:
+            halt_on_failure = self.inventory.get('halt_on_failure', True)
+        waves = self.plan_waves(wave_size)
+        return asyncio.run(self._run(args, waves, parallelism, halt_on_failure))
 
 
 class HigressDeployer:
     """Higress 部署管理器"""
     
-    def __init__(self, config_path: str = "config.yaml"):
+    def __init__(self, config_path: str = "config.yaml", regenerate: bool = True, quiet: bool = False):
         self.config_path = config_path
+        self.quiet = quiet
         self.config = self._load_config()
-        # 每次初始化时都重新生成配置文件，确保配置同步
-        self._regenerate_config_files()
+        self.runner = AsyncCommandRunner(
+            max_concurrency=self.config.get('runner', {}).get('max_concurrency', 8)
+        )
+        self._subnet_info = None
+        self._subnet_azs = None
+        self._defer_aws_lookups = False
+        self._rendered_chart = None
+        artifacts_config = self.config.get('artifacts', {})
+        if CommandSimulator.active():
+            # 模拟模式下的假制品单独缓存，不能写入真实的锁文件
+            CommandSimulator.set_context(self.config)
+            self.artifacts = ArtifactCache(
+                root=os.path.join(os.environ[CommandSimulator.ENV_DIR], 'cache'),
+                lock_file=os.path.join(os.environ[CommandSimulator.ENV_DIR], 'artifacts.lock.json')
+            )
+        else:
+            # 缓存目录和锁文件相对配置文件所在目录解析；fleet 子进程通过环境变量使用清单目录下的共享路径
+            config_dir = Path(self.config_path).resolve().parent
+            self.artifacts = ArtifactCache(
+                root=os.environ.get(ArtifactCache.ENV_ROOT)
+                or str(config_dir / artifacts_config.get('cache_dir', '.higress-cache')),
+                lock_file=os.environ.get(ArtifactCache.ENV_LOCK_FILE)
+                or str(config_dir / artifacts_config.get('lock_file', 'artifacts.lock.json')),
+                offline=artifacts_config.get('offline', False) or os.environ.get('HIGRESS_OFFLINE') == '1',
+                pinned=artifacts_config.get('checksums', {})
+            )
+        # 每次初始化时都重新生成配置文件，确保配置同步（只读命令可跳过）；此时不查询 AWS
+        if regenerate:
+            self._defer_aws_lookups = True
+            try:
+                self._regenerate_config_files()
+            finally:
+                self._defer_aws_lookups = False
         
     def _load_config(self) -> Dict[str, Any]:
         """加载配置文件"""
         try:
             with open(self.config_path, 'r', encoding='utf-8') as f:
                 config = yaml.safe_load(f)
-            click.echo(f"✓ 配置文件加载成功: {self.config_path}")
+            if not self.quiet:
+                click.echo(f"✓ 配置文件加载成功: {self.config_path}")
             return config
         except FileNotFoundError:
             click.echo(f"✗ 配置文件不存在: {self.config_path}", err=True)
@@ -73,10 +2040,11 @@ class HigressDeployer:
         public_subnets = self.config.get('vpc', {}).get('public_subnets', [])
         private_subnets = self.config.get('vpc', {}).get('private_subnets', [])
         
-        if len(public_subnets) != 3:
-            errors.append(f"公有子网数量应为 3，当前为 {len(public_subnets)}")
-        if len(private_subnets) != 3:
-            errors.append(f"私有子网数量应为 3，当前为 {len(private_subnets)}")
+        for name, subnets in [('公有子网', public_subnets), ('私有子网', private_subnets)]:
+            if not MIN_AZ_COUNT <= len(subnets) <= MAX_AZ_COUNT:
+                errors.append(f"{name}数量应为 {MIN_AZ_COUNT}-{MAX_AZ_COUNT} 个，当前为 {len(subnets)}")
+            if len(set(subnets)) != len(subnets):
+                errors.append(f"{name}列表中存在重复的子网")
         
         # 检查节点配置的逻辑
         min_size = self.config.get('eks', {}).get('min_size', 0)
@@ -88,6 +2056,106 @@ class HigressDeployer:
         if desired_capacity < min_size or desired_capacity > max_size:
             errors.append(f"desired_capacity ({desired_capacity}) 应在 min_size ({min_size}) 和 max_size ({max_size}) 之间")
         
+        # 检查额外节点组
+        names = [self.config.get('eks', {}).get('node_group_name')]
+        for i, group in enumerate(self.config.get('eks', {}).get('additional_node_groups') or []):
+            for key in ('name', 'instance_type', 'min_size', 'max_size'):
+                if group.get(key) in (None, ''):
+                    errors.append(f"缺少必需配置: eks.additional_node_groups[{i}].{key}")
+            if group.get('name') in names:
+                errors.append(f"节点组名称重复: {group.get('name')}")
+            names.append(group.get('name'))
+            if isinstance(group.get('min_size'), int) and isinstance(group.get('max_size'), int):
+                desired = group.get('desired_capacity', group['min_size'])
+                if not group['min_size'] <= desired <= group['max_size']:
+                    errors.append(f"节点组 {group.get('name')} 的 desired_capacity ({desired}) "
+                                  f"应在 min_size ({group['min_size']}) 和 max_size ({group['max_size']}) 之间")
+        
+        # 检查 Spot 节点组：托管节点组的多个实例类型必须是同一架构
+        spot = self.config.get('eks', {}).get('spot') or {}
+        if spot.get('enabled', False):
+            spot_types = spot.get('instance_types', SPOT_INSTANCE_TYPES)
+            if not spot_types:
+                errors.append("eks.spot.instance_types 不能为空")
+            elif len({_instance_architecture(t) for t in spot_types}) > 1:
+                errors.append("eks.spot.instance_types 中的实例类型必须是同一 CPU 架构")
+            spot_min, spot_max = spot.get('min_size', 1), spot.get('max_size', 4)
+            if not spot_min <= spot.get('desired_capacity', spot_min) <= spot_max:
+                errors.append(f"eks.spot 的 desired_capacity 应在 min_size ({spot_min}) 和 max_size ({spot_max}) 之间")
+            if spot.get('name') in names:
+                errors.append(f"节点组名称重复: {spot.get('name')}")
+        
+        # 检查 gp3 StorageClass 参数和监控存储配置
+        storage = self.config.get('storage', {})
+        class_names = {'ebs-gp3'}
+        for name, params in (storage.get('classes') or {}).items():
+            class_names.add(name)
+            params = {**GP3_BASELINE, **(params or {})}
+            for key, (low, high) in GP3_LIMITS.items():
+                if not isinstance(params[key], int) or not low <= params[key] <= high:
+                    errors.append(f"storage.classes.{name}.{key} 应为 {low}-{high} 之间的整数")
+            if isinstance(params['iops'], int) and isinstance(params['throughput'], int) \
+                    and params['throughput'] > params['iops'] * 0.25:
+                errors.append(f"storage.classes.{name}: gp3 吞吐量不能超过 IOPS x 0.25 MiB/s")
+            if params.get('volume_binding_mode', 'WaitForFirstConsumer') not in VOLUME_BINDING_MODES:
+                errors.append(f"storage.classes.{name}.volume_binding_mode 应为 {' 或 '.join(VOLUME_BINDING_MODES)}")
+        for component in ('prometheus', 'loki'):
+            options = storage.get(component) or {}
+            if options.get('storage_class', 'ebs-gp3') not in class_names:
+                errors.append(f"storage.{component}.storage_class 未在 storage.classes 中定义: {options['storage_class']}")
+            for key in ('retention', 'scrape_interval'):
+                if key in options:
+                    try:
+                        _parse_retention(options[key])
+                    except ValueError:
+                        errors.append(f"storage.{component}.{key} 无效: {options[key]}（示例: 15d、36h）")
+            if options.get('size') and not re.fullmatch(r'\d+(Gi)?', str(options['size'])):
+                errors.append(f"storage.{component}.size 无效: {options['size']}（示例: 50Gi）")
+        
+        # 检查 Controller 规格
+        controller = self.config.get('higress', {}).get('controller') or {}
+        if 'replicas' in controller and (not isinstance(controller['replicas'], int) or controller['replicas'] < 1):
+            errors.append("higress.controller.replicas 应为正整数")
+        for key in ('cpu_request', 'cpu_limit', 'pilot_cpu_request'):
+            if key in controller and not re.fullmatch(r'\d+m|\d+(\.\d+)?', str(controller[key])):
+                errors.append(f"higress.controller.{key} 无效: {controller[key]}（示例: 500m、2）")
+        if all(key in controller for key in ('cpu_request', 'cpu_limit')) \
+                and re.fullmatch(r'\d+m|\d+(\.\d+)?', str(controller['cpu_request'])) \
+                and re.fullmatch(r'\d+m|\d+(\.\d+)?', str(controller['cpu_limit'])) \
+                and _cpu_millicores(controller['cpu_request']) > _cpu_millicores(controller['cpu_limit']):
+            errors.append("higress.controller.cpu_request 不能大于 cpu_limit")
+        for key in ('debounce_after', 'debounce_max'):
+            if key in controller and not re.fullmatch(r'\d+(ms|s)', str(controller[key])):
+                errors.append(f"higress.controller.{key} 无效: {controller[key]}（示例: 100ms、10s）")
+        
+        # 检查监控档位
+        monitoring = self.config.get('monitoring', {})
+        profile = monitoring.get('profile', MONITORING_DEFAULT_PROFILE)
+        if profile not in MONITORING_PROFILES:
+            errors.append(f"monitoring.profile 无效: {profile}（可选 {', '.join(MONITORING_PROFILES)}）")
+        sampling = monitoring.get('access_log_sampling', 1.0)
+        if not isinstance(sampling, (int, float)) or not 0 < sampling <= 1:
+            errors.append("monitoring.access_log_sampling 应为 (0, 1] 之间的数")
+        for key in ('scrape_interval', 'retention'):
+            if key in monitoring:
+                try:
+                    _parse_retention(monitoring[key])
+                except ValueError:
+                    errors.append(f"monitoring.{key} 无效: {monitoring[key]}（示例: 30s、7d）")
+        
+        # 检查 Gateway 调度架构是否有对应的节点组
+        architectures = self.config.get('higress', {}).get('architectures') or []
+        available = {
+            _instance_architecture(group['instance_type'])
+            for group in [self.config.get('eks', {})] + (self.config.get('eks', {}).get('additional_node_groups') or [])
+            if group.get('instance_type')
+        }
+        for arch in architectures:
+            if arch not in ARCHITECTURES:
+                errors.append(f"higress.architectures 中的架构无效: {arch}（可选 {', '.join(ARCHITECTURES)}）")
+            elif arch not in available:
+                errors.append(f"higress.architectures 包含 {arch}，但没有该架构的节点组")
+        
         return errors
     
     def _regenerate_config_files(self):
@@ -108,15 +2176,236 @@ class HigressDeployer:
             self._generate_higress_values_file()
             # 生成 ALB Ingress 配置
             self._generate_alb_ingress_file()
+            # 生成 PriorityClass 配置
+            self._generate_priority_classes_file()
+            # 生成扩容预留（占位 Pod）配置
+            if self.config.get('headroom', {}).get('enabled', False):
+                self._generate_headroom_file()
         except Exception as e:
             # 配置文件生成失败不应该阻止程序启动，只记录警告
             click.echo(f"⚠ 警告：配置文件生成失败: {e}", err=True)
     
+    def _describe_subnets(self) -> Tuple[Dict[str, Dict[str, Any]], str]:
+        """一次批量查询所有配置子网的详情，结果在本次运行内缓存"""
+        if self._subnet_info is None:
+            vpc = self.config['vpc']
+            subnet_ids = vpc['public_subnets'] + vpc['private_subnets']
+            data, error = self._query_aws(['ec2', 'describe-subnets', '--subnet-ids', *subnet_ids])
+            if not data:
+                return {}, error
+            self._subnet_info = {subnet['SubnetId']: subnet for subnet in data.get('Subnets', [])}
+            self._save_subnet_az_cache({
+                subnet_id: subnet['AvailabilityZone'] for subnet_id, subnet in self._subnet_info.items()
+            })
+        return self._subnet_info, ''
+    
+    def _save_subnet_az_cache(self, subnet_azs: Dict[str, str]):
+        """合并写入子网可用区缓存文件"""
+        cache = {}
+        if Path(SUBNET_AZ_CACHE_FILE).exists():
+            try:
+                with open(SUBNET_AZ_CACHE_FILE, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                cache = {}
+        cache.update(subnet_azs)
+        with open(SUBNET_AZ_CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+    
+    def _get_subnet_azs(self) -> Dict[str, str]:
+        """获取子网到实际可用区的映射，优先使用本地缓存
+        
+        初始化时重新生成配置文件只使用本地缓存，不查询 AWS；缓存不完整时返回部分结果且不记住，
+        真正使用这些文件的命令（create、deploy）会重新生成并在那时查询。
+        """
+        if self._subnet_azs is not None:
+            return self._subnet_azs
+        
+        vpc = self.config['vpc']
+        subnet_ids = vpc['public_subnets'] + vpc['private_subnets']
+        cache = {}
+        if Path(SUBNET_AZ_CACHE_FILE).exists():
+            try:
+                with open(SUBNET_AZ_CACHE_FILE, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                cache = {}
+        
+        if not all(subnet_id in cache for subnet_id in subnet_ids):
+            if self._defer_aws_lookups:
+                return {subnet_id: cache[subnet_id] for subnet_id in subnet_ids if subnet_id in cache}
+            subnets, error = self._describe_subnets()
+            if subnets:
+                cache.update({subnet_id: subnet['AvailabilityZone'] for subnet_id, subnet in subnets.items()})
+            else:
+                click.echo(f"⚠ 警告：无法查询子网可用区（{error}），将按列表顺序推断", err=True)
+        
+        self._subnet_azs = {subnet_id: cache[subnet_id] for subnet_id in subnet_ids if subnet_id in cache}
+        return self._subnet_azs
+    
+    def _get_az_count(self) -> int:
+        """节点（私有子网）实际覆盖的可用区数量"""
+        private_subnets = self.config['vpc']['private_subnets']
+        subnet_azs = self._get_subnet_azs()
+        azs = {subnet_azs.get(subnet, subnet) for subnet in private_subnets}
+        return max(len(azs), 1)
+    
+    def _eksctl_subnets(self, subnet_ids: List[str]) -> Dict[str, Dict[str, str]]:
+        """生成 eksctl vpc.subnets 映射，键为可用区，同一可用区有多个子网时使用子网 ID"""
+        region = self.config['aws']['region']
+        subnet_azs = self._get_subnet_azs()
+        
+        subnets = {}
+        for i, subnet_id in enumerate(subnet_ids):
+            # 查询失败时退化为按顺序推断的可用区
+            az = subnet_azs.get(subnet_id, f"{region}{chr(ord('a') + i)}")
+            key = subnet_id if az in subnets else az
+            subnets[key] = {'id': subnet_id, 'az': az}
+        return subnets
+    
+    def _node_groups(self) -> List[Dict[str, Any]]:
+        """主节点组和 eks.additional_node_groups 中的额外节点组，补全默认值和 CPU 架构"""
+        eks = self.config['eks']
+        groups = [{
+            'name': eks['node_group_name'],
+            'instance_type': eks['instance_type'],
+            'desired_capacity': eks['desired_capacity'],
+            'min_size': eks['min_size'],
+            'max_size': eks['max_size'],
+            'volume_size': eks['volume_size'],
+        }]
+        for group in eks.get('additional_node_groups') or []:
+            groups.append({
+                'volume_size': eks['volume_size'],
+                'desired_capacity': group.get('min_size', 1),
+                **group,
+            })
+        for group in groups:
+            group['architecture'] = _instance_architecture(group['instance_type'])
+        return groups
+    
+    def _gateway_architectures(self) -> List[str]:
+        """Gateway/Controller 可调度的 CPU 架构：higress.architectures，默认为所有节点组的架构"""
+        configured = self.config.get('higress', {}).get('architectures')
+        if configured:
+            return sorted(configured)
+        return sorted({group['architecture'] for group in self._node_groups()})
+    
+    def _spot_node_group(self) -> Optional[Dict[str, Any]]:
+        """eks.spot 启用时返回补全默认值的 Spot 节点组配置"""
+        spot = self.config['eks'].get('spot') or {}
+        if not spot.get('enabled', False):
+            return None
+        group = {
+            'name': f"{self.config['eks']['node_group_name']}-spot",
+            'instance_types': SPOT_INSTANCE_TYPES,
+            'min_size': 1,
+            'max_size': 4,
+            'volume_size': self.config['eks']['volume_size'],
+            **{key: value for key, value in spot.items() if key != 'enabled'},
+        }
+        group.setdefault('desired_capacity', group['min_size'])
+        return group
+    
+    @staticmethod
+    def _arch_node_affinity(architectures: List[str], on_demand: bool = False) -> Dict[str, Any]:
+        """按 kubernetes.io/arch（以及可选的按需容量类型）限制调度的 nodeAffinity"""
+        expressions = [{
+            'key': 'kubernetes.io/arch',
+            'operator': 'In',
+            'values': list(architectures)
+        }]
+        if on_demand:
+            expressions.append({'key': CAPACITY_TYPE_LABEL, 'operator': 'In', 'values': ['ON_DEMAND']})
+        return {
+            'requiredDuringSchedulingIgnoredDuringExecution': {
+                'nodeSelectorTerms': [{'matchExpressions': expressions}]
+            }
+        }
+    
+    def _gateway_node_affinity(self) -> Dict[str, Any]:
+        """Gateway 及其相关 Pod 的 nodeAffinity
+        
+        混合架构集群中只调度到 higress.architectures 指定（默认所有节点组）的架构；启用 Spot 节点组时只用按需节点。
+        """
+        return self._arch_node_affinity(self._gateway_architectures(), on_demand=bool(self._spot_node_group()))
+    
+    @staticmethod
+    def _spot_scheduling() -> Dict[str, Any]:
+        """非服务组件的调度配置：容忍 Spot 污点并优先调度到 Spot 节点"""
+        return {
+            'tolerations': [{'key': SPOT_NODE_TAINT, 'operator': 'Exists', 'effect': 'NoSchedule'}],
+            'affinity': {
+                'nodeAffinity': {
+                    'preferredDuringSchedulingIgnoredDuringExecution': [{
+                        'weight': 100,
+                        'preference': {
+                            'matchExpressions': [{'key': CAPACITY_TYPE_LABEL, 'operator': 'In', 'values': ['SPOT']}]
+                        }
+                    }]
+                }
+            }
+        }
+    
+    def _eksctl_node_group(self, group: Dict[str, Any]) -> Dict[str, Any]:
+        """生成 eksctl 托管节点组配置；eksctl 按实例类型选择 x86_64 或 arm64 的 AMI"""
+        return {
+            'name': group['name'],
+            'instanceType': group['instance_type'],
+            'desiredCapacity': group['desired_capacity'],
+            'minSize': group['min_size'],
+            'maxSize': group['max_size'],
+            'volumeSize': group['volume_size'],
+            'volumeType': 'gp3',
+            'privateNetworking': True,
+            'subnets': self.config['vpc']['private_subnets'],
+            'labels': {
+                'role': 'higress',
+                'environment': 'production'
+            },
+            'tags': {
+                'Name': 'higress-node',
+                'Environment': 'production'
+            },
+            'iam': {
+                'withAddonPolicies': {
+                    'autoScaler': True,
+                    'albIngress': True,
+                    'cloudWatch': True,
+                    'ebs': True
+                }
+            }
+        }
+    
+    def _eksctl_spot_node_group(self, group: Dict[str, Any]) -> Dict[str, Any]:
+        """生成 eksctl Spot 托管节点组配置：多实例类型分散容量池，带污点只接收非服务组件"""
+        node_group = self._eksctl_node_group({**group, 'instance_type': None})
+        node_group.pop('instanceType')
+        node_group.update({
+            'instanceTypes': group['instance_types'],
+            'spot': True,
+            'labels': {'role': 'higress-spot', 'environment': 'production'},
+            'taints': [{'key': SPOT_NODE_TAINT, 'value': 'true', 'effect': 'NoSchedule'}],
+            'tags': {'Name': 'higress-spot-node', 'Environment': 'production'},
+        })
+        return node_group
+    
     def _generate_eks_config_file(self):
         """生成 EKS 集群配置文件"""
         config = self.config
         region = config['aws']['region']
-        azs = ['a', 'b', 'c']
+        
+        # 托管 addon 与集群一同创建，EBS CSI Driver 使用 eksctl 内置的 IRSA 策略
+        addons = []
+        for addon in EKS_ADDONS:
+            addon_config = {
+                'name': addon,
+                'version': 'latest',
+                'resolveConflicts': 'overwrite'
+            }
+            if addon == 'aws-ebs-csi-driver':
+                addon_config['wellKnownPolicies'] = {'ebsCSIController': True}
+            addons.append(addon_config)
         
         eks_config = {
             'apiVersion': 'eksctl.io/v1alpha5',
@@ -129,63 +2418,328 @@ class HigressDeployer:
             'vpc': {
                 'id': config['vpc']['vpc_id'],
                 'subnets': {
-                    'public': {
-                        f"{region}{az}": {'id': subnet}
-                        for az, subnet in zip(azs, config['vpc']['public_subnets'])
-                    },
-                    'private': {
-                        f"{region}{az}": {'id': subnet}
-                        for az, subnet in zip(azs, config['vpc']['private_subnets'])
-                    }
+                    'public': self._eksctl_subnets(config['vpc']['public_subnets']),
+                    'private': self._eksctl_subnets(config['vpc']['private_subnets'])
                 }
             },
             'iam': {
-                'withOIDC': True
-            },
-            'managedNodeGroups': [{
-                'name': config['eks']['node_group_name'],
-                'instanceType': config['eks']['instance_type'],
-                'desiredCapacity': config['eks']['desired_capacity'],
-                'minSize': config['eks']['min_size'],
-                'maxSize': config['eks']['max_size'],
-                'volumeSize': config['eks']['volume_size'],
-                'volumeType': 'gp3',
-                'privateNetworking': True,
-                'subnets': config['vpc']['private_subnets'],
-                'labels': {
-                    'role': 'higress',
-                    'environment': 'production'
-                },
-                'tags': {
-                    'Name': 'higress-node',
-                    'Environment': 'production'
-                },
-                'iam': {
-                    'withAddonPolicies': {
-                        'autoScaler': True,
-                        'albIngress': True,
-                        'cloudWatch': True,
-                        'ebs': True
+                'withOIDC': True,
+                # IRSA 服务账户由 eksctl 在创建集群时一并创建，无需事后逐个创建
+                'serviceAccounts': [{
+                    'metadata': {
+                        'name': 'aws-load-balancer-controller',
+                        'namespace': 'kube-system'
+                    },
+                    'wellKnownPolicies': {
+                        'awsLoadBalancerController': True
+                    },
+                    'attachPolicy': {
+                        'Version': '2012-10-17',
+                        'Statement': [{
+                            'Effect': 'Allow',
+                            'Action': ALB_ADDITIONAL_PERMISSIONS,
+                            'Resource': '*'
+                        }]
                     }
-                }
-            }],
+                }]
+            },
+            'addons': addons,
+            'managedNodeGroups': [self._eksctl_node_group(group) for group in self._node_groups()],
             'cloudWatch': {
                 'clusterLogging': {
                     'enableTypes': ['api', 'audit', 'authenticator', 'controllerManager', 'scheduler']
                 }
             }
         }
+        spot_group = self._spot_node_group()
+        if spot_group:
+            eks_config['managedNodeGroups'].append(self._eksctl_spot_node_group(spot_group))
         
         config_file = 'eks-cluster-config.yaml'
         with open(config_file, 'w', encoding='utf-8') as f:
             yaml.dump(eks_config, f, default_flow_style=False)
     
+    def _storage_classes(self) -> Dict[str, Dict[str, Any]]:
+        """storage.classes 中的 gp3 StorageClass，未配置时只有基线性能的 ebs-gp3"""
+        classes = {'ebs-gp3': dict(GP3_BASELINE)}
+        for name, params in (self.config.get('storage', {}).get('classes') or {}).items():
+            classes[name] = {**GP3_BASELINE, **(params or {})}
+        return classes
+    
+    def _monitoring_profile(self) -> Dict[str, Any]:
+        """monitoring.profile 对应的监控档位，monitoring 下的同名字段可覆盖档位中的单项"""
+        monitoring = self.config.get('monitoring', {})
+        name = monitoring.get('profile', MONITORING_DEFAULT_PROFILE)
+        profile = {'name': name, **MONITORING_PROFILES[name]}
+        for key in MONITORING_PROFILES[name]:
+            if key in monitoring:
+                profile[key] = monitoring[key]
+        return profile
+    
+    def _monitoring_storage(self) -> Dict[str, Dict[str, Any]]:
+        """按 storage.prometheus / storage.loki 的负载假设计算卷容量、保留时长和所需性能
+        
+        采集间隔和保留时长默认取监控档位的值；Loki 按采样后的日志速率估算
+        """
+        storage = self.config.get('storage', {})
+        profile = self._monitoring_profile()
+        profile_defaults = {
+            'prometheus': {'scrape_interval': profile['scrape_interval'], 'retention': profile['retention']},
+            'loki': {},
+        }
+        result = {}
+        for component, sizer in (('prometheus', _prometheus_storage), ('loki', _loki_storage)):
+            options = {**MONITORING_STORAGE_DEFAULTS[component], **profile_defaults[component],
+                       **(storage.get(component) or {})}
+            size = options.get('size')
+            size_gi = int(re.sub(r'Gi$', '', str(size))) if size else None
+            retention = None if size_gi else _parse_retention(options['retention'])
+            if component == 'prometheus':
+                sizing = sizer(options['active_series'], _parse_retention(options['scrape_interval']),
+                               retention, size_gi)
+                sizing['scrape_interval'] = options['scrape_interval']
+            else:
+                sizing = sizer(options['log_lines_per_second'] * profile['access_log_sampling'],
+                               options['avg_line_bytes'], retention, size_gi)
+            result[component] = {**sizing, 'storage_class': options.get('storage_class', 'ebs-gp3')}
+        return result
+    
+    def _render_storage_classes(self) -> List[Dict[str, Any]]:
+        """生成 gp3 StorageClass 清单（显式 IOPS/吞吐量，卷小于 IOPS 要求时自动提高 IOPS/GiB）"""
+        return [{
+            'apiVersion': 'storage.k8s.io/v1',
+            'kind': 'StorageClass',
+            'metadata': {'name': name},
+            'provisioner': 'ebs.csi.aws.com',
+            'parameters': {
+                'type': 'gp3',
+                'iops': str(params['iops']),
+                'throughput': str(params['throughput']),
+                'encrypted': 'true',
+                'allowAutoIOPSPerGBIncrease': 'true'
+            },
+            'allowVolumeExpansion': True,
+            'volumeBindingMode': params.get('volume_binding_mode', 'WaitForFirstConsumer')
+        } for name, params in self._storage_classes().items()]
+    
+    def _generate_storage_classes_file(self) -> str:
+        """生成 StorageClass 文件"""
+        with open(STORAGE_CLASS_FILE, 'w', encoding='utf-8') as f:
+            yaml.dump_all(self._render_storage_classes(), f, default_flow_style=False)
+        return STORAGE_CLASS_FILE
+    
+    def _apply_storage_classes(self):
+        """创建 StorageClass 并检查 Prometheus/Loki 所需的写入性能"""
+        storage_file = self._generate_storage_classes_file()
+        result = self._run_parallel([('StorageClass', ['kubectl', 'apply', '-f', storage_file])])[0]
+        if not result.ok and 'Forbidden' in result.stderr:
+            # StorageClass 的 parameters 创建后不可修改，需要换一个名称
+            click.echo("⚠ 已存在的 StorageClass 参数不可修改，如需调整 IOPS/吞吐量请在 storage.classes 中使用新的名称")
+        elif not result.ok:
+            click.echo(f"⚠ 创建 StorageClass 失败: {result.stderr.strip()}")
+        
+        classes = self._storage_classes()
+        for component, sizing in self._monitoring_storage().items():
+            params = classes[sizing['storage_class']]
+            click.echo(f"  {component}: {sizing['size_gi']}Gi，保留 {_format_retention(sizing['retention'])}，"
+                       f"峰值写入约 {sizing['write_mib_per_second']:.1f} MiB/s / {sizing['write_iops']} IOPS"
+                       f"（{sizing['storage_class']}: {params['throughput']} MiB/s / {params['iops']} IOPS）")
+            if sizing['write_mib_per_second'] > params['throughput'] or sizing['write_iops'] > params['iops']:
+                click.echo(f"  ⚠ {sizing['storage_class']} 的性能低于 {component} 的峰值写入，"
+                           f"写入会被限流并反压日志/指标采集")
+    
+    def _monitoring_values(self, storage: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """按监控档位生成 Prometheus、Loki、Promtail 的 values（存储、采集间隔、指标丢弃、限速、日志采样）
+        
+        Helm 会静默忽略 Chart 没有使用的 values，各项是否生效由 _check_monitoring_values 按渲染结果确认
+        """
+        profile = self._monitoring_profile()
+        prometheus = {
+            'persistence': {
+                'enabled': True,
+                'storageClassName': storage['prometheus']['storage_class'],
+                'size': f"{storage['prometheus']['size_gi']}Gi"
+            },
+            'retention': _format_retention(storage['prometheus']['retention']),
+            # 按容量限制数据量，避免序列数超出预期时写满卷
+            # Prometheus 的容量单位按 1024 进位，GiB 与卷容量的 Gi 一致
+            'retentionSize': f"{int(storage['prometheus']['size_gi'] * 0.85)}GiB",
+            'scrapeInterval': storage['prometheus']['scrape_interval']
+        }
+        if profile['drop_metrics']:
+            # 在写入 TSDB 前丢弃高基数的 Envoy 统计，降低 Prometheus 内存和磁盘占用
+            prometheus['metricRelabelConfigs'] = [{
+                'source_labels': ['__name__'],
+                'regex': '|'.join(f"({pattern})" for pattern in profile['drop_metrics']),
+                'action': 'drop'
+            }]
+        values = {
+            'prometheus': prometheus,
+            'loki': {
+                'persistence': {
+                    'enabled': True,
+                    'storageClassName': storage['loki']['storage_class'],
+                    'size': f"{storage['loki']['size_gi']}Gi"
+                },
+                'retention': _format_retention(storage['loki']['retention']),
+                'limits': {
+                    'ingestion_rate_mb': profile['loki_ingestion_rate_mb'],
+                    'ingestion_burst_size_mb': profile['loki_ingestion_burst_mb']
+                }
+            }
+        }
+        if profile['access_log_sampling'] < 1:
+            # 访问日志按比例采样，4xx/5xx 日志全部保留
+            values['promtail'] = {
+                'pipelineStages': [{
+                    'match': {
+                        'selector': '{app="higress-gateway"} !~ "\\"response_code\\":\\"?[45]"',
+                        'stages': [{'sampling': {'rate': profile['access_log_sampling']}}]
+                    }
+                }]
+            }
+        return values
+    
+    def _monitoring_render_checks(self) -> List[Tuple[str, str, str]]:
+        """监控档位的每项设置在渲染结果中应出现的文本：(设置, 组件, 正则)"""
+        profile = self._monitoring_profile()
+        values = self._monitoring_values(self._monitoring_storage())
+        prometheus, loki = values['prometheus'], values['loki']
+        checks = [
+            ('Prometheus 保留时长', 'prometheus', rf"retention(\.time)?[=:]\s*['\"]?{re.escape(prometheus['retention'])}\b"),
+            ('Prometheus 容量上限', 'prometheus', rf"retention\.size[=:]\s*['\"]?{re.escape(prometheus['retentionSize'])}\b"),
+            ('Prometheus 采集间隔', 'prometheus', rf"scrape_interval:\s*['\"]?{re.escape(prometheus['scrapeInterval'])}\b"),
+            ('Loki 保留时长', 'loki', rf"retention_period:\s*['\"]?{re.escape(loki['retention'])}\b"),
+            ('Loki 限速', 'loki', rf"ingestion_rate_mb:\s*{loki['limits']['ingestion_rate_mb']}\b"),
+        ]
+        if profile['drop_metrics']:
+            checks.append(('Envoy 指标丢弃', 'prometheus', r"metric_relabel_configs"))
+        if profile['access_log_sampling'] < 1:
+            checks.append(('访问日志采样', 'promtail', rf"sampling:[\s\S]*rate:\s*{re.escape(str(profile['access_log_sampling']))}\b"))
+        return checks
+    
+    def _check_monitoring_values(self, values_file: str) -> List[str]:
+        """用 helm template 的渲染结果确认监控档位的设置进入了 Prometheus、Loki、Promtail 的配置
+        
+        higress-console Chart 没有使用的 values 会被 Helm 静默忽略；返回未生效（或无法确认）的设置
+        """
+        checks = self._monitoring_render_checks()
+        manifest = self._render_chart(values_file)
+        texts = {'prometheus': [], 'loki': [], 'promtail': []}
+        for doc in yaml.safe_load_all(manifest or ''):
+            if not isinstance(doc, dict):
+                continue
+            name = (doc.get('metadata') or {}).get('name', '')
+            for component, component_texts in texts.items():
+                if component in name:
+                    component_texts.extend(_rendered_strings(doc))
+        
+        unapplied = [label for label, component, pattern in checks
+                     if not any(re.search(pattern, text) for text in texts[component])]
+        if not manifest:
+            click.echo("  ⚠ 无法渲染 Chart，不能确认监控档位设置是否生效")
+        elif unapplied:
+            click.echo(f"  ⚠ Chart 渲染结果中没有以下监控档位设置，这些设置不会生效: {', '.join(unapplied)}")
+        return unapplied
+    
+    def _report_monitoring_overhead(self, values_file: str):
+        """输出监控档位和监控组件 CPU request 占节点总 CPU 的比例，超出预算时给出警告
+        
+        档位设置没有被 Chart 渲染时标注未生效，写入估算改用 Chart 默认行为（不采样、不限速）
+        """
+        if not self.config.get('higress', {}).get('enable_monitoring', False):
+            click.echo("  监控未启用（higress.enable_monitoring），跳过监控档位检查")
+            return
+        profile = self._monitoring_profile()
+        storage = self._monitoring_storage()
+        unapplied = set(self._check_monitoring_values(values_file))
+        
+        def mark(label: str) -> str:
+            return '（未生效）' if label in unapplied else ''
+        
+        storage_options = self.config.get('storage', {})
+        active_series = (storage_options.get('prometheus') or {}).get(
+            'active_series', MONITORING_STORAGE_DEFAULTS['prometheus']['active_series'])
+        loki_options = {**MONITORING_STORAGE_DEFAULTS['loki'], **(storage_options.get('loki') or {})}
+        sampling = 1.0 if '访问日志采样' in unapplied else profile['access_log_sampling']
+        click.echo(f"  监控档位: {profile['name']}：采集间隔 {storage['prometheus']['scrape_interval']}"
+                   f"{mark('Prometheus 采集间隔')}，丢弃 {len(profile['drop_metrics'])} 组 Envoy 指标{mark('Envoy 指标丢弃')}，"
+                   f"访问日志采样 {profile['access_log_sampling']:.0%}{mark('访问日志采样')}")
+        if 'Prometheus 采集间隔' in unapplied:
+            samples = "未知（采集间隔取 Chart 默认值）"
+        else:
+            samples = f"{active_series / _parse_retention(storage['prometheus']['scrape_interval']):,.0f} 样本/s"
+        limit = "Loki 限速未生效" if 'Loki 限速' in unapplied else f"Loki 限速 {profile['loki_ingestion_rate_mb']} MB/s"
+        click.echo(f"  预计写入: {samples}，{loki_options['log_lines_per_second'] * sampling:,.0f} 行日志/s（{limit}）")
+        
+        groups = self._node_groups()
+        data, error = self._query_aws(['ec2', 'describe-instance-types', '--instance-types',
+                                       *sorted({group['instance_type'] for group in groups})])
+        if not data:
+            click.echo(f"  ⚠ 无法查询实例类型，跳过监控开销估算: {error}")
+            return
+        vcpus = {item['InstanceType']: item['VCpuInfo']['DefaultVCpus'] for item in data.get('InstanceTypes', [])}
+        node_millicores = sum(vcpus.get(group['instance_type'], 0) * 1000 * group['desired_capacity']
+                              for group in groups)
+        monitoring_millicores = sum(_cpu_millicores(resources['requests']['cpu'])
+                                    for resources in MONITORING_RESOURCES.values())
+        if not node_millicores:
+            return
+        percent = monitoring_millicores / node_millicores * 100
+        budget = self.config.get('monitoring', {}).get('budget_percent', MONITORING_BUDGET_PERCENT)
+        if percent > budget:
+            click.echo(f"  ⚠ 监控组件 CPU request {monitoring_millicores}m，占节点 CPU {percent:.1f}%，"
+                       f"超出预算 {budget}%，可改用更低的 monitoring.profile 或增加节点")
+        else:
+            click.echo(f"  ✓ 监控组件 CPU request {monitoring_millicores}m，占节点 CPU {percent:.1f}%（预算 {budget}%）")
+    
+    def _controller_values(self, controller: Dict[str, Any]) -> Dict[str, Any]:
+        """按 higress.controller 生成 controller 和 pilot（xDS 下发）的 values"""
+        options = {**CONTROLLER_DEFAULTS, **(self.config.get('higress', {}).get('controller') or {})}
+        values = {'controller': {
+            **controller,
+            'replicas': options['replicas'],
+            'resources': {
+                'requests': {'cpu': options['cpu_request'], 'memory': options['memory_request']},
+                'limits': {'cpu': options['cpu_limit'], 'memory': options['memory_limit']}
+            }
+        }}
+        pilot = {}
+        if options.get('pilot_cpu_request') or options.get('pilot_memory_request'):
+            pilot['resources'] = {'requests': {
+                key: options[f'pilot_{key}_request'] for key in ('cpu', 'memory')
+                if options.get(f'pilot_{key}_request')
+            }}
+        env = {name: str(options[key]) for key, name in PILOT_ENV_OPTIONS.items() if key in options}
+        if env:
+            pilot['env'] = env
+        if pilot:
+            values['pilot'] = pilot
+        return values
+    
     def _generate_higress_values_file(self):
         """生成 Higress Helm values 文件"""
         higress_config = self.config.get('higress', {})
         use_alb = higress_config.get('use_alb', True)
         enable_monitoring = higress_config.get('enable_monitoring', False)
         
+        # 按可用区数量分散 Gateway，PDB 允许同时中断一个可用区内的副本；
+        # 使用 maxUnavailable，单副本时也能排空节点，不会阻塞节点替换和集群升级
+        az_count = self._get_az_count()
+        if higress_config.get('enable_autoscaling', True):
+            base_replicas = higress_config.get('min_replicas', 3)
+        else:
+            base_replicas = higress_config.get('replicas', 3)
+        pdb_max_unavailable = max(1, math.ceil(base_replicas / az_count))
+        topology_spread = [{
+            'maxSkew': 1,
+            'topologyKey': 'topology.kubernetes.io/zone',
+            'whenUnsatisfiable': 'ScheduleAnyway',
+            'labelSelector': {'matchLabels': {'app': 'higress-gateway'}}
+        }]
+        # Prometheus/Loki 的卷容量和保留时长按负载假设和监控档位计算
+        storage = self._monitoring_storage()
+        
         if use_alb:
             values = {
                 'global': {
@@ -215,6 +2769,7 @@ class HigressDeployer:
                             ]
                         },
                         'affinity': {
+                            'nodeAffinity': self._gateway_node_affinity(),
                             'podAntiAffinity': {
                                 'requiredDuringSchedulingIgnoredDuringExecution': [{
                                     'labelSelector': {
@@ -228,9 +2783,10 @@ class HigressDeployer:
                                 }]
                             }
                         },
+                        'topologySpreadConstraints': topology_spread,
                         'podDisruptionBudget': {
                             'enabled': True,
-                            'minAvailable': 2
+                            'maxUnavailable': pdb_max_unavailable
                         },
                         'autoscaling': {
                             'enabled': higress_config.get('enable_autoscaling', True),
@@ -241,11 +2797,7 @@ class HigressDeployer:
                         }
                     },
                     'controller': {
-                        'replicas': 2,
-                        'resources': {
-                            'requests': {'cpu': '500m', 'memory': '1Gi'},
-                            'limits': {'cpu': '1000m', 'memory': '2Gi'}
-                        }
+                        'affinity': {'nodeAffinity': self._gateway_node_affinity()}
                     }
                 },
                 'higress-console': {
@@ -263,20 +2815,7 @@ class HigressDeployer:
                             'size': '10Gi'
                         }
                     },
-                    'prometheus': {
-                        'persistence': {
-                            'enabled': True,
-                            'storageClassName': 'ebs-gp3',
-                            'size': '20Gi'
-                        }
-                    },
-                    'loki': {
-                        'persistence': {
-                            'enabled': True,
-                            'storageClassName': 'ebs-gp3',
-                            'size': '20Gi'
-                        }
-                    }
+                    **self._monitoring_values(storage)
                 }
             }
         else:
@@ -296,7 +2835,12 @@ class HigressDeployer:
                                 'service.beta.kubernetes.io/aws-load-balancer-scheme': 'internet-facing',
                                 'service.beta.kubernetes.io/aws-load-balancer-cross-zone-load-balancing-enabled': 'true'
                             }
-                        }
+                        },
+                        'affinity': {'nodeAffinity': self._gateway_node_affinity()},
+                        'topologySpreadConstraints': topology_spread
+                    },
+                    'controller': {
+                        'affinity': {'nodeAffinity': self._gateway_node_affinity()}
                     }
                 },
                 'higress-console': {
@@ -308,27 +2852,126 @@ class HigressDeployer:
                             'size': '10Gi'
                         }
                     },
-                    'prometheus': {
-                        'persistence': {
-                            'enabled': True,
-                            'storageClassName': 'ebs-gp3',
-                            'size': '20Gi'
-                        }
-                    },
-                    'loki': {
-                        'persistence': {
-                            'enabled': True,
-                            'storageClassName': 'ebs-gp3',
-                            'size': '20Gi'
-                        }
-                    }
+                    **self._monitoring_values(storage)
                 }
             }
         
+        # 按优先级层级分配 PriorityClass，节点资源紧张时监控组件让位于 Gateway
+        core_values = values['higress-core']
+        core_values['gateway']['priorityClassName'] = 'higress-gateway'
+        core_values.setdefault('controller', {})['priorityClassName'] = 'higress-controller'
+        # Controller 副本数和资源按 higress.controller 配置，路由多时调大以缩短配置下发时间
+        core_values.update(self._controller_values(core_values['controller']))
+        console_values = values['higress-console']
+        console_values['priorityClassName'] = 'higress-console'
+        # 启用 Spot 节点组时 Console 和监控组件优先调度到 Spot 节点
+        spot_enabled = bool(self._spot_node_group())
+        if spot_enabled:
+            console_values.update(self._spot_scheduling())
+        for component, resources in MONITORING_RESOURCES.items():
+            component_values = console_values.setdefault(component, {})
+            component_values['priorityClassName'] = 'higress-monitoring'
+            component_values.setdefault('resources', resources)
+            if spot_enabled:
+                component_values.update(self._spot_scheduling())
+            # 挂载 EBS 卷的 Pod 迁移需要重新挂载卷，禁止 Cluster Autoscaler 缩容时驱逐
+            component_values['podAnnotations'] = {
+                'cluster-autoscaler.kubernetes.io/safe-to-evict': 'false'
+            }
+        
         values_file = 'higress-values.yaml'
         with open(values_file, 'w', encoding='utf-8') as f:
             yaml.dump(values, f, default_flow_style=False)
     
+    def _get_headroom_replicas(self) -> int:
+        """根据 Gateway 最大副本数和预期突发倍数计算占位 Pod 数量"""
+        headroom_config = self.config.get('headroom', {})
+        if 'replicas' in headroom_config:
+            return headroom_config['replicas']
+        max_replicas = self.config.get('higress', {}).get('max_replicas', 10)
+        burst_factor = headroom_config.get('burst_factor', 1.3)
+        return max(1, math.ceil(max_replicas * (burst_factor - 1)))
+    
+    def _render_priority_classes(self) -> List[Dict[str, Any]]:
+        """生成 PriorityClass 清单"""
+        priority_classes = []
+        for name, (value, preemption_policy, description) in PRIORITY_CLASSES.items():
+            priority_classes.append({
+                'apiVersion': 'scheduling.k8s.io/v1',
+                'kind': 'PriorityClass',
+                'metadata': {'name': name},
+                'value': value,
+                'preemptionPolicy': preemption_policy,
+                'globalDefault': False,
+                'description': description
+            })
+        return priority_classes
+    
+    def _generate_priority_classes_file(self) -> str:
+        """生成 PriorityClass 配置文件"""
+        priority_file = 'higress-priority-classes.yaml'
+        with open(priority_file, 'w', encoding='utf-8') as f:
+            yaml.dump_all(self._render_priority_classes(), f, default_flow_style=False, allow_unicode=True)
+        return priority_file
+    
+    def _render_headroom_manifests(self) -> List[Dict[str, Any]]:
+        """生成扩容预留清单：与 Gateway 同规格的低优先级 pause Pod"""
+        higress_config = self.config.get('higress', {})
+        headroom = {
+            'apiVersion': 'apps/v1',
+            'kind': 'Deployment',
+            'metadata': {
+                'name': 'higress-headroom',
+                'namespace': 'higress-system',
+                'labels': {'app': 'higress-headroom'}
+            },
+            'spec': {
+                'replicas': self._get_headroom_replicas(),
+                'selector': {'matchLabels': {'app': 'higress-headroom'}},
+                'template': {
+                    'metadata': {'labels': {'app': 'higress-headroom'}},
+                    'spec': {
+                        'priorityClassName': 'higress-headroom',
+                        'terminationGracePeriodSeconds': 0,
+                        # 占位 Pod 与 Gateway 互斥（每节点一个），被抢占后腾出的节点可直接调度新 Gateway
+                        'affinity': {
+                            'nodeAffinity': self._gateway_node_affinity(),
+                            'podAntiAffinity': {
+                                'requiredDuringSchedulingIgnoredDuringExecution': [{
+                                    'labelSelector': {
+                                        'matchExpressions': [{
+                                            'key': 'app',
+                                            'operator': 'In',
+                                            'values': ['higress-gateway', 'higress-headroom']
+                                        }]
+                                    },
+                                    'topologyKey': 'kubernetes.io/hostname'
+                                }]
+                            }
+                        },
+                        'containers': [{
+                            'name': 'pause',
+                            'image': 'registry.k8s.io/pause:3.9',
+                            'resources': {
+                                'requests': {
+                                    'cpu': higress_config.get('cpu_request', '1000m'),
+                                    'memory': higress_config.get('memory_request', '2Gi')
+                                }
+                            }
+                        }]
+                    }
+                }
+            }
+        }
+        return [headroom]
+    
+    def _generate_headroom_file(self) -> str:
+        """生成扩容预留配置文件"""
+        headroom_file = 'higress-headroom.yaml'
+        with open(headroom_file, 'w', encoding='utf-8') as f:
+            yaml.dump_all(self._render_headroom_manifests(), f, default_flow_style=False)
+        return headroom_file
+    
     def _generate_alb_ingress_file(self):
         """生成 ALB Ingress 配置文件"""
         config = self.config
@@ -393,76 +3036,449 @@ class HigressDeployer:
     def _run_command(self, cmd: str, check: bool = True, capture: bool = False) -> Optional[str]:
         """执行 shell 命令"""
         click.echo(f"执行: {cmd}")
-        try:
+        with TRACER.span(' '.join(cmd.split()), kind='command') as span:
             if capture:
-                result = subprocess.run(
-                    cmd, shell=True, check=check,
-                    capture_output=True, text=True
-                )
-                return result.stdout.strip()
+                result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+                span['output_bytes'] = len(result.stdout) + len(result.stderr)
             else:
-                subprocess.run(cmd, shell=True, check=check)
-                return None
-        except subprocess.CalledProcessError as e:
-            if check:
-                click.echo(f"✗ 命令执行失败: {e}", err=True)
-                sys.exit(1)
-            return None
+                result = subprocess.run(cmd, shell=True)
+            span['exit_code'] = result.returncode
+        
+        if result.returncode != 0 and check:
+            click.echo(f"✗ 命令执行失败: {cmd}（退出码 {result.returncode}）", err=True)
+            sys.exit(1)
+        return result.stdout.strip() if capture else None
+    
+    def _query_aws(self, args: List[str], timeout: int = 15,
+                   region: Optional[str] = None) -> Tuple[Optional[Any], str]:
+        """以 JSON 输出执行 AWS CLI 只读查询，返回 (结果, 错误信息)"""
+        cmd = ['aws', *args, '--region', region or self.config['aws']['region'], '--output', 'json']
+        with TRACER.span(' '.join(cmd), kind='command') as span:
+            try:
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+            except FileNotFoundError:
+                span['error'] = 'FileNotFoundError'
+                return None, "AWS CLI 未安装"
+            except subprocess.TimeoutExpired:
+                span['error'] = 'TimeoutExpired'
+                return None, f"超时（{timeout}秒）"
+            span['exit_code'] = result.returncode
+            span['output_bytes'] = len(result.stdout) + len(result.stderr)
+        if result.returncode != 0:
+            lines = result.stderr.strip().splitlines()
+            return None, lines[-1] if lines else f"退出码 {result.returncode}"
+        try:
+            return json.loads(result.stdout or 'null'), ''
+        except json.JSONDecodeError:
+            return None, "无法解析 AWS CLI 输出"
     
-    def _check_prerequisites(self):
-        """检查必要的工具是否安装"""
+    def _preflight_tools(self) -> List[Tuple[str, str, str]]:
+        """检查必要工具及其版本"""
         tools = {
-            'aws': 'AWS CLI',
-            'kubectl': 'kubectl',
-            'eksctl': 'eksctl',
-            'helm': 'Helm'
+            'aws': ('AWS CLI', ['aws', '--version']),
+            'kubectl': ('kubectl', ['kubectl', 'version', '--client']),
+            'eksctl': ('eksctl', ['eksctl', 'version']),
+            'helm': ('Helm', ['helm', 'version', '--short'])
         }
         
-        click.echo("检查必要工具...")
-        missing = []
+        results = []
+        for cmd, (name, version_cmd) in tools.items():
+            if not shutil.which(cmd):
+                results.append(('fail', name, "未安装"))
+                continue
+            try:
+                output = subprocess.run(version_cmd, capture_output=True, text=True, timeout=10)
+                lines = (output.stdout or output.stderr).strip().splitlines()
+                version = lines[0] if lines else '未知版本'
+            except subprocess.TimeoutExpired:
+                version = '未知版本'
+            results.append(('ok', name, version))
+        return results
+    
+    def _preflight_identity(self) -> List[Tuple[str, str, str]]:
+        """检查 AWS 凭证"""
+        identity, error = self._query_aws(['sts', 'get-caller-identity'])
+        if not identity:
+            return [('fail', 'AWS 凭证', error)]
+        
+        results = [('ok', 'AWS 凭证', identity.get('Arn', ''))]
+        expected = str(self.config['aws'].get('account_id', '')).strip()
+        if expected.isdigit() and expected != identity.get('Account'):
+            results.append(('fail', 'AWS 账户', f"当前账户 {identity.get('Account')} 与配置 {expected} 不一致"))
+        return results
+    
+    def _get_service_quota(self, service: str, quota_code: str) -> Tuple[Optional[float], str]:
+        """获取服务配额值"""
+        data, error = self._query_aws([
+            'service-quotas', 'get-service-quota',
+            '--service-code', service, '--quota-code', quota_code
+        ])
+        if not data:
+            return None, error
+        return data['Quota']['Value'], ''
+    
+    def _preflight_vcpu_quota(self) -> List[Tuple[str, str, str]]:
+        """检查实例类型及架构，以及 EC2 vCPU 配额是否满足所有节点组的扩容上限"""
+        groups = self._node_groups()
+        instance_types = sorted({group['instance_type'] for group in groups})
+        
+        types, error = self._query_aws(['ec2', 'describe-instance-types', '--instance-types', *instance_types])
+        if not types or not types.get('InstanceTypes'):
+            return [('fail', 'EC2 实例类型', f"{', '.join(instance_types)}: {error or '不可用'}")]
+        info = {item['InstanceType']: item for item in types['InstanceTypes']}
+        
+        results = []
+        required = 0
+        parts = []
+        for group in groups:
+            item = info.get(group['instance_type'])
+            if not item:
+                results.append(('fail', group['name'], f"{group['instance_type']} 在当前区域不可用"))
+                continue
+            vcpus = item['VCpuInfo']['DefaultVCpus']
+            required += vcpus * group['max_size']
+            parts.append(f"{group['max_size']} x {vcpus}")
+            supported = item.get('ProcessorInfo', {}).get('SupportedArchitectures', [])
+            expected = 'x86_64' if group['architecture'] == 'amd64' else group['architecture']
+            if supported and expected not in supported:
+                results.append(('fail', group['name'], f"{group['instance_type']} 支持 {', '.join(supported)}，"
+                                                      f"与推断的 {group['architecture']} 不符"))
+            else:
+                results.append(('ok', group['name'], f"{group['instance_type']}（{group['architecture']}，{vcpus} vCPU）"))
+        
+        quota, error = self._get_service_quota('ec2', QUOTA_EC2_STANDARD_VCPU)
+        if quota is None:
+            results.append(('warn', 'EC2 vCPU 配额', f"无法获取: {error}"))
+        else:
+            message = f"需要 {required} ({' + '.join(parts)} vCPU)，配额 {int(quota)}"
+            results.append(('ok' if quota >= required else 'fail', 'EC2 vCPU 配额', message))
+        
+        spot = self._spot_node_group()
+        if spot:
+            results += self._preflight_spot_quota(spot)
+        return results
+    
+    def _preflight_spot_quota(self, spot: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+        """检查 Spot 实例类型是否可用，以及 Spot vCPU 配额（按最大的实例类型估算）"""
+        types, error = self._query_aws(['ec2', 'describe-instance-types', '--instance-types', *spot['instance_types']])
+        if not types or not types.get('InstanceTypes'):
+            return [('fail', spot['name'], f"{', '.join(spot['instance_types'])}: {error or '不可用'}")]
+        vcpus = {item['InstanceType']: item['VCpuInfo']['DefaultVCpus'] for item in types['InstanceTypes']}
+        missing = [t for t in spot['instance_types'] if t not in vcpus]
+        results = [('warn' if missing else 'ok', spot['name'],
+                    f"Spot {len(vcpus)} 种实例类型" + (f"，不可用: {', '.join(missing)}" if missing else ''))]
+        
+        required = max(vcpus.values()) * spot['max_size']
+        quota, error = self._get_service_quota('ec2', QUOTA_EC2_SPOT_VCPU)
+        if quota is None:
+            return results + [('warn', 'EC2 Spot vCPU 配额', f"无法获取: {error}")]
+        message = f"需要 {required} ({spot['max_size']} x {max(vcpus.values())} vCPU)，配额 {int(quota)}"
+        return results + [('ok' if quota >= required else 'fail', 'EC2 Spot vCPU 配额', message)]
+    
+    def _preflight_elb_quota(self) -> List[Tuple[str, str, str]]:
+        """检查 ALB 配额余量"""
+        quota, error = self._get_service_quota('elasticloadbalancing', QUOTA_ALB_PER_REGION)
+        if quota is None:
+            return [('warn', 'ALB 配额', f"无法获取: {error}")]
+        lbs, error = self._query_aws(['elbv2', 'describe-load-balancers'])
+        if lbs is None:
+            return [('warn', 'ALB 配额', f"无法统计现有负载均衡器: {error}")]
+        used = sum(1 for lb in lbs.get('LoadBalancers', []) if lb.get('Type') == 'application')
+        message = f"已使用 {used}/{int(quota)}"
+        return [('ok' if used < quota else 'fail', 'ALB 配额', message)]
+    
+    def _preflight_eip_quota(self) -> List[Tuple[str, str, str]]:
+        """检查弹性 IP 配额余量"""
+        quota, error = self._get_service_quota('ec2', QUOTA_EIP_PER_REGION)
+        if quota is None:
+            return [('warn', 'EIP 配额', f"无法获取: {error}")]
+        addresses, error = self._query_aws(['ec2', 'describe-addresses'])
+        if addresses is None:
+            return [('warn', 'EIP 配额', f"无法统计现有 EIP: {error}")]
+        used = len(addresses.get('Addresses', []))
+        message = f"已使用 {used}/{int(quota)}"
+        # eksctl 使用已有 VPC 时不创建 NAT 网关，EIP 不足只给出警告
+        return [('ok' if used < quota else 'warn', 'EIP 配额', message)]
+    
+    def _preflight_subnets(self) -> List[Tuple[str, str, str]]:
+        """检查子网是否存在、所属 VPC、可用区及剩余 IP"""
+        vpc = self.config['vpc']
+        subnet_ids = vpc['public_subnets'] + vpc['private_subnets']
+        subnets, error = self._describe_subnets()
+        if not subnets:
+            return [('fail', '子网', error)]
+        
+        private_count = max(len(vpc['private_subnets']), 1)
+        spot = self._spot_node_group()
+        max_nodes = sum(group['max_size'] for group in self._node_groups()) + (spot['max_size'] if spot else 0)
+        min_ips = math.ceil(max_nodes / private_count) * PREFLIGHT_IPS_PER_NODE
+        
+        results = []
+        for subnet_id in subnet_ids:
+            subnet = subnets.get(subnet_id)
+            if not subnet:
+                results.append(('fail', subnet_id, "子网不存在"))
+                continue
+            if subnet['VpcId'] != vpc['vpc_id']:
+                results.append(('fail', subnet_id, f"不属于 {vpc['vpc_id']}（实际 {subnet['VpcId']}）"))
+                continue
+            free_ips = subnet['AvailableIpAddressCount']
+            message = f"{subnet['AvailabilityZone']}，剩余 IP {free_ips}"
+            if subnet_id in vpc['private_subnets'] and free_ips < min_ips:
+                results.append(('warn', subnet_id, f"{message}（建议至少 {min_ips}）"))
+            else:
+                results.append(('ok', subnet_id, message))
+        
+        for name, key in [('公有子网', 'public_subnets'), ('私有子网', 'private_subnets')]:
+            azs = {subnets[subnet]['AvailabilityZone'] for subnet in vpc[key] if subnet in subnets}
+            if len(azs) < MIN_AZ_COUNT:
+                results.append(('fail', name, f"仅覆盖 {len(azs)} 个可用区，至少需要 {MIN_AZ_COUNT} 个"))
+        return results
+    
+    def _preflight_iam_policies(self) -> List[Tuple[str, str, str]]:
+        """检查已存在的 IAM 策略"""
+        data, error = self._query_aws(['iam', 'list-policies', '--scope', 'Local'], timeout=30)
+        if data is None:
+            return [('warn', 'IAM 策略', f"无法列出策略: {error}")]
+        
+        existing = {policy['PolicyName'] for policy in data.get('Policies', [])}
+        results = []
+        for policy_name in ['AWSLoadBalancerControllerIAMPolicy', 'AmazonEKS_EBS_CSI_Driver_Policy']:
+            if policy_name in existing:
+                results.append(('ok', policy_name, "已存在，将复用"))
+            else:
+                results.append(('ok', policy_name, "不存在"))
+        return results
+    
+    @traced_step
+    def preflight(self) -> bool:
+        """并行执行所有预检项，返回是否全部通过"""
+        click.echo("\n执行预检...")
+        checks = [
+            ('工具', self._preflight_tools),
+            ('凭证', self._preflight_identity),
+            ('vCPU 配额', self._preflight_vcpu_quota),
+            ('ALB 配额', self._preflight_elb_quota),
+            ('EIP 配额', self._preflight_eip_quota),
+            ('子网', self._preflight_subnets),
+            ('IAM', self._preflight_iam_policies),
+        ]
+        
+        def run_check(group, check, parent_id):
+            with TRACER.span(group, kind='check', parent_id=parent_id):
+                return check()
         
-        for cmd, name in tools.items():
-            result = subprocess.run(
-                f"which {cmd}", shell=True,
-                capture_output=True, text=True
-            )
-            if result.returncode == 0:
-                click.echo(f"  ✓ {name}")
-            else:
-                click.echo(f"  ✗ {name} 未安装")
-                missing.append(name)
+        start = time.monotonic()
+        parent_id = TRACER.current_span_id()
+        with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+            futures = [(group, executor.submit(run_check, group, check, parent_id)) for group, check in checks]
+            results = []
+            for group, future in futures:
+                try:
+                    results.append((group, future.result()))
+                except Exception as e:
+                    results.append((group, [('fail', group, f"检查异常: {e}")]))
+        elapsed = time.monotonic() - start
         
-        if missing:
-            click.echo(f"\n请先安装以下工具: {', '.join(missing)}")
-            sys.exit(1)
+        icons = {'ok': '✓', 'warn': '⚠', 'fail': '✗'}
+        failed = False
+        for group, items in results:
+            click.echo(f"【{group}】")
+            for level, name, message in items:
+                click.echo(f"  {icons[level]} {name}: {message}")
+                failed = failed or level == 'fail'
+        
+        if failed:
+            click.echo(f"\n✗ 预检未通过（耗时 {elapsed:.1f}秒）")
+        else:
+            click.echo(f"\n✓ 预检通过（耗时 {elapsed:.1f}秒）")
+        return not failed
     
     def _get_aws_account_id(self) -> str:
         """获取 AWS 账户 ID"""
         cmd = "aws sts get-caller-identity --query Account --output text"
         return self._run_command(cmd, capture=True)
     
+    def _run_parallel(self, commands: List[Tuple[str, List[str]]], timeout: Optional[float] = None,
+                      stream: Optional[bool] = None) -> List[CommandResult]:
+        """并发执行相互独立的命令，返回结构化结果"""
+        return asyncio.run(self.runner.run_all(commands, timeout=timeout, stream=stream))
+    
+    def _find_owned_lb_resources(self, stack: Optional[str] = None) -> Optional[Dict[str, List[str]]]:
+        """按 ALB Controller 的标签查找本集群拥有的负载均衡器、目标组和安全组
+        
+        stack 为命名空间（如 higress-system）或 命名空间/名称 时只返回对应 Ingress/Service 的资源；
+        查询失败时返回 None。
+        """
+        data, error = self._query_aws([
+            'resourcegroupstaggingapi', 'get-resources',
+            '--tag-filters', f"Key={ELB_OWNER_TAG},Values={self.config['eks']['cluster_name']}",
+            '--resource-type-filters',
+            'elasticloadbalancing:loadbalancer', 'elasticloadbalancing:targetgroup', 'ec2:security-group'
+        ], timeout=30)
+        if data is None:
+            click.echo(f"⚠ 无法查询负载均衡资源: {error}")
+            return None
+        
+        resources = {'load_balancers': [], 'target_groups': [], 'security_groups': []}
+        for item in data.get('ResourceTagMappingList', []):
+            tags = {tag['Key']: tag['Value'] for tag in item.get('Tags', [])}
+            if stack and not any(
+                tags.get(key) == stack or tags.get(key, '').startswith(stack + '/')
+                for key in ELB_STACK_TAGS
+            ):
+                continue
+            arn = item['ResourceARN']
+            if ':loadbalancer/' in arn:
+                resources['load_balancers'].append(arn)
+            elif ':targetgroup/' in arn:
+                resources['target_groups'].append(arn)
+            elif ':security-group/' in arn:
+                resources['security_groups'].append(arn.rsplit('/', 1)[-1])
+        return resources
+    
+    def _remaining_lb_resources(self, resources: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """并行查询仍然存在的资源；某项查询失败时视为该类资源仍然存在
+        
+        负载均衡器删除后其网络接口（ENI）还会保留一段时间，它们才是删除 VPC 依赖失败的原因，
+        因此按描述 "ELB app/<名称>/<ID>" 一并跟踪。
+        """
+        def remaining_load_balancers():
+            data, _ = self._query_aws(['elbv2', 'describe-load-balancers'], timeout=30)
+            if data is None:
+                return resources['load_balancers']
+            existing = {lb['LoadBalancerArn'] for lb in data.get('LoadBalancers', [])}
+            return [arn for arn in resources['load_balancers'] if arn in existing]
+        
+        def remaining_target_groups():
+            data, _ = self._query_aws(['elbv2', 'describe-target-groups'], timeout=30)
+            if data is None:
+                return resources['target_groups']
+            existing = {tg['TargetGroupArn'] for tg in data.get('TargetGroups', [])}
+            return [arn for arn in resources['target_groups'] if arn in existing]
+        
+        def remaining_network_interfaces():
+            descriptions = [f"ELB {arn.split(':loadbalancer/', 1)[1]}" for arn in resources['load_balancers']]
+            data, _ = self._query_aws([
+                'ec2', 'describe-network-interfaces',
+                '--filters', json.dumps([{'Name': 'description', 'Values': descriptions}])
+            ], timeout=30)
+            if data is None:
+                return descriptions
+            return [eni['NetworkInterfaceId'] for eni in data.get('NetworkInterfaces', [])]
+        
+        def remaining_security_groups():
+            data, _ = self._query_aws([
+                'ec2', 'describe-security-groups',
+                '--filters', json.dumps([{'Name': 'group-id', 'Values': resources['security_groups']}])
+            ], timeout=30)
+            if data is None:
+                return resources['security_groups']
+            return [sg['GroupId'] for sg in data.get('SecurityGroups', [])]
+        
+        queries = {
+            'load_balancers': remaining_load_balancers if resources['load_balancers'] else None,
+            'target_groups': remaining_target_groups if resources['target_groups'] else None,
+            'network_interfaces': remaining_network_interfaces if resources['load_balancers'] else None,
+            'security_groups': remaining_security_groups if resources['security_groups'] else None,
+        }
+        with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+            futures = {key: executor.submit(query) for key, query in queries.items() if query}
+            return {key: futures[key].result() if key in futures else [] for key in queries}
+    
+    def _wait_for_lb_resources_deleted(self, resources: Dict[str, List[str]],
+                                       timeout: int = TEARDOWN_TIMEOUT) -> Dict[str, List[str]]:
+        """轮询直到所有资源都已删除或超时，返回仍然存在的资源"""
+        labels = {
+            'load_balancers': '负载均衡器',
+            'target_groups': '目标组',
+            'network_interfaces': '网络接口',
+            'security_groups': '安全组',
+        }
+        start = time.monotonic()
+        last_counts = None
+        while True:
+            remaining = self._remaining_lb_resources(resources)
+            counts = {key: len(value) for key, value in remaining.items()}
+            if not any(counts.values()):
+                return remaining
+            if counts != last_counts:
+                summary = '，'.join(f"{labels[key]} {count}" for key, count in counts.items() if count)
+                click.echo(f"  等待删除: {summary}（{time.monotonic() - start:.0f}秒）")
+                last_counts = counts
+            if time.monotonic() - start >= timeout:
+                return remaining
+            CommandSimulator.sleep(TEARDOWN_POLL_INTERVAL)
+    
+    def _release_load_balancers(self, resources: Dict[str, List[str]],
+                                timeout: int = TEARDOWN_TIMEOUT) -> bool:
+        """等待 ALB Controller 删除负载均衡资源；超时后直接删除残留资源并再次等待"""
+        if not any(resources.values()):
+            click.echo("✓ 没有需要等待的负载均衡资源")
+            return True
+        
+        click.echo(
+            f"跟踪 {len(resources['load_balancers'])} 个负载均衡器、"
+            f"{len(resources['target_groups'])} 个目标组、{len(resources['security_groups'])} 个安全组的删除..."
+        )
+        remaining = self._wait_for_lb_resources_deleted(resources, timeout)
+        if not any(remaining.values()):
+            click.echo("✓ 负载均衡资源已全部删除")
+            return True
+        
+        # ALB Controller 未能及时清理（例如已被卸载），按依赖顺序直接删除：负载均衡器 → 目标组 → 安全组
+        click.echo("⚠ 等待超时，直接删除残留的负载均衡资源...")
+        region = self.config['aws']['region']
+        self._run_parallel([
+            (f"删除负载均衡器 {arn.rsplit('/', 2)[-2]}",
+             ['aws', 'elbv2', 'delete-load-balancer', '--load-balancer-arn', arn, '--region', region])
+            for arn in remaining['load_balancers']
+        ], timeout=60)
+        self._wait_for_lb_resources_deleted({**resources, 'target_groups': [], 'security_groups': []}, timeout)
+        self._run_parallel([
+            (f"删除目标组 {arn.rsplit('/', 2)[-2]}",
+             ['aws', 'elbv2', 'delete-target-group', '--target-group-arn', arn, '--region', region])
+            for arn in remaining['target_groups']
+        ] + [
+            (f"删除安全组 {sg}", ['aws', 'ec2', 'delete-security-group', '--group-id', sg, '--region', region])
+            for sg in remaining['security_groups']
+        ], timeout=60)
+        
+        remaining = self._wait_for_lb_resources_deleted(resources, timeout)
+        if any(remaining.values()):
+            leftover = [item for value in remaining.values() for item in value]
+            click.echo(f"✗ 以下资源仍未删除，可能需要手动处理: {', '.join(leftover)}", err=True)
+            return False
+        click.echo("✓ 负载均衡资源已全部删除")
+        return True
+    
     def _tag_subnets(self):
         """为子网添加 EKS 必需的标签"""
         click.echo("\n为子网添加标签...")
         cluster_name = self.config['eks']['cluster_name']
+        region = self.config['aws']['region']
+        cluster_tag = f"Key=kubernetes.io/cluster/{cluster_name},Value=shared"
         
-        # 公有子网标签
+        # 公有子网和私有子网的标签互不依赖，并行添加
+        commands = []
         for subnet in self.config['vpc']['public_subnets']:
-            click.echo(f"  标记公有子网: {subnet}")
-            cmd = f"""aws ec2 create-tags --resources {subnet} \
-                --tags Key=kubernetes.io/role/elb,Value=1 \
-                       Key=kubernetes.io/cluster/{cluster_name},Value=shared \
-                --region {self.config['aws']['region']}"""
-            self._run_command(cmd, check=False)
-        
-        # 私有子网标签
+            commands.append((f"公有子网 {subnet}", [
+                'aws', 'ec2', 'create-tags', '--resources', subnet,
+                '--tags', 'Key=kubernetes.io/role/elb,Value=1', cluster_tag,
+                '--region', region
+            ]))
         for subnet in self.config['vpc']['private_subnets']:
-            click.echo(f"  标记私有子网: {subnet}")
-            cmd = f"""aws ec2 create-tags --resources {subnet} \
-                --tags Key=kubernetes.io/role/internal-elb,Value=1 \
-                       Key=kubernetes.io/cluster/{cluster_name},Value=shared \
-                --region {self.config['aws']['region']}"""
-            self._run_command(cmd, check=False)
+            commands.append((f"私有子网 {subnet}", [
+                'aws', 'ec2', 'create-tags', '--resources', subnet,
+                '--tags', 'Key=kubernetes.io/role/internal-elb,Value=1', cluster_tag,
+                '--region', region
+            ]))
+        
+        for (step, _), result in zip(commands, self._run_parallel(commands, timeout=60)):
+            if result.ok:
+                click.echo(f"  ✓ 标记{step}")
+            else:
+                click.echo(f"  ⚠ 标记{step}失败: {result.stderr or result.returncode}")
         
         click.echo("✓ 子网标签添加完成")
     
@@ -474,6 +3490,7 @@ class HigressDeployer:
         click.echo(f"✓ EKS 配置文件已生成: {config_file}")
         return config_file
 
+    @traced_step
     def _install_ebs_csi_driver(self):
         """安装 EBS CSI Driver addon"""
         click.echo("\n安装 EBS CSI Driver addon...")
@@ -484,14 +3501,14 @@ class HigressDeployer:
         
         # 创建 EBS CSI Driver 的 IAM 策略
         click.echo("创建 EBS CSI Driver IAM 策略...")
-        policy_url = "https://raw.githubusercontent.com/kubernetes-sigs/aws-ebs-csi-driver/master/docs/example-iam-policy.json"
-        self._run_command(f"curl -o ebs-csi-policy.json {policy_url}")
+        # 直接引用缓存中校验过的策略文档，不覆盖仓库中的 ebs-csi-policy.json（fix-ebs-csi.sh 使用）
+        policy_file = self._artifact('ebs-csi-iam-policy').resolve()
         
         policy_name = "AmazonEKS_EBS_CSI_Driver_Policy"
         policy_arn = f"arn:aws:iam::{account_id}:policy/{policy_name}"
         
         # 创建策略（如果不存在）
-        cmd = f"aws iam create-policy --policy-name {policy_name} --policy-document file://ebs-csi-policy.json"
+        cmd = f"aws iam create-policy --policy-name {policy_name} --policy-document file://{policy_file}"
         self._run_command(cmd, check=False)
         
         # 检查并删除现有的 ServiceAccount（如果存在冲突）
@@ -504,7 +3521,7 @@ class HigressDeployer:
         if check_sa and "ebs-csi-controller-sa" in check_sa:
             click.echo("发现现有的 ServiceAccount，删除以避免冲突...")
             self._run_command("kubectl delete serviceaccount ebs-csi-controller-sa -n kube-system", check=False)
-            time.sleep(5)
+            CommandSimulator.sleep(5)
         
         # 创建 IAM 服务账户
         click.echo("创建 EBS CSI Driver IAM 服务账户...")
@@ -582,7 +3599,7 @@ class HigressDeployer:
         # 等待 addon 就绪
         click.echo("等待 EBS CSI Driver addon 就绪...")
         for i in range(30):
-            time.sleep(10)
+            CommandSimulator.sleep(10)
             status_cmd = f"aws eks describe-addon --cluster-name {cluster_name} --addon-name aws-ebs-csi-driver --region {region} --query 'addon.status' --output text"
             status = self._run_command(status_cmd, check=False, capture=True)
             
@@ -604,14 +3621,55 @@ class HigressDeployer:
         
         click.echo("✓ EBS CSI Driver addon 安装完成")
     
+    def _verify_cluster_addons(self):
+        """验证 ClusterConfig 中声明的 addon 是否已激活"""
+        click.echo("\n验证 EKS addon 状态...")
+        cluster_name = self.config['eks']['cluster_name']
+        region = self.config['aws']['region']
+        
+        statuses = {}
+        for i in range(12):
+            result = self._run_command(
+                f"eksctl get addon --cluster {cluster_name} --region {region} -o json",
+                check=False, capture=True
+            )
+            try:
+                addons = json.loads(result) if result else []
+            except json.JSONDecodeError:
+                addons = []
+            statuses = {addon.get('Name'): addon.get('Status') for addon in addons}
+            
+            # 只要还有 addon 处于创建/更新中就继续等待
+            pending = [name for name in EKS_ADDONS if statuses.get(name) in ('CREATING', 'UPDATING')]
+            if not pending:
+                break
+            if (i + 1) % 3 == 0:
+                click.echo(f"  等待中... {', '.join(pending)}")
+            CommandSimulator.sleep(10)
+        
+        for name in EKS_ADDONS:
+            status = statuses.get(name)
+            if status == 'ACTIVE':
+                click.echo(f"  ✓ {name}")
+            else:
+                click.echo(f"  ⚠ {name}: {status or '未安装'}")
+        
+        # 旧版配置创建的集群没有声明 EBS CSI Driver，回退到手动安装
+        if 'aws-ebs-csi-driver' not in statuses:
+            click.echo("EBS CSI Driver addon 未在集群配置中声明，开始手动安装...")
+            self._install_ebs_csi_driver()
+    
+    @traced_step
     def create_eks_cluster(self):
         """创建 EKS 集群"""
         click.echo("\n" + "="*60)
         click.echo("开始创建 EKS 集群")
         click.echo("="*60)
         
-        # 检查工具
-        self._check_prerequisites()
+        # 预检：工具、凭证、配额和子网
+        if not self.preflight():
+            click.echo("请先解决以上问题再创建集群")
+            sys.exit(1)
         
         # 标记子网
         self._tag_subnets()
@@ -628,27 +3686,68 @@ class HigressDeployer:
         click.echo("\n验证集群状态...")
         self._run_command("kubectl get nodes")
         
-        # 安装 EBS CSI Driver
-        self._install_ebs_csi_driver()
+        # 验证 ClusterConfig 中声明的 addon
+        self._verify_cluster_addons()
+        
+        # Spot 节点组需要 Node Termination Handler 在回收前排空节点
+        if self._spot_node_group():
+            self.install_node_termination_handler()
         
         click.echo("\n" + "="*60)
         click.echo("✓ EKS 集群创建完成")
         click.echo("="*60)
     
-    def install_alb_controller(self):
-        """安装 AWS Load Balancer Controller"""
-        click.echo("\n" + "="*60)
-        click.echo("安装 AWS Load Balancer Controller")
-        click.echo("="*60)
-        
+    def _generate_nth_values_file(self) -> str:
+        """生成 Node Termination Handler 的 values：IMDS 模式，只在 Spot 节点上运行"""
+        values = {
+            'enableSpotInterruptionDraining': True,
+            'enableRebalanceMonitoring': True,
+            'enableRebalanceDraining': True,
+            'enableScheduledEventDraining': True,
+            'emitKubernetesEvents': True,
+            'daemonsetNodeSelector': {CAPACITY_TYPE_LABEL: 'SPOT'},
+            'daemonsetTolerations': [{'key': SPOT_NODE_TAINT, 'operator': 'Exists', 'effect': 'NoSchedule'}],
+        }
+        values_file = 'nth-values.yaml'
+        with open(values_file, 'w', encoding='utf-8') as f:
+            yaml.dump(values, f, default_flow_style=False)
+        return values_file
+    
+    @traced_step
+    def install_node_termination_handler(self):
+        """安装 AWS Node Termination Handler（Spot 回收通知和再平衡建议到达时排空节点）"""
+        click.echo("\n安装 AWS Node Termination Handler...")
+        chart = self._artifact('aws-node-termination-handler-chart')
+        values_file = self._generate_nth_values_file()
+        self._run_command(
+            f"helm upgrade --install aws-node-termination-handler {chart} -n kube-system -f {values_file}"
+        )
+        self._run_command(
+            "kubectl rollout status daemonset/aws-node-termination-handler -n kube-system --timeout=300s",
+            check=False
+        )
+        click.echo("✓ Node Termination Handler 安装完成")
+    
+    def _get_service_account_role_arn(self, name: str, namespace: str = 'kube-system') -> Optional[str]:
+        """获取 IRSA 服务账户绑定的 IAM 角色 ARN，不存在时返回 None"""
+        result = self._run_command(
+            f"kubectl get serviceaccount {name} -n {namespace} "
+            "-o jsonpath='{.metadata.annotations.eks\\.amazonaws\\.com/role-arn}'",
+            check=False, capture=True
+        )
+        if result and "arn:aws:iam" in result:
+            return result.strip()
+        return None
+    
+    def _create_alb_service_account(self):
+        """创建 ALB Controller IAM 策略和服务账户（用于未在 ClusterConfig 中声明的旧集群）"""
         region = self.config['aws']['region']
         cluster_name = self.config['eks']['cluster_name']
         account_id = self._get_aws_account_id()
         
-        # 下载 IAM 策略
-        click.echo("\n下载 IAM 策略...")
-        policy_url = "https://raw.githubusercontent.com/kubernetes-sigs/aws-load-balancer-controller/v2.7.0/docs/install/iam_policy.json"
-        self._run_command(f"curl -o iam-policy.json {policy_url}")
+        # 获取 IAM 策略（本地缓存）
+        click.echo("\n获取 IAM 策略...")
+        shutil.copyfile(self._artifact('alb-iam-policy'), 'iam-policy.json')
         
         # 添加缺失的权限
         click.echo("添加缺失的 ELB 权限...")
@@ -656,14 +3755,6 @@ class HigressDeployer:
             with open('iam-policy.json', 'r') as f:
                 policy = json.load(f)
             
-            # 需要添加的权限
-            additional_permissions = [
-                "elasticloadbalancing:DescribeListenerAttributes",
-                "elasticloadbalancing:ModifyListenerAttributes",
-                "elasticloadbalancing:DescribeListenerCertificates",
-                "elasticloadbalancing:ModifyListenerCertificates"
-            ]
-            
             # 只在第一个包含 elasticloadbalancing 权限的 Statement 中添加
             added = False
             for statement in policy.get('Statement', []):
@@ -674,7 +3765,7 @@ class HigressDeployer:
                         has_elb = any('elasticloadbalancing' in action for action in actions)
                         if has_elb:
                             # 添加缺失的权限
-                            for perm in additional_permissions:
+                            for perm in ALB_ADDITIONAL_PERMISSIONS:
                                 if perm not in actions:
                                     actions.append(perm)
                                     click.echo(f"  添加权限: {perm}")
@@ -737,15 +3828,30 @@ class HigressDeployer:
             --region={region} \
             --approve"""
         self._run_command(cmd)
+    
+    @traced_step
+    def install_alb_controller(self):
+        """安装 AWS Load Balancer Controller"""
+        click.echo("\n" + "="*60)
+        click.echo("安装 AWS Load Balancer Controller")
+        click.echo("="*60)
+        
+        region = self.config['aws']['region']
+        cluster_name = self.config['eks']['cluster_name']
         
-        # 添加 Helm 仓库
-        click.echo("\n添加 EKS Helm 仓库...")
-        self._run_command("helm repo add eks https://aws.github.io/eks-charts")
-        self._run_command("helm repo update")
+        # 服务账户已在 ClusterConfig 中声明，这里只做验证
+        click.echo("\n检查 IAM 服务账户...")
+        role_arn = self._get_service_account_role_arn('aws-load-balancer-controller')
+        if role_arn:
+            click.echo(f"✓ 服务账户已由 eksctl 创建: {role_arn}")
+        else:
+            click.echo("未找到服务账户（集群可能由旧版配置创建），开始手动创建...")
+            self._create_alb_service_account()
         
-        # 安装 Controller
+        # 安装 Controller（使用本地缓存的 Chart 包）
         click.echo("\n安装 AWS Load Balancer Controller...")
-        cmd = f"""helm install aws-load-balancer-controller eks/aws-load-balancer-controller \
+        chart = self._artifact('aws-load-balancer-controller-chart')
+        cmd = f"""helm install aws-load-balancer-controller {chart} \
             -n kube-system \
             --set clusterName={cluster_name} \
             --set serviceAccount.create=false \
@@ -774,13 +3880,13 @@ class HigressDeployer:
                 break
             if (i + 1) % 5 == 0:
                 click.echo(f"  等待中... ({i+1}秒)")
-            time.sleep(1)
+            CommandSimulator.sleep(1)
         else:
             click.echo("⚠ Webhook 服务等待超时，但将继续...")
         
         # 额外等待确保 webhook 完全就绪
         click.echo("等待 webhook 完全初始化...")
-        time.sleep(10)
+        CommandSimulator.sleep(10)
         
         self._run_command("kubectl get deployment -n kube-system aws-load-balancer-controller")
         
@@ -794,6 +3900,222 @@ class HigressDeployer:
         click.echo(f"✓ Higress 配置文件已生成: {values_file}")
         return values_file
 
+    def _registry_request(self, url: str, headers: List[str]) -> Tuple[int, Dict[str, str], str]:
+        """用 curl 请求镜像仓库 API，返回 (状态码, 响应头, 响应体)"""
+        argv = ['curl', '-sS', '-L', '--max-time', '15', '-D', '-']
+        for header in headers:
+            argv += ['-H', header]
+        result = self._run_parallel([('registry', [*argv, url])], stream=False)[0]
+        if not result.ok:
+            return 0, {}, result.stderr
+        return _parse_curl_response(result.stdout)
+    
+    def _image_architectures(self, image: str) -> Tuple[Optional[List[str]], str]:
+        """从镜像仓库读取清单，返回镜像支持的 CPU 架构（匿名拉取，按 Bearer 质询获取令牌）"""
+        registry, repository, reference = _parse_image_reference(image)
+        base = f"https://{registry}/v2/{repository}"
+        headers = [f"Accept: {', '.join(IMAGE_MANIFEST_MEDIA_TYPES)}"]
+        
+        status, response_headers, body = self._registry_request(f"{base}/manifests/{reference}", headers)
+        if status == 401:
+            challenge = response_headers.get('www-authenticate', '')
+            params = dict(re.findall(r'(\w+)="([^"]*)"', challenge))
+            if not challenge.lower().startswith('bearer') or 'realm' not in params:
+                return None, "仓库需要认证"
+            query = urllib.parse.urlencode({
+                'service': params.get('service', registry),
+                'scope': params.get('scope', f"repository:{repository}:pull")
+            })
+            _, _, token_body = self._registry_request(f"{params['realm']}?{query}", [])
+            try:
+                token_data = json.loads(token_body)
+                token = token_data.get('token') or token_data.get('access_token')
+            except json.JSONDecodeError:
+                token = None
+            if not token:
+                return None, "无法获取仓库令牌"
+            headers.append(f"Authorization: Bearer {token}")
+            status, response_headers, body = self._registry_request(f"{base}/manifests/{reference}", headers)
+        if status != 200:
+            return None, f"读取清单失败（HTTP {status or '-'}）"
+        
+        try:
+            manifest = json.loads(body)
+            if 'manifests' in manifest:
+                architectures = {
+                    m.get('platform', {}).get('architecture') for m in manifest['manifests']
+                    if m.get('platform', {}).get('os', 'linux') == 'linux'
+                }
+                return sorted(a for a in architectures if a and a != 'unknown'), ''
+            # 单架构清单：架构记录在镜像配置 blob 中
+            status, _, config_body = self._registry_request(
+                f"{base}/blobs/{manifest['config']['digest']}", headers[1:]
+            )
+            if status != 200:
+                return None, f"读取镜像配置失败（HTTP {status or '-'}）"
+            return [json.loads(config_body)['architecture']], ''
+        except (json.JSONDecodeError, KeyError, TypeError):
+            return None, "无法解析镜像清单"
+    
+    def _check_image_architectures(self, values_file: str) -> bool:
+        """检查 Gateway/Controller 镜像是否支持调度目标的所有架构（仅 x86 集群时跳过）"""
+        required = self._gateway_architectures()
+        if required == ['amd64']:
+            return True
+        
+        click.echo(f"\n检查镜像架构（需要 {', '.join(required)}）...")
+        images = self._get_chart_images(values_file)
+        ok = True
+        with ThreadPoolExecutor(max_workers=max(len(images), 1)) as executor:
+            for image, (architectures, error) in zip(images, executor.map(self._image_architectures, images)):
+                if architectures is None:
+                    click.echo(f"  ⚠ {image}: {error}，跳过检查")
+                    continue
+                missing = [arch for arch in required if arch not in architectures]
+                if missing:
+                    click.echo(f"  ✗ {image}: 仅支持 {', '.join(architectures)}，缺少 {', '.join(missing)}")
+                    ok = False
+                else:
+                    click.echo(f"  ✓ {image}: {', '.join(architectures)}")
+        if not ok:
+            click.echo("\n✗ 镜像不支持部分节点架构，请通过 higress.architectures 限制 Gateway 调度的架构", err=True)
+        return ok
+    
+    def _get_chart_images(self, values_file: str) -> List[str]:
+        """渲染 Higress Chart，提取 Gateway 和 Controller 使用的镜像"""
+        manifest = self._render_chart(values_file)
+        if not manifest:
+            return []
+        
+        images = []
+        for doc in yaml.safe_load_all(manifest):
+            if not doc or doc.get('kind') != 'Deployment':
+                continue
+            if doc.get('metadata', {}).get('name') not in PREWARM_WORKLOADS:
+                continue
+            pod_spec = doc['spec']['template']['spec']
+            for container in pod_spec.get('initContainers', []) + pod_spec.get('containers', []):
+                if container.get('image') and container['image'] not in images:
+                    images.append(container['image'])
+        return images
+    
+    def _render_image_prewarm_daemonset(self, images: List[str]) -> Dict[str, Any]:
+        """生成镜像预热 DaemonSet：每个镜像一个 initContainer，拉取后执行共享卷中的静态 true 立即退出"""
+        def init_container(name: str, image: str, command: List[str]) -> Dict[str, Any]:
+            # 每个容器独立构造，yaml.dump 不会输出锚点和别名
+            return {
+                'name': name,
+                'image': image,
+                'imagePullPolicy': 'IfNotPresent',
+                'command': command,
+                'volumeMounts': [{'name': 'prewarm-tools', 'mountPath': PREWARM_TOOLS_DIR}],
+                'resources': {
+                    'requests': {'cpu': '10m', 'memory': '16Mi'},
+                    'limits': {'cpu': '100m', 'memory': '64Mi'}
+                }
+            }
+        
+        init_containers = [init_container('prewarm-tools', PREWARM_TOOLS_IMAGE,
+                                          ['cp', '/bin/busybox', f"{PREWARM_TOOLS_DIR}/true"])]
+        for i, image in enumerate(images):
+            init_containers.append(init_container(f"prewarm-{i}", image, [f"{PREWARM_TOOLS_DIR}/true"]))
+        
+        return {
+            'apiVersion': 'apps/v1',
+            'kind': 'DaemonSet',
+            'metadata': {
+                'name': 'higress-image-prewarm',
+                'namespace': 'higress-system',
+                'labels': {'app': 'higress-image-prewarm'}
+            },
+            'spec': {
+                'selector': {'matchLabels': {'app': 'higress-image-prewarm'}},
+                'updateStrategy': {
+                    'type': 'RollingUpdate',
+                    'rollingUpdate': {'maxUnavailable': '100%'}
+                },
+                'template': {
+                    'metadata': {'labels': {'app': 'higress-image-prewarm'}},
+                    'spec': {
+                        'nodeSelector': {'kubernetes.io/os': 'linux'},
+                        # 只在 Gateway 可调度的节点上预热
+                        'affinity': {'nodeAffinity': self._gateway_node_affinity()},
+                        'tolerations': [{'operator': 'Exists'}],
+                        'terminationGracePeriodSeconds': 0,
+                        'initContainers': init_containers,
+                        'volumes': [{'name': 'prewarm-tools', 'emptyDir': {'sizeLimit': '16Mi'}}],
+                        # 镜像拉取完成后只保留一个 pause 容器，常驻以便新节点加入时自动预热
+                        'containers': [{
+                            'name': 'pause',
+                            'image': 'registry.k8s.io/pause:3.9',
+                            'resources': {
+                                'requests': {'cpu': '1m', 'memory': '4Mi'},
+                                'limits': {'cpu': '10m', 'memory': '16Mi'}
+                            }
+                        }]
+                    }
+                }
+            }
+        }
+    
+    def _generate_image_prewarm_file(self, images: List[str]) -> str:
+        """生成镜像预热 DaemonSet 文件"""
+        prewarm_file = 'higress-image-prewarm.yaml'
+        with open(prewarm_file, 'w', encoding='utf-8') as f:
+            yaml.dump(self._render_image_prewarm_daemonset(images), f, default_flow_style=False)
+        return prewarm_file
+    
+    def _prepare_image_prewarm(self, values_file: str) -> Optional[str]:
+        """生成镜像预热 DaemonSet，使节点在 Gateway 调度前完成镜像拉取；无法解析镜像时返回 None"""
+        images = self._get_chart_images(values_file)
+        if not images:
+            click.echo("⚠ 无法从 Chart 中解析镜像，跳过镜像预热")
+            return None
+        return self._generate_image_prewarm_file(images)
+    
+    @staticmethod
+    def _parse_go_duration(value: str) -> float:
+        """解析 Go 风格的时长字符串（如 1m2.5s、850ms），返回秒数"""
+        units = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001, 'us': 0.000001, 'µs': 0.000001, 'ns': 0.000000001}
+        total = 0.0
+        for number, unit in re.findall(r'([\d.]+)(h|ms|us|µs|ns|m|s)', value):
+            total += float(number) * units[unit]
+        return total
+    
+    def _report_image_pull_times(self):
+        """根据 Pulled 事件统计每个节点的镜像拉取耗时"""
+        pods_json = self._run_command("kubectl get pods -n higress-system -o json", check=False, capture=True)
+        events_json = self._run_command(
+            "kubectl get events -n higress-system --field-selector reason=Pulled -o json",
+            check=False, capture=True
+        )
+        try:
+            pods = json.loads(pods_json)['items'] if pods_json else []
+            events = json.loads(events_json)['items'] if events_json else []
+        except (json.JSONDecodeError, KeyError):
+            click.echo("⚠ 无法解析镜像拉取事件")
+            return
+        
+        pod_nodes = {pod['metadata']['name']: pod['spec'].get('nodeName', '-') for pod in pods}
+        
+        # 同一节点上同一镜像只统计一次（取最长耗时，即实际拉取的那次）
+        pull_times = {}
+        for event in events:
+            match = re.search(r'Successfully pulled image "([^"]+)" in (\S+)', event.get('message', ''))
+            if not match:
+                continue
+            node = pod_nodes.get(event['involvedObject']['name'], '-')
+            image = match.group(1)
+            seconds = self._parse_go_duration(match.group(2))
+            pull_times[(node, image)] = max(seconds, pull_times.get((node, image), 0.0))
+        
+        click.echo("\n【镜像拉取耗时】")
+        if not pull_times:
+            click.echo("  无拉取记录（镜像已在节点上缓存或事件已过期）")
+            return
+        for (node, image), seconds in sorted(pull_times.items()):
+            click.echo(f"  {node:45} {seconds:7.1f}s  {image}")
+    
     def _wait_for_webhook_ready(self):
         """等待 ALB Controller webhook 就绪"""
         click.echo("检查 ALB Controller webhook 状态...")
@@ -824,32 +4146,177 @@ class HigressDeployer:
             elif (i + 1) % 10 == 0:
                 click.echo(f"  等待中... ({i+1}秒)")
             
-            time.sleep(1)
+            CommandSimulator.sleep(1)
         
         click.echo("⚠ Webhook 等待超时")
         return False
     
-    def deploy_higress(self):
-        """部署 Higress"""
+    def _artifact(self, name: str, version: Optional[str] = None) -> Path:
+        """从本地缓存获取制品，失败时退出"""
+        try:
+            return self.artifacts.get(name, version)
+        except (ArtifactError, OSError) as e:
+            click.echo(f"✗ 获取制品失败: {e}", err=True)
+            sys.exit(1)
+    
+    def _higress_chart(self) -> Path:
+        """本地缓存的 Higress Chart 包（higress.chart_version 未配置时使用锁定的最新版本）"""
+        version = str(self.config.get('higress', {}).get('chart_version', '') or '').strip()
+        return self._artifact('higress-chart', version or None)
+    
+    def _render_chart(self, values_file: str) -> Optional[str]:
+        """本地渲染 Higress Chart，结果在本次运行内缓存"""
+        if self._rendered_chart is None:
+            self._rendered_chart = self._run_command(
+                f"helm template higress {self._higress_chart()} -n higress-system -f {values_file}",
+                check=False, capture=True
+            )
+        return self._rendered_chart
+    
+    @staticmethod
+    def _index_manifest(manifest: str) -> Dict[str, str]:
+        """把多文档清单按 Kind/名称 索引为规范化的 YAML 文本，便于比较"""
+        index = {}
+        for doc in yaml.safe_load_all(manifest or ''):
+            if not doc or 'kind' not in doc:
+                continue
+            metadata = doc.get('metadata', {})
+            key = f"{doc['kind']}/{metadata.get('namespace', '')}/{metadata.get('name', '')}"
+            index[key] = yaml.safe_dump(doc, sort_keys=True)
+        return index
+    
+    def _helm_diff_available(self) -> bool:
+        """是否安装了 helm diff 插件"""
+        result = self._run_parallel([('helm-plugins', ['helm', 'plugin', 'list'])], timeout=30, stream=False)[0]
+        return result.ok and any(line.split()[:1] == ['diff'] for line in result.stdout.splitlines())
+    
+    @staticmethod
+    def _parse_helm_diff(output: str) -> Dict[str, List[str]]:
+        """解析 helm diff 的资源标题行（命名空间, 名称, Kind (组) has changed/been added/been removed:）"""
+        diff = {'added': [], 'removed': [], 'changed': []}
+        kinds = {'changed': 'changed', 'been added': 'added', 'been removed': 'removed'}
+        for match in re.finditer(r'^(\S*), (\S+), (\S+) \([^)]*\) has (changed|been added|been removed):$',
+                                 output, re.MULTILINE):
+            namespace, name, kind, change = match.groups()
+            diff[kinds[change]].append(f"{kind}/{namespace}/{name}")
+        return {key: sorted(value) for key, value in diff.items()}
+    
+    def _dry_run_manifest(self, values_file: str) -> Optional[str]:
+        """按升级语义渲染清单（helm upgrade --dry-run）
+        
+        与 helm template 不同，这里 IsInstall 为 false；--dry-run=server 时 lookup 能读到线上对象，
+        Chart 中随机生成的值（如 Console 密码）沿用已有 Secret。旧版 Helm 不支持时退回 --dry-run。
+        """
+        base = ['helm', 'upgrade', 'higress', str(self._higress_chart()), '-n', 'higress-system',
+                '-f', values_file, '-o', 'json']
+        for dry_run in ('--dry-run=server', '--dry-run'):
+            result = self._run_parallel([('helm-dry-run', [*base, dry_run])], timeout=300, stream=False)[0]
+            if result.ok:
+                try:
+                    return json.loads(result.stdout).get('manifest', '')
+                except json.JSONDecodeError:
+                    return None
+        return None
+    
+    def _diff_release(self, values_file: str) -> Optional[Dict[str, List[str]]]:
+        """对比升级后的清单与线上 Release；Release 不存在时返回 None
+        
+        安装了 helm diff 插件时直接使用插件的结果，否则比较 helm upgrade --dry-run 与 helm get manifest；
+        无法渲染时按有变化处理。
+        """
+        live = self._run_command("helm get manifest higress -n higress-system", check=False, capture=True)
+        if not live:
+            return None
+        
+        if self._helm_diff_available():
+            result = self._run_parallel([('helm-diff', [
+                'helm', 'diff', 'upgrade', 'higress', str(self._higress_chart()), '-n', 'higress-system',
+                '-f', values_file, '--no-color', '--detailed-exitcode'
+            ])], timeout=300, stream=False)[0]
+            # --detailed-exitcode：0 无变化，2 有变化
+            if result.returncode in (0, 2):
+                return self._parse_helm_diff(result.stdout)
+        
+        rendered = self._dry_run_manifest(values_file)
+        if rendered is None:
+            return {'added': [], 'removed': [], 'changed': ['(无法渲染升级后的清单)']}
+        desired = self._index_manifest(rendered)
+        current = self._index_manifest(live)
+        return {
+            'added': sorted(set(desired) - set(current)),
+            'removed': sorted(set(current) - set(desired)),
+            'changed': sorted(key for key in set(desired) & set(current) if desired[key] != current[key])
+        }
+    
+    def _generate_cluster_resource_files(self, values_file: str) -> Dict[str, str]:
+        """Higress 之外由 deploy 管理的集群资源：PriorityClass、StorageClass、扩容预留、镜像预热"""
+        files = {
+            'PriorityClass': self._generate_priority_classes_file(),
+            'StorageClass': self._generate_storage_classes_file(),
+        }
+        if self.config.get('headroom', {}).get('enabled', False):
+            files['headroom'] = self._generate_headroom_file()
+        if self.config.get('higress', {}).get('image_prewarm', False):
+            prewarm_file = self._prepare_image_prewarm(values_file)
+            if prewarm_file:
+                files['prewarm'] = prewarm_file
+        return files
+    
+    def _changed_cluster_resources(self, files: Dict[str, str]) -> List[str]:
+        """kubectl diff 检查线上对象是否与生成的文件一致（退出码 0 无差异，1 有差异，其他为出错，按有差异处理）"""
+        results = self._run_parallel([
+            (name, ['kubectl', 'diff', '-f', path]) for name, path in files.items()
+        ], timeout=120, stream=False)
+        return [name for name, result in zip(files, results) if result.returncode != 0]
+    
+    def _apply_cluster_resources(self, files: Dict[str, str], values_file: str):
+        """按依赖顺序创建集群资源：PriorityClass 和 StorageClass 需要在 Higress 安装前存在"""
+        if 'PriorityClass' in files:
+            click.echo("\n创建 PriorityClass...")
+            self._run_command(f"kubectl apply -f {files['PriorityClass']}")
+        if 'StorageClass' in files:
+            # 监控组件的 PVC 依赖 StorageClass
+            click.echo("\n创建 StorageClass...")
+            self._apply_storage_classes()
+            self._report_monitoring_overhead(values_file)
+        if 'headroom' in files:
+            click.echo(f"\n部署扩容预留占位 Pod（{self._get_headroom_replicas()} 个）...")
+            self._run_command(f"kubectl apply -f {files['headroom']}", check=False)
+        if 'prewarm' in files:
+            # 新节点加入后立即拉取 Gateway/Controller 镜像
+            click.echo("\n部署镜像预热 DaemonSet...")
+            result = self._run_parallel([('prewarm', ['kubectl', 'apply', '-f', files['prewarm']])], stream=False)[0]
+            if not result.ok:
+                click.echo(f"⚠ 镜像预热 DaemonSet 部署失败（不影响 Higress 部署）: {result.stderr.strip()}")
+    
+    def _get_release_revision(self) -> Optional[int]:
+        """获取当前 Release 版本号，不存在时返回 None"""
+        result = self._run_command("helm status higress -n higress-system -o json", check=False, capture=True)
+        try:
+            return json.loads(result)['version'] if result else None
+        except (json.JSONDecodeError, KeyError):
+            return None
+    
+    def _wait_for_core_workloads(self, timeout: int) -> bool:
+        """并行等待 Gateway 和 Controller 滚动更新完成"""
+        commands = [
+            (workload, ['kubectl', 'rollout', 'status', f"deployment/{workload}",
+                        '-n', 'higress-system', f"--timeout={timeout}s"])
+            for workload in PREWARM_WORKLOADS
+        ]
+        results = self._run_parallel(commands)
+        return all(result.ok for result in results)
+    
+    @traced_step
+    def deploy_higress(self, force: bool = False):
+        """部署或升级 Higress（配置无变化时跳过）"""
         click.echo("\n" + "="*60)
         click.echo("部署 Higress")
         click.echo("="*60)
         
-        # 检查 ALB Controller webhook 是否就绪
-        if not self._wait_for_webhook_ready():
-            click.echo("\n尝试重启 ALB Controller...")
-            self._run_command(
-                "kubectl rollout restart deployment aws-load-balancer-controller -n kube-system",
-                check=False
-            )
-            time.sleep(20)
-            if not self._wait_for_webhook_ready():
-                click.echo("\n✗ ALB Controller webhook 未就绪，但将继续尝试部署...")
-        
-        # 添加 Helm 仓库
-        click.echo("\n添加 Higress Helm 仓库...")
-        self._run_command("helm repo add higress.io https://higress.io/helm-charts")
-        self._run_command("helm repo update")
+        higress_config = self.config.get('higress', {})
+        timeout = higress_config.get('upgrade_timeout', 300)
+        wait_all = higress_config.get('wait_all', False)
         
         # 创建命名空间
         click.echo("\n创建命名空间...")
@@ -858,28 +4325,71 @@ class HigressDeployer:
         # 生成配置文件
         values_file = self._create_higress_values()
         
-        # 安装 Higress（不使用 --wait，因为监控组件可能需要更长时间）
-        click.echo("\n安装 Higress（预计需要 5-10 分钟）...")
+        # 混合架构或 Graviton 集群：确认镜像支持所有目标架构
+        if not self._check_image_architectures(values_file):
+            sys.exit(1)
         
-        # 使用更长的超时时间，但不使用 --wait 来避免超时
-        cmd = f"helm install higress higress.io/higress -n higress-system -f {values_file} --timeout 30m"
-        self._run_command(cmd)
+        # 对比升级后的清单与线上 Release，Release 和集群资源都无变化时直接跳过
+        click.echo("\n对比 Higress 配置变更...")
+        resource_files = self._generate_cluster_resource_files(values_file)
+        diff = self._diff_release(values_file)
+        previous_revision = None
+        if diff is not None:
+            previous_revision = self._get_release_revision()
+            changes = [('+', key) for key in diff['added']] + [('-', key) for key in diff['removed']] \
+                + [('~', key) for key in diff['changed']]
+            if not changes and not force:
+                changed_resources = self._changed_cluster_resources(resource_files)
+                if not changed_resources:
+                    click.echo(f"✓ 配置无变化（当前版本 {previous_revision}），跳过升级")
+                    return
+                click.echo(f"Release 无变化（当前版本 {previous_revision}），只更新: {', '.join(changed_resources)}")
+                self._apply_cluster_resources({name: resource_files[name] for name in changed_resources}, values_file)
+                return
+            for mark, key in changes:
+                click.echo(f"  {mark} {key}")
+        else:
+            click.echo("Release 不存在，将全新安装")
         
-        # 等待核心组件就绪（Gateway 和 Controller）
-        click.echo("\n等待 Higress 核心组件就绪...")
-        self._run_command(
-            "kubectl wait --for=condition=ready pod -l app=higress-gateway -n higress-system --timeout=300s",
-            check=False
-        )
-        self._run_command(
-            "kubectl wait --for=condition=ready pod -l app=higress-controller -n higress-system --timeout=300s",
-            check=False
-        )
+        self._apply_cluster_resources(resource_files, values_file)
+        
+        # 检查 ALB Controller webhook 是否就绪
+        if not self._wait_for_webhook_ready():
+            click.echo("\n尝试重启 ALB Controller...")
+            self._run_command(
+                "kubectl rollout restart deployment aws-load-balancer-controller -n kube-system",
+                check=False
+            )
+            CommandSimulator.sleep(20)
+            if not self._wait_for_webhook_ready():
+                click.echo("\n✗ ALB Controller webhook 未就绪，但将继续尝试部署...")
+        
+        click.echo("\n安装/升级 Higress...")
+        cmd = f"helm upgrade --install higress {self._higress_chart()} -n higress-system -f {values_file}"
+        if wait_all:
+            # 等待所有资源（包括监控组件的 PVC），失败时由 Helm 自动回滚
+            self._run_command(f"{cmd} --atomic --wait --timeout {timeout}s")
+        else:
+            # 只等待核心组件（Gateway 和 Controller），失败时手动回滚到上一版本
+            self._run_command(f"{cmd} --timeout 30m")
+            click.echo("\n等待 Higress 核心组件就绪...")
+            if not self._wait_for_core_workloads(timeout):
+                if previous_revision:
+                    click.echo(f"\n✗ 核心组件未在 {timeout} 秒内就绪，回滚到版本 {previous_revision}...")
+                    self._run_command(
+                        f"helm rollback higress {previous_revision} -n higress-system --wait --timeout {timeout}s",
+                        check=False
+                    )
+                else:
+                    click.echo(f"\n✗ 核心组件未在 {timeout} 秒内就绪")
+                self._run_command("kubectl get pods -n higress-system", check=False)
+                sys.exit(1)
         
         # 验证安装
         click.echo("\n验证 Higress 安装...")
         self._run_command("kubectl get pods -n higress-system")
         self._run_command("kubectl get svc -n higress-system")
+        self._report_image_pull_times()
         
         click.echo("\n✓ Higress 部署完成")
         click.echo("\n提示：监控组件（Grafana、Prometheus、Loki）可能需要额外时间来创建 PVC 和初始化")
@@ -906,6 +4416,7 @@ class HigressDeployer:
         click.echo(f"✓ ALB Ingress 配置已生成: {ingress_file}")
         return ingress_file
     
+    @traced_step
     def create_alb(self):
         """创建 ALB"""
         click.echo("\n" + "="*60)
@@ -921,7 +4432,7 @@ class HigressDeployer:
         if existing and "higress-alb" in existing:
             click.echo("发现已存在的 Ingress，删除后重新创建...")
             self._run_command("kubectl delete ingress higress-alb -n higress-system", check=False)
-            time.sleep(5)
+            CommandSimulator.sleep(5)
         
         # 生成 Ingress 配置
         ingress_file = self._create_alb_ingress()
@@ -935,7 +4446,7 @@ class HigressDeployer:
         click.echo("正在创建中，请稍候...")
         
         # 先等待一段时间让 ALB Controller 开始处理
-        time.sleep(15)
+        CommandSimulator.sleep(15)
         
         for i in range(40):
             # 检查是否有错误事件
@@ -992,7 +4503,7 @@ class HigressDeployer:
                 
                 # 等待 ALB 完全就绪
                 click.echo("\n等待 ALB 完全就绪...")
-                time.sleep(30)
+                CommandSimulator.sleep(30)
                 
                 # 测试访问
                 click.echo("\n测试 ALB 连接...")
@@ -1005,7 +4516,7 @@ class HigressDeployer:
             if (i + 1) % 3 == 0:
                 click.echo(f"  等待中... ({(i+1)*10}秒)")
             
-            time.sleep(10)
+            CommandSimulator.sleep(10)
         
         click.echo("\n⚠ ALB 创建超时")
         click.echo("\n查看详细信息:")
@@ -1015,46 +4526,871 @@ class HigressDeployer:
         click.echo("2. Ingress 事件: kubectl get events -n higress-system")
         click.echo("3. 子网标签是否正确")
     
-    def get_status(self):
-        """获取部署状态"""
+    @staticmethod
+    def _summarize_resources(items: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """把 kubectl 列表结果整理为状态摘要"""
+        summary = {'nodes': [], 'pods': [], 'services': [], 'ingresses': []}
+        for item in items:
+            kind = item.get('kind')
+            metadata = item.get('metadata', {})
+            spec = item.get('spec', {})
+            status = item.get('status', {})
+            
+            if kind == 'Node':
+                labels = metadata.get('labels', {})
+                conditions = {c['type']: c['status'] for c in status.get('conditions', [])}
+                summary['nodes'].append({
+                    'name': metadata.get('name'),
+                    'ready': conditions.get('Ready') == 'True',
+                    'instance_type': labels.get('node.kubernetes.io/instance-type', ''),
+                    'arch': labels.get('kubernetes.io/arch', ''),
+                    'zone': labels.get('topology.kubernetes.io/zone', ''),
+                    'version': status.get('nodeInfo', {}).get('kubeletVersion', '')
+                })
+            elif kind == 'Pod':
+                containers = status.get('containerStatuses', [])
+                summary['pods'].append({
+                    'name': metadata.get('name'),
+                    'phase': status.get('phase'),
+                    'ready': f"{sum(1 for c in containers if c.get('ready'))}/{len(spec.get('containers', []))}",
+                    'restarts': sum(c.get('restartCount', 0) for c in containers),
+                    'node': spec.get('nodeName', '')
+                })
+            elif kind == 'Service':
+                summary['services'].append({
+                    'name': metadata.get('name'),
+                    'type': spec.get('type'),
+                    'cluster_ip': spec.get('clusterIP'),
+                    'ports': [f"{p.get('port')}/{p.get('protocol', 'TCP')}" for p in spec.get('ports', [])]
+                })
+            elif kind == 'Ingress':
+                lb_ingress = status.get('loadBalancer', {}).get('ingress') or [{}]
+                summary['ingresses'].append({
+                    'name': metadata.get('name'),
+                    'class': spec.get('ingressClassName', ''),
+                    'hostname': lb_ingress[0].get('hostname', '')
+                })
+        return summary
+    
+    def _collect_status(self) -> Dict[str, Any]:
+        """并行获取 EKS 集群信息和一次批量获取的 Kubernetes 资源"""
+        cluster_name = self.config['eks']['cluster_name']
+        region = self.config['aws']['region']
+        cluster_result, resources_result = self._run_parallel([
+            ('eks', ['aws', 'eks', 'describe-cluster', '--name', cluster_name,
+                     '--region', region, '--output', 'json']),
+            ('kubectl', ['kubectl', 'get', 'nodes,pods,services,ingresses',
+                         '-n', 'higress-system', '-o', 'json'])
+        ], timeout=10, stream=False)
+        
+        status = {'cluster': {'name': cluster_name, 'region': region}, 'errors': []}
+        if cluster_result.ok:
+            cluster = json.loads(cluster_result.stdout)['cluster']
+            status['cluster'].update({
+                'status': cluster.get('status'),
+                'version': cluster.get('version'),
+                'endpoint': cluster.get('endpoint')
+            })
+        else:
+            status['errors'].append(f"EKS: {cluster_result.stderr or '查询失败'}")
+        
+        items = []
+        if resources_result.ok:
+            items = json.loads(resources_result.stdout).get('items', [])
+        else:
+            status['errors'].append(f"Kubernetes: {resources_result.stderr or '查询失败'}")
+        status.update(self._summarize_resources(items))
+        
+        alb = next((i for i in status['ingresses'] if i['name'] == 'higress-alb' and i['hostname']), None)
+        status['alb_hostname'] = alb['hostname'] if alb else None
+        return status
+    
+    @traced_step
+    def get_status(self, output: str = 'text'):
+        """获取部署状态"""
+        status = self._collect_status()
+        if output == 'json':
+            click.echo(json.dumps(status, indent=2, ensure_ascii=False))
+            return status
+        
+        click.echo("\n" + "="*60)
+        click.echo("Higress 部署状态")
+        click.echo("="*60)
+        
+        # EKS 集群状态
+        click.echo("\n【EKS 集群】")
+        cluster = status['cluster']
+        click.echo(f"  {cluster['name']} ({cluster['region']})  "
+                   f"状态: {cluster.get('status', '未知')}  版本: {cluster.get('version', '-')}")
+        
+        # 节点状态
+        click.echo("\n【节点状态】")
+        for node in status['nodes']:
+            ready = 'Ready' if node['ready'] else 'NotReady'
+            click.echo(f"  {node['name']:45} {ready:9} {node['instance_type']:13} {node['arch']:6} {node['zone']}")
+        
+        # Higress Pods
+        click.echo("\n【Higress Pods】")
+        for pod in status['pods']:
+            click.echo(f"  {pod['name']:55} {pod['ready']:5} {pod['phase']:10} 重启 {pod['restarts']}")
+        
+        # Higress Services
+        click.echo("\n【Higress Services】")
+        for svc in status['services']:
+            click.echo(f"  {svc['name']:40} {svc['type']:12} {svc['cluster_ip']:16} {','.join(svc['ports'])}")
+        
+        # ALB Ingress
+        click.echo("\n【ALB Ingress】")
+        for ingress in status['ingresses']:
+            click.echo(f"  {ingress['name']:30} {ingress['class']:8} {ingress['hostname']}")
+        
+        # 访问地址
+        if status['alb_hostname']:
+            result = status['alb_hostname']
+            click.echo(f"\n【访问地址】")
+            click.echo(f"ALB DNS: {result}")
+            click.echo(f"HTTP: http://{result}")
+            click.echo(f"HTTPS: https://{result}")
+        
+        for error in status['errors']:
+            click.echo(f"\n⚠ {error}", err=True)
+        return status
+    
+    def _prometheus_query_argv(self, query: str, prometheus_url: Optional[str] = None) -> List[str]:
+        """构造一次 Prometheus 即时查询的命令
+        
+        未指定 prometheus_url 时通过 API Server 的 Service 代理访问集群内 Prometheus，
+        无需 port-forward；指定时直接请求该地址（例如本地的 Prometheus 替身）。
+        """
+        params = urllib.parse.urlencode({'query': query})
+        if prometheus_url:
+            return ['curl', '-fsS', '--max-time', '20', f"{prometheus_url.rstrip('/')}/api/v1/query?{params}"]
+        monitoring = self.config.get('monitoring', {})
+        service = monitoring.get('prometheus_service', PROMETHEUS_SERVICE)
+        prefix = monitoring.get('prometheus_path_prefix', PROMETHEUS_PATH_PREFIX)
+        return ['kubectl', 'get', '--raw',
+                f"/api/v1/namespaces/higress-system/services/{service}/proxy{prefix}/api/v1/query?{params}"]
+    
+    def _perf_queries(self, window: str) -> Dict[Tuple[str, str], str]:
+        """生成按 Pod 和全集群两个维度的 PromQL 查询
+        
+        延迟分位数在全集群维度上按 le 汇总直方图后再计算，而不是对各 Pod 的分位数取平均。
+        """
+        pod_label = self.config.get('monitoring', {}).get('pod_label', 'pod')
+        gateway = f'{pod_label}=~"higress-gateway.*"'
+        cadvisor = f'namespace="higress-system",{gateway},container!=""'
+        
+        queries = {}
+        for scope, by in (('pods', pod_label), ('cluster', '')):
+            group = f" by ({by})" if by else ''
+            group_le = f" by ({by}, le)" if by else ' by (le)'
+            rps = f"sum{group} (rate(envoy_http_downstream_rq_total{{{gateway}}}[{window}]))"
+            rps_5xx = (f"sum{group} (rate(envoy_http_downstream_rq_xx"
+                       f"{{{gateway},envoy_response_code_class=\"5\"}}[{window}]))")
+            buckets = f"sum{group_le} (rate(envoy_cluster_upstream_rq_time_bucket{{{gateway}}}[{window}]))"
+            queries[(scope, 'rps')] = rps
+            queries[(scope, 'p50_ms')] = f"histogram_quantile(0.5, {buckets})"
+            queries[(scope, 'p99_ms')] = f"histogram_quantile(0.99, {buckets})"
+            queries[(scope, 'rps_5xx')] = rps_5xx
+            queries[(scope, 'error_ratio')] = f"{rps_5xx} / {rps}"
+            queries[(scope, 'active_connections')] = (
+                f"sum{group} (avg_over_time(envoy_http_downstream_cx_active{{{gateway}}}[{window}]))"
+            )
+            queries[(scope, 'cpu_throttled_ratio')] = (
+                f"sum{group} (rate(container_cpu_cfs_throttled_periods_total{{{cadvisor}}}[{window}]))"
+                f" / sum{group} (rate(container_cpu_cfs_periods_total{{{cadvisor}}}[{window}]))"
+            )
+        return queries
+    
+    def _collect_perf_report(self, window: str, prometheus_url: Optional[str] = None) -> Dict[str, Any]:
+        """并行执行所有查询，整理为全集群汇总和按 Pod 明细"""
+        pod_label = self.config.get('monitoring', {}).get('pod_label', 'pod')
+        queries = self._perf_queries(window)
+        commands = [(f"{scope}:{metric}", self._prometheus_query_argv(query, prometheus_url))
+                    for (scope, metric), query in queries.items()]
+        results = self._run_parallel(commands, timeout=30, stream=False)
+        
+        report = {'window': window, 'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                  'cluster': {metric: None for metric in PERF_METRICS}, 'pods': {}, 'errors': []}
+        for (scope, metric), result in zip(queries, results):
+            if not result.ok:
+                report['errors'].append(f"{scope}:{metric}: {result.stderr or '查询失败'}")
+                continue
+            try:
+                body = json.loads(result.stdout)
+                samples = body['data']['result']
+            except (json.JSONDecodeError, KeyError, TypeError):
+                report['errors'].append(f"{scope}:{metric}: 无法解析 Prometheus 响应")
+                continue
+            for sample in samples:
+                value = float(sample['value'][1])
+                value = None if math.isnan(value) or math.isinf(value) else value
+                if scope == 'cluster':
+                    report['cluster'][metric] = value
+                else:
+                    pod = sample['metric'].get(pod_label, '-')
+                    report['pods'].setdefault(pod, {m: None for m in PERF_METRICS})[metric] = value
+        
+        report['pods'] = [{'pod': pod, **metrics} for pod, metrics in sorted(report['pods'].items())]
+        return report
+    
+    @traced_step
+    def perf_report(self, window: str = '5m', output: str = 'text',
+                    prometheus_url: Optional[str] = None) -> Dict[str, Any]:
+        """从 Prometheus 汇总 Gateway 的 RPS、延迟分位数、5xx、连接数和 CPU 节流"""
+        report = self._collect_perf_report(window, prometheus_url)
+        if output == 'json':
+            click.echo(json.dumps(report, indent=2, ensure_ascii=False))
+            return report
+        
+        def fmt(value, spec, suffix=''):
+            return f"{value:{spec}}{suffix}" if value is not None else '-'
+        
+        click.echo("\n" + "="*60)
+        click.echo(f"Higress Gateway 性能报告（窗口 {window}）")
+        click.echo("="*60)
+        
+        cluster = report['cluster']
+        click.echo("\n【集群汇总】")
+        click.echo(f"  RPS: {fmt(cluster['rps'], '.1f')}    "
+                   f"p50: {fmt(cluster['p50_ms'], '.1f', 'ms')}    p99: {fmt(cluster['p99_ms'], '.1f', 'ms')}")
+        click.echo(f"  5xx: {fmt(cluster['rps_5xx'], '.2f', '/s')}"
+                   f"（{fmt(cluster['error_ratio'] * 100 if cluster['error_ratio'] is not None else None, '.2f', '%')}）    "
+                   f"活跃连接: {fmt(cluster['active_connections'], '.0f')}    "
+                   f"CPU 节流: {fmt(cluster['cpu_throttled_ratio'] * 100 if cluster['cpu_throttled_ratio'] is not None else None, '.1f', '%')}")
+        
+        click.echo("\n【按 Pod】")
+        click.echo(f"  {'Pod':45} {'RPS':>9} {'p50(ms)':>9} {'p99(ms)':>9} {'5xx/s':>8} {'连接':>7} {'节流':>7}")
+        for pod in report['pods']:
+            throttled = pod['cpu_throttled_ratio'] * 100 if pod['cpu_throttled_ratio'] is not None else None
+            click.echo(f"  {pod['pod']:45} {fmt(pod['rps'], '9.1f'):>9} {fmt(pod['p50_ms'], '9.1f'):>9} "
+                       f"{fmt(pod['p99_ms'], '9.1f'):>9} {fmt(pod['rps_5xx'], '8.2f'):>8} "
+                       f"{fmt(pod['active_connections'], '7.0f'):>7} {fmt(throttled, '6.1f', '%'):>7}")
+        if not report['pods']:
+            click.echo("  无数据（确认 higress.enable_monitoring 已开启且 Prometheus 已采集 Gateway 指标）")
+        
+        for error in report['errors']:
+            click.echo(f"\n⚠ {error}", err=True)
+        return report
+    
+    def _gateway_pods(self) -> List[str]:
+        """运行中的 Gateway Pod 名称"""
+        result = self._run_parallel([('pods', [
+            'kubectl', 'get', 'pods', '-n', 'higress-system', '-l', 'app=higress-gateway', '-o', 'json'
+        ])], timeout=30, stream=False)[0]
+        if not result.ok:
+            return []
+        return sorted(
+            item['metadata']['name'] for item in json.loads(result.stdout or '{}').get('items', [])
+            if item.get('status', {}).get('phase', 'Running') == 'Running'
+        )
+    
+    def _generate_config_latency_file(self, path: str) -> str:
+        """生成标记路由：按路径匹配，重写为 / 后转发到 Console，路由生效后请求不再返回 404"""
+        service, port = CONFIG_LATENCY_BACKEND
+        ingress = {
+            'apiVersion': 'networking.k8s.io/v1',
+            'kind': 'Ingress',
+            'metadata': {
+                'name': CONFIG_LATENCY_INGRESS,
+                'namespace': 'higress-system',
+                'labels': {'app.kubernetes.io/managed-by': 'higress-deploy'},
+                'annotations': {'higress.io/rewrite-target': '/'}
+            },
+            'spec': {
+                'ingressClassName': 'higress',
+                'rules': [{'http': {'paths': [{
+                    'path': path,
+                    'pathType': 'Exact',
+                    'backend': {'service': {'name': service, 'port': {'number': port}}}
+                }]}}]
+            }
+        }
+        with open(CONFIG_LATENCY_FILE, 'w', encoding='utf-8') as f:
+            yaml.dump(ingress, f, default_flow_style=False)
+        return CONFIG_LATENCY_FILE
+    
+    def _measure_config_push(self, pods: List[str], path: str, timeout: float,
+                             interval: float) -> Tuple[Dict[str, float], List[str]]:
+        """创建标记路由，轮询每个 Gateway Pod 直到路由生效，返回每个 Pod 的生效时间和超时未生效的 Pod
+        
+        请求经 API Server 的 Pod 代理直接发往各个 Gateway，不经过负载均衡；
+        计时从 kubectl apply 返回（对象已写入 API Server）开始，精度受单次轮询耗时限制。
+        """
+        result = self._run_parallel([('marker', ['kubectl', 'apply', '-f', self._generate_config_latency_file(path)])],
+                                    timeout=30, stream=False)[0]
+        if not result.ok:
+            click.echo(f"✗ 创建标记路由失败: {result.stderr.strip()}", err=True)
+            sys.exit(1)
+        applied = time.monotonic()
+        
+        latencies = {}
+        pending = list(pods)
+        while pending and time.monotonic() - applied < timeout:
+            results = self._run_parallel([
+                (pod, ['kubectl', 'get', '--raw',
+                       f"/api/v1/namespaces/higress-system/pods/http:{pod}:{GATEWAY_HTTP_PORT}/proxy{path}"])
+                for pod in pending
+            ], timeout=10, stream=False)
+            now = time.monotonic()
+            for pod, probe in zip(list(pending), results):
+                if probe.ok:
+                    latencies[pod] = now - applied
+                    pending.remove(pod)
+            if pending:
+                CommandSimulator.sleep(interval)
+        return latencies, pending
+    
+    @traced_step
+    def config_latency(self, rounds: int = 5, timeout: float = 120.0, interval: float = 0.2,
+                       output: str = 'text') -> Dict[str, Any]:
+        """测量路由变更下发到所有 Gateway 的时间分布
+        
+        每轮创建一条新的标记路由，记录每个 Gateway Pod 开始提供该路由的时间；
+        全部生效的时间（最慢的 Pod）反映 Controller 计算和推送 xDS 的耗时。
+        """
+        pods = self._gateway_pods()
+        if not pods:
+            click.echo("✗ 未找到运行中的 Gateway Pod", err=True)
+            sys.exit(1)
+        routes = self._run_parallel([('routes', ['kubectl', 'get', 'ingress', '-A', '-o', 'name'])],
+                                    timeout=60, stream=False)[0]
+        route_count = len(routes.stdout.split()) if routes.ok else None
+        controller = {**CONTROLLER_DEFAULTS, **(self.config.get('higress', {}).get('controller') or {})}
+        
+        rounds_result = []
+        try:
+            for index in range(rounds):
+                path = f"{CONFIG_LATENCY_PATH_PREFIX}/{int(time.time() * 1000)}"
+                latencies, missing = self._measure_config_push(pods, path, timeout, interval)
+                rounds_result.append({
+                    'round': index + 1,
+                    'pods': {pod: round(value, 3) for pod, value in latencies.items()},
+                    'missing': missing,
+                    'all_ready_s': round(max(latencies.values()), 3) if latencies and not missing else None
+                })
+                if output != 'json':
+                    status = (f"{rounds_result[-1]['all_ready_s']:.2f}s" if not missing
+                              else f"{len(missing)} 个 Pod 在 {timeout:.0f}s 内未生效")
+                    click.echo(f"  第 {index + 1}/{rounds} 轮: {status}")
+        finally:
+            self._run_parallel([('cleanup', ['kubectl', 'delete', 'ingress', CONFIG_LATENCY_INGRESS,
+                                             '-n', 'higress-system', '--ignore-not-found'])], timeout=60, stream=False)
+        
+        first = [min(r['pods'].values()) for r in rounds_result if r['pods']]
+        complete = [r['all_ready_s'] for r in rounds_result if r['all_ready_s'] is not None]
+        per_pod = [value for r in rounds_result for value in r['pods'].values()]
+        
+        def distribution(values):
+            if not values:
+                return None
+            return {'p50': round(_percentile(values, 0.5), 3), 'p90': round(_percentile(values, 0.9), 3),
+                    'p99': round(_percentile(values, 0.99), 3), 'max': round(max(values), 3)}
+        
+        report = {
+            'gateways': len(pods),
+            'routes': route_count,
+            'controller': {key: controller[key] for key in CONTROLLER_DEFAULTS},
+            'rounds': rounds_result,
+            'first_pod_s': distribution(first),
+            'all_pods_s': distribution(complete),
+            'per_pod_s': distribution(per_pod),
+            'incomplete_rounds': sum(1 for r in rounds_result if r['missing'])
+        }
+        if output == 'json':
+            click.echo(json.dumps(report, indent=2, ensure_ascii=False))
+            return report
+        
         click.echo("\n" + "="*60)
-        click.echo("Higress 部署状态")
+        click.echo(f"配置下发延迟（{len(pods)} 个 Gateway，{route_count if route_count is not None else '-'} 条 Ingress，"
+                   f"{len(rounds_result)} 轮）")
         click.echo("="*60)
+        click.echo(f"  Controller: {controller['replicas']} 副本，CPU {controller['cpu_request']}/{controller['cpu_limit']}，"
+                   f"内存 {controller['memory_request']}/{controller['memory_limit']}")
+        click.echo(f"\n  {'':12} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+        for label, key in (('首个 Pod', 'first_pod_s'), ('全部 Pod', 'all_pods_s'), ('单个 Pod', 'per_pod_s')):
+            values = report[key]
+            if values:
+                click.echo(f"  {label:10} " + ' '.join(f"{values[q]:>7.2f}s" for q in ('p50', 'p90', 'p99', 'max')))
         
-        # EKS 集群状态
-        click.echo("\n【EKS 集群】")
-        cluster_name = self.config['eks']['cluster_name']
-        region = self.config['aws']['region']
-        cmd = f"eksctl get cluster --name {cluster_name} --region {region}"
-        self._run_command(cmd, check=False)
+        # 每个 Pod 的中位数，找出持续落后的 Gateway（连接到了负载较高的 Controller 副本等）
+        click.echo("\n【按 Pod】")
+        for pod in pods:
+            values = [r['pods'][pod] for r in rounds_result if pod in r['pods']]
+            missed = sum(1 for r in rounds_result if pod in r['missing'])
+            median = f"{_median(values):.2f}s" if values else '-'
+            click.echo(f"  {pod:45} 中位数 {median:>8}" + (f"  ⚠ {missed} 轮未生效" if missed else ''))
         
-        # 节点状态
-        click.echo("\n【节点状态】")
-        self._run_command("kubectl get nodes", check=False)
+        if report['incomplete_rounds']:
+            click.echo(f"\n⚠ {report['incomplete_rounds']} 轮有 Gateway 在 {timeout:.0f}s 内未收到配置，"
+                       f"检查 Controller 日志和资源（higress.controller）")
+        return report
+    
+    @traced_step
+    def _route_set_resources(self, route_set: str) -> List[str]:
+        """路由集合历次同步过的资源类型（记录在 ConfigMap route-set-<集合名> 中）"""
+        result = self._run_parallel([('route-set', [
+            'kubectl', 'get', 'configmap', f"route-set-{route_set}", '-n', ROUTE_SYNC_RECORD_NAMESPACE,
+            '--ignore-not-found', '-o', 'json'
+        ])], timeout=60, stream=False)[0]
+        if not result.ok:
+            click.echo(f"✗ 查询路由集合记录失败: {result.stderr.strip()}", err=True)
+            sys.exit(1)
+        if not result.stdout.strip():
+            return []
+        data = json.loads(result.stdout).get('data') or {}
+        return [resource for resource in data.get('resources', '').split(',') if resource]
+    
+    def _record_route_set(self, route_set: str, recorded: List[str], resources: Set[str]):
+        """更新路由集合的类型记录，供之后的 prune 找到已从输入中整体移除的类型"""
+        if sorted(resources) == sorted(recorded):
+            return
+        record = {
+            'apiVersion': 'v1',
+            'kind': 'ConfigMap',
+            # 记录本身不带集合标签，避免同步 ConfigMap 时被 prune 删除
+            'metadata': {'name': f"route-set-{route_set}", 'namespace': ROUTE_SYNC_RECORD_NAMESPACE},
+            'data': {'resources': ','.join(sorted(resources))}
+        }
+        with tempfile.NamedTemporaryFile('w', suffix='.json', prefix='higress-route-set-', encoding='utf-8') as f:
+            json.dump(record, f)
+            f.flush()
+            result = self._run_parallel([('route-set-record', [
+                'kubectl', 'apply', '--server-side', '--field-manager', ROUTE_SYNC_FIELD_MANAGER, '-f', f.name
+            ])], timeout=60, stream=False)[0]
+        if not result.ok:
+            click.echo(f"⚠ 更新路由集合记录失败（之后的 prune 可能漏掉已移除的类型）: {result.stderr.strip()}")
+    
+    def sync_routes(self, sources: List[str], namespace: str = 'default', route_set: str = 'default',
+                    prune: bool = False, concurrency: int = ROUTE_SYNC_CONCURRENCY,
+                    batch_size: int = ROUTE_SYNC_BATCH_SIZE, coalesce: bool = False, dry_run: bool = False,
+                    force_conflicts: bool = False, output: str = 'text') -> Dict[str, Any]:
+        """批量同步路由对象：一次 list 计算差异，只对新增和变更的对象做分批 server-side apply
         
-        # Higress Pods
-        click.echo("\n【Higress Pods】")
-        self._run_command("kubectl get pods -n higress-system", check=False)
+        每个批次是一次 kubectl apply，批次之间按 concurrency 并发；coalesce 时所有变更放进一次 apply，
+        写入集中在 Controller 的去抖窗口内，Gateway 收到更少、更大的 xDS 更新。
+        """
+        try:
+            desired, warnings = _load_route_documents(sources, namespace)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            click.echo(f"✗ 读取路由对象失败: {e}", err=True)
+            sys.exit(1)
+        for obj in desired.values():
+            _stamp_route(obj, route_set)
         
-        # Higress Services
-        click.echo("\n【Higress Services】")
-        self._run_command("kubectl get svc -n higress-system", check=False)
+        # 一次 list 获取输入中各类型的现有对象；prune 时另外按集合标签列出默认类型和历次同步记录的类型，
+        # 某个类型的对象全部从输入中移除（或输入为空）时仍会被删除
+        resources = sorted({_route_resource(group, kind) for group, kind, _, _ in desired})
+        recorded = self._route_set_resources(route_set)
+        queries = []
+        if resources:
+            queries.append(('list', ['kubectl', 'get', ','.join(resources), '-A', '-o', 'json']))
+        prune_resources = sorted((set(ROUTE_SYNC_RESOURCES) | set(recorded)) - set(resources)) if prune else []
+        if prune_resources:
+            queries.append(('list-route-set', ['kubectl', 'get', ','.join(prune_resources), '-A',
+                                               '-l', f"{ROUTE_SYNC_LABEL}={route_set}", '-o', 'json']))
+        live = {}
+        for result in self._run_parallel(queries, timeout=300, stream=False) if queries else []:
+            if not result.ok:
+                click.echo(f"✗ 查询现有对象失败: {result.stderr.strip()}", err=True)
+                sys.exit(1)
+            live.update((_route_key(item), item) for item in json.loads(result.stdout or '{}').get('items', []))
         
-        # ALB Ingress
-        click.echo("\n【ALB Ingress】")
-        self._run_command("kubectl get ingress -n higress-system", check=False)
+        created = [key for key in desired if key not in live]
+        updated = [key for key in desired if key in live and _route_changed(desired[key], live[key])]
+        unchanged = len(desired) - len(created) - len(updated)
+        pruned = sorted(
+            key for key, item in live.items()
+            if key not in desired and item['metadata'].get('labels', {}).get(ROUTE_SYNC_LABEL) == route_set
+        ) if prune else []
         
-        # 获取 ALB 地址
-        result = self._run_command(
-            "kubectl get ingress higress-alb -n higress-system -o jsonpath='{.status.loadBalancer.ingress[0].hostname}'",
-            check=False, capture=True
+        changes = sorted(created + updated)
+        size = len(changes) if coalesce else batch_size
+        batches = [changes[i:i + size] for i in range(0, len(changes), size)] if changes else []
+        report = {
+            'route_set': route_set,
+            'objects': len(desired),
+            'created': [f"{kind} {ns}/{name}" for _, kind, ns, name in sorted(created)],
+            'updated': [f"{kind} {ns}/{name}" for _, kind, ns, name in sorted(updated)],
+            'unchanged': unchanged,
+            'pruned': [f"{kind} {ns}/{name}" for _, kind, ns, name in pruned],
+            'batches': len(batches),
+            'failed_batches': 0,
+            'dry_run': dry_run,
+            'warnings': warnings
+        }
+        
+        if output != 'json':
+            for warning in warnings:
+                click.echo(f"⚠ {warning}")
+            click.echo(f"\n路由集合 {route_set}: {len(desired)} 个对象，新增 {len(created)}，变更 {len(updated)}，"
+                       f"未变 {unchanged}" + (f"，删除 {len(pruned)}" if prune else ''))
+            for label, items in (('+', report['created']), ('~', report['updated']), ('-', report['pruned'])):
+                for item in items[:20]:
+                    click.echo(f"  {label} {item}")
+                if len(items) > 20:
+                    click.echo(f"  {label} ... 另有 {len(items) - 20} 个")
+        if dry_run or (not batches and not pruned):
+            if not dry_run:
+                self._record_route_set(route_set, recorded, set(recorded) | set(resources))
+            if output == 'json':
+                click.echo(json.dumps(report, indent=2, ensure_ascii=False))
+            elif not batches and not pruned:
+                click.echo("✓ 没有需要同步的变更")
+            return report
+        
+        started = time.monotonic()
+        runner = AsyncCommandRunner(max_concurrency=concurrency, stream=False)
+        with tempfile.TemporaryDirectory(prefix='higress-routes-') as tmp:
+            commands = []
+            for index, batch in enumerate(batches):
+                batch_file = Path(tmp) / f"batch-{index:04d}.yaml"
+                with open(batch_file, 'w', encoding='utf-8') as f:
+                    yaml.dump_all([desired[key] for key in batch], f, default_flow_style=False)
+                argv = ['kubectl', 'apply', '--server-side', '--field-manager', ROUTE_SYNC_FIELD_MANAGER,
+                        '-f', str(batch_file)]
+                if force_conflicts:
+                    argv.append('--force-conflicts')
+                commands.append((f"batch-{index + 1}", argv))
+            # 删除按资源类型和命名空间合并为一条命令
+            deletions = {}
+            for group, kind, ns, name in pruned:
+                deletions.setdefault((_route_resource(group, kind), ns), []).append(name)
+            for (resource, ns), names in sorted(deletions.items()):
+                commands.append((f"delete-{resource}-{ns}",
+                                 ['kubectl', 'delete', resource, '-n', ns, '--ignore-not-found', *names]))
+            results = asyncio.run(runner.run_all(commands, timeout=600))
+        
+        failed = [(step, result) for (step, _), result in zip(commands, results) if not result.ok]
+        # prune 之后只保留仍有对象的类型（删除失败的类型留到下次再删），否则在记录上追加本次的类型
+        failed_steps = {step for step, _ in failed}
+        if prune:
+            kinds = set(resources) | {resource for resource, ns in deletions if f"delete-{resource}-{ns}" in failed_steps}
+        else:
+            kinds = set(recorded) | set(resources)
+        self._record_route_set(route_set, recorded, kinds)
+        report['failed_batches'] = len(failed)
+        report['duration_s'] = round(time.monotonic() - started, 2)
+        if output == 'json':
+            click.echo(json.dumps(report, indent=2, ensure_ascii=False))
+            return report
+        for step, result in failed:
+            click.echo(f"✗ {step} 失败: {(result.stderr or result.stdout).strip()}", err=True)
+        if failed:
+            click.echo(f"\n✗ {len(failed)}/{len(commands)} 个请求失败（冲突字段可使用 --force-conflicts 接管）")
+        else:
+            click.echo(f"\n✓ 同步完成: {len(batches)} 个批次"
+                       + (f"，{len(deletions)} 条删除命令" if deletions else '')
+                       + f"，耗时 {report['duration_s']:.1f}s")
+        return report
+    
+    def _benchmark_target(self, url: Optional[str] = None) -> str:
+        """压测地址：优先使用参数，其次使用 create-lb 保存的 ALB 地址"""
+        if url:
+            return url
+        if Path('alb-endpoint.txt').exists():
+            hostname = Path('alb-endpoint.txt').read_text(encoding='utf-8').strip()
+            if hostname:
+                return f"http://{hostname}/"
+        click.echo("✗ 找不到 ALB 地址，请指定 --url 或先运行 create-lb", err=True)
+        sys.exit(1)
+    
+    def _benchmark_metadata(self) -> Dict[str, Any]:
+        """结果库的索引字段：集群、配置哈希、Chart 版本和实例类型"""
+        chart_version = str(self.config.get('higress', {}).get('chart_version', '') or '').strip()
+        if not chart_version:
+            chart_version = (self.artifacts.entry('higress-chart') or {}).get('version') or 'unknown'
+        config_hash = hashlib.sha256(json.dumps(self.config, sort_keys=True, default=str).encode()).hexdigest()
+        return {
+            'cluster': self.config['eks']['cluster_name'],
+            'region': self.config['aws']['region'],
+            'instance_type': self.config['eks'].get('instance_type', ''),
+            'chart_version': chart_version,
+            'config_hash': config_hash[:12],
+        }
+    
+    def _run_load_trial(self, url: str, concurrency: int, duration: str) -> Optional[Dict[str, float]]:
+        """用 hey 执行一轮固定时长的压测"""
+        result = self._run_parallel([
+            ('hey', ['hey', '-z', duration, '-c', str(concurrency), url])
+        ], stream=False)[0]
+        if result.returncode == 127:
+            click.echo("✗ 未安装压测工具 hey（https://github.com/rakyll/hey）", err=True)
+            sys.exit(1)
+        if not result.ok:
+            click.echo(f"⚠ 压测失败: {result.stderr or result.returncode}")
+            return None
+        return _parse_hey_output(result.stdout)
+    
+    @traced_step
+    def run_benchmark(self, url: Optional[str] = None, concurrency: int = 50, duration: str = '30s',
+                      repeat: int = 5, label: str = '', store: Optional[BenchmarkStore] = None,
+                      extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """重复多轮压测并把每轮结果写入结果库（extra 覆盖或补充记录字段）"""
+        target = self._benchmark_target(url)
+        click.echo(f"\n压测 {target}（并发 {concurrency}，每轮 {duration}，共 {repeat} 轮）...")
+        
+        trials = []
+        for i in range(repeat):
+            trial = self._run_load_trial(target, concurrency, duration)
+            if trial is None:
+                continue
+            trials.append(trial)
+            click.echo(f"  第 {i + 1} 轮: RPS {trial['rps']:.1f}  p50 {trial['p50_ms'] or 0:.1f}ms  "
+                       f"p99 {trial['p99_ms'] or 0:.1f}ms  错误率 {trial['error_ratio'] * 100:.2f}%")
+        if not trials:
+            click.echo("✗ 没有成功的压测轮次", err=True)
+            sys.exit(1)
+        
+        record = {
+            'id': f"{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(2).hex()}",
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'label': label,
+            **self._benchmark_metadata(),
+            **(extra or {}),
+            'target': target,
+            'params': {'concurrency': concurrency, 'duration': duration, 'repeat': repeat},
+            'trials': trials,
+            'summary': {
+                metric: _median([t[metric] for t in trials if t.get(metric) is not None])
+                for metric in BENCHMARK_METRICS if any(t.get(metric) is not None for t in trials)
+            },
+        }
+        store = store or BenchmarkStore()
+        store.append(record)
+        click.echo(f"✓ 结果已保存: {record['id']}（{store.path}）")
+        return record
+    
+    def _instance_vcpus(self, instance_types: List[str]) -> Dict[str, int]:
+        """查询实例类型的 vCPU 数"""
+        data, error = self._query_aws(['ec2', 'describe-instance-types', '--instance-types', *instance_types])
+        if not data:
+            click.echo(f"✗ 无法查询实例类型: {error}", err=True)
+            sys.exit(1)
+        return {item['InstanceType']: item['VCpuInfo']['DefaultVCpus'] for item in data.get('InstanceTypes', [])}
+    
+    def _instance_price(self, instance_type: str) -> Optional[float]:
+        """每小时按需价格（美元）：优先使用 benchmark.prices，否则查询 AWS Pricing API"""
+        prices = self.config.get('benchmark', {}).get('prices', {}) or {}
+        if instance_type in prices:
+            return float(prices[instance_type])
+        
+        filters = {
+            'instanceType': instance_type,
+            'regionCode': self.config['aws']['region'],
+            'operatingSystem': 'Linux',
+            'tenancy': 'Shared',
+            'preInstalledSw': 'NA',
+            'capacitystatus': 'Used',
+        }
+        data, error = self._query_aws([
+            'pricing', 'get-products', '--service-code', 'AmazonEC2',
+            '--filters', *[f"Type=TERM_MATCH,Field={field},Value={value}" for field, value in filters.items()]
+        ], timeout=30, region=PRICING_API_REGION)
+        if data is None:
+            click.echo(f"⚠ 无法查询 {instance_type} 的价格: {error}")
+            return None
+        for item in data.get('PriceList', []):
+            product = json.loads(item) if isinstance(item, str) else item
+            for term in product.get('terms', {}).get('OnDemand', {}).values():
+                for dimension in term.get('priceDimensions', {}).values():
+                    price = float(dimension.get('pricePerUnit', {}).get('USD', 0))
+                    if price > 0:
+                        return price
+        click.echo(f"⚠ Pricing API 中没有 {instance_type} 的按需价格")
+        return None
+    
+    def _benchmark_nodegroup_name(self, instance_type: str) -> str:
+        return f"{BENCHMARK_NODEGROUP_PREFIX}-{instance_type.replace('.', '-')}"
+    
+    def _generate_benchmark_nodegroup_file(self, instance_type: str, nodes: int) -> str:
+        """生成压测专用节点组的 eksctl 配置（带污点，只运行 Gateway）"""
+        config = self.config
+        nodegroup_config = {
+            'apiVersion': 'eksctl.io/v1alpha5',
+            'kind': 'ClusterConfig',
+            'metadata': {
+                'name': config['eks']['cluster_name'],
+                'region': config['aws']['region']
+            },
+            'vpc': {
+                'id': config['vpc']['vpc_id'],
+                'subnets': {
+                    'public': self._eksctl_subnets(config['vpc']['public_subnets']),
+                    'private': self._eksctl_subnets(config['vpc']['private_subnets'])
+                }
+            },
+            'managedNodeGroups': [{
+                'name': self._benchmark_nodegroup_name(instance_type),
+                'instanceType': instance_type,
+                'desiredCapacity': nodes,
+                'minSize': nodes,
+                'maxSize': nodes,
+                'volumeSize': config['eks']['volume_size'],
+                'volumeType': 'gp3',
+                'privateNetworking': True,
+                'subnets': config['vpc']['private_subnets'],
+                'labels': {
+                    'role': 'higress-benchmark'
+                },
+                'taints': [{
+                    'key': BENCHMARK_NODE_TAINT,
+                    'value': 'true',
+                    'effect': 'NoSchedule'
+                }],
+                'tags': {
+                    'Name': 'higress-benchmark-node',
+                    'Environment': 'benchmark'
+                }
+            }]
+        }
+        
+        config_file = 'eks-nodegroup-bench.yaml'
+        with open(config_file, 'w', encoding='utf-8') as f:
+            yaml.dump(nodegroup_config, f, default_flow_style=False)
+        return config_file
+    
+    def _generate_benchmark_values_file(self, instance_type: str, nodes: int, vcpus: int) -> str:
+        """生成覆盖 values：Gateway 固定副本数、调度到压测节点组，并按节点规格分配 CPU"""
+        cpu = max(500, vcpus * 1000 - BENCHMARK_SYSTEM_CPU_MILLICORES)
+        values = {
+            'higress-core': {
+                'gateway': {
+                    'replicas': nodes,
+                    'autoscaling': {'enabled': False},
+                    'nodeSelector': {
+                        'eks.amazonaws.com/nodegroup': self._benchmark_nodegroup_name(instance_type)
+                    },
+                    # 覆盖主配置中的架构限制，Graviton 候选类型也能调度
+                    'affinity': {
+                        'nodeAffinity': self._arch_node_affinity([_instance_architecture(instance_type)])
+                    },
+                    'tolerations': [{
+                        'key': BENCHMARK_NODE_TAINT,
+                        'operator': 'Exists',
+                        'effect': 'NoSchedule'
+                    }],
+                    'resources': {
+                        'requests': {'cpu': f"{cpu}m"},
+                        'limits': {'cpu': f"{cpu}m"}
+                    },
+                    'podDisruptionBudget': {
+                        'enabled': True,
+                        'maxUnavailable': 1
+                    }
+                }
+            }
+        }
+        
+        values_file = 'higress-values-bench.yaml'
+        with open(values_file, 'w', encoding='utf-8') as f:
+            yaml.dump(values, f, default_flow_style=False)
+        return values_file
+    
+    def _upgrade_gateway(self, values_files: List[str], timeout: int) -> bool:
+        """用给定的 values 升级 Higress 并等待核心组件就绪"""
+        flags = ' '.join(f"-f {values_file}" for values_file in values_files)
+        self._run_command(
+            f"helm upgrade --install higress {self._higress_chart()} -n higress-system {flags} --timeout 30m"
         )
-        if result:
-            click.echo(f"\n【访问地址】")
-            click.echo(f"ALB DNS: {result}")
-            click.echo(f"HTTP: http://{result}")
-            click.echo(f"HTTPS: https://{result}")
+        return self._wait_for_core_workloads(timeout)
+    
+    def _delete_benchmark_nodegroups(self, instance_types: List[str]):
+        """并行删除压测节点组"""
+        if not instance_types:
+            return
+        self._run_parallel([
+            (f"删除节点组 {self._benchmark_nodegroup_name(t)}",
+             ['eksctl', 'delete', 'nodegroup', '--cluster', self.config['eks']['cluster_name'],
+              '--region', self.config['aws']['region'], '--name', self._benchmark_nodegroup_name(t),
+              '--approve', '--wait'])
+            for t in instance_types
+        ])
+    
+    @traced_step
+    def run_benchmark_matrix(self, instance_types: List[str], nodes: int = 2, url: Optional[str] = None,
+                             concurrency: int = 50, duration: str = '30s', repeat: int = 5,
+                             keep_nodegroups: bool = False,
+                             store: Optional[BenchmarkStore] = None) -> List[Dict[str, Any]]:
+        """依次在每种候选实例类型的专用节点组上部署 Gateway 并压测，返回排名后的结果
+        
+        每种类型创建一个带污点的托管节点组，Gateway 通过 nodeSelector/toleration 调度上去，
+        副本数与节点数相同；压测结束后 Gateway 恢复为原配置，压测节点组随后删除。
+        """
+        store = store or BenchmarkStore()
+        target = self._benchmark_target(url)
+        timeout = self.config.get('higress', {}).get('upgrade_timeout', 300)
+        matrix_id = time.strftime('%Y%m%d-%H%M%S')
+        label = f"matrix-{matrix_id}"
+        
+        vcpus = self._instance_vcpus(instance_types)
+        unknown = [t for t in instance_types if t not in vcpus]
+        if unknown:
+            click.echo(f"✗ 当前区域不支持的实例类型: {', '.join(unknown)}", err=True)
+            sys.exit(1)
+        prices = {t: self._instance_price(t) for t in instance_types}
+        
+        click.echo(f"\n矩阵压测 {label}：{len(instance_types)} 种实例类型，每种 {nodes} 个节点")
+        values_file = self._create_higress_values()
+        records = []
+        # 已创建但尚未删除的压测节点组；Gateway 迁移到新节点组后再删除旧的，避免 Pod 无处调度
+        pending = []
+        try:
+            for index, instance_type in enumerate(instance_types, 1):
+                click.echo(f"\n【{index}/{len(instance_types)}】{instance_type}"
+                           f"（{vcpus[instance_type]} vCPU，"
+                           f"{'$' + format(prices[instance_type], '.4f') + '/小时' if prices[instance_type] else '价格未知'}）")
+                
+                click.echo(f"创建节点组 {self._benchmark_nodegroup_name(instance_type)}...")
+                nodegroup_file = self._generate_benchmark_nodegroup_file(instance_type, nodes)
+                result = self._run_parallel([
+                    ('创建节点组', ['eksctl', 'create', 'nodegroup', '-f', nodegroup_file])
+                ])[0]
+                # 失败时 CloudFormation 栈可能已部分创建，同样加入待删除列表
+                pending.append(instance_type)
+                if not result.ok:
+                    click.echo(f"✗ 节点组创建失败，跳过 {instance_type}")
+                    continue
+                
+                click.echo("部署 Gateway 到压测节点组...")
+                overlay = self._generate_benchmark_values_file(instance_type, nodes, vcpus[instance_type])
+                if not self._upgrade_gateway([values_file, overlay], timeout):
+                    click.echo(f"✗ Gateway 未在 {timeout} 秒内就绪，跳过 {instance_type}")
+                    continue
+                
+                if not keep_nodegroups:
+                    self._delete_benchmark_nodegroups([t for t in pending if t != instance_type])
+                    pending = [instance_type]
+                
+                # 模拟模式下让替身 hey 按当前实例类型生成结果
+                if CommandSimulator.active():
+                    CommandSimulator.set_context(
+                        {**self.config, 'eks': {**self.config['eks'], 'instance_type': instance_type}}
+                    )
+                records.append(self.run_benchmark(target, concurrency, duration, repeat, label, store, extra={
+                    'instance_type': instance_type,
+                    'matrix': {
+                        'id': matrix_id,
+                        'nodes': nodes,
+                        'vcpus': vcpus[instance_type],
+                        'hourly_price': prices[instance_type],
+                    },
+                }))
+        finally:
+            if CommandSimulator.active():
+                CommandSimulator.set_context(self.config)
+            click.echo("\n恢复 Gateway 原配置...")
+            if not self._upgrade_gateway([values_file], timeout):
+                click.echo(f"⚠ Gateway 未在 {timeout} 秒内恢复就绪，请检查: kubectl get pods -n higress-system")
+            if keep_nodegroups:
+                click.echo(f"\n保留压测节点组（前缀 {BENCHMARK_NODEGROUP_PREFIX}），用完后请手动删除")
+            else:
+                click.echo("\n删除压测节点组...")
+                self._delete_benchmark_nodegroups(pending)
+        
+        return _rank_matrix([_matrix_row(record) for record in records])
     
+    @traced_step
     def delete_higress(self, force: bool = False):
         """仅删除 Higress 相关资源"""
         if not force:
@@ -1077,17 +5413,25 @@ class HigressDeployer:
         
         click.echo("\n开始删除 Higress...")
         
-        # 1. 删除 ALB Ingress（会自动删除 ALB）
-        click.echo("\n1. 删除 ALB Ingress...")
-        self._run_command("kubectl delete ingress --all -n higress-system", check=False)
+        # 1. 删除前记录 higress-system 拥有的负载均衡资源，之后按实际删除状态等待
+        click.echo("\n1. 查找 Higress 的负载均衡资源...")
+        resources = self._find_owned_lb_resources(stack='higress-system')
         
-        # 2. 删除 Higress Helm Release
-        click.echo("\n2. 删除 Higress...")
-        self._run_command("helm uninstall higress -n higress-system", check=False)
+        # 2. 删除 ALB Ingress（ALB 由 Controller 异步删除）、Helm Release 和 PriorityClass，互不依赖，并行执行
+        click.echo("\n2. 删除 ALB Ingress、Higress 和 PriorityClass...")
+        self._run_parallel([
+            ('删除 ALB Ingress', ['kubectl', 'delete', 'ingress', '--all', '-n', 'higress-system', '--wait=false']),
+            ('卸载 Higress', ['helm', 'uninstall', 'higress', '-n', 'higress-system']),
+            # PriorityClass 是集群级别资源，命名空间删除不会清理
+            ('删除 PriorityClass', ['kubectl', 'delete', 'priorityclass', *PRIORITY_CLASSES, '--ignore-not-found']),
+        ], timeout=300)
         
-        # 3. 等待 LoadBalancer 清理
+        # 3. 等待负载均衡器、目标组和网络接口真正删除
         click.echo("\n3. 等待 AWS 资源清理...")
-        time.sleep(20)
+        if resources is None:
+            CommandSimulator.sleep(20)
+        else:
+            self._release_load_balancers(resources)
         
         # 4. 删除命名空间（会删除所有资源）
         click.echo("\n4. 删除 higress-system 命名空间...")
@@ -1112,6 +5456,7 @@ class HigressDeployer:
         click.echo("\nEKS 集群仍在运行，如需删除集群请运行:")
         click.echo("  ./higress_deploy.py clean eks")
     
+    @traced_step
     def delete_cluster(self, force: bool = False):
         """删除 EKS 集群及所有资源"""
         cluster_name = self.config['eks']['cluster_name']
@@ -1136,50 +5481,112 @@ class HigressDeployer:
         
         click.echo("\n开始删除集群...")
         
-        # 1. 删除 Higress
-        click.echo("\n1. 删除 Higress...")
-        self._run_command("kubectl delete ingress --all -n higress-system", check=False)
-        self._run_command("helm uninstall higress -n higress-system", check=False)
-        self._run_command("kubectl delete namespace higress-system --timeout=60s", check=False)
-        
-        # 2. 删除 ALB Controller
-        click.echo("\n2. 删除 AWS Load Balancer Controller...")
-        self._run_command("helm uninstall aws-load-balancer-controller -n kube-system", check=False)
+        # 1. 删除所有 Ingress、卸载 Higress（Gateway 的 LoadBalancer Service）并删除其他 LoadBalancer Service；
+        #    ALB Controller 仍在运行，由它删除对应的 ALB/NLB 和目标组
+        click.echo("\n1. 删除 Ingress、Higress 和 LoadBalancer Service...")
+        resources = self._find_owned_lb_resources()
+        self._run_parallel([
+            ('删除 Ingress', ['kubectl', 'delete', 'ingress', '--all', '--all-namespaces', '--wait=false']),
+            ('卸载 Higress', ['helm', 'uninstall', 'higress', '-n', 'higress-system']),
+        ], timeout=300)
+        services = self._run_parallel([('Service', ['kubectl', 'get', 'services', '--all-namespaces', '-o', 'json'])],
+                                      timeout=60, stream=False)[0]
+        if services.ok:
+            commands = [
+                (f"删除 Service {item['metadata']['namespace']}/{item['metadata']['name']}",
+                 ['kubectl', 'delete', 'service', item['metadata']['name'], '-n', item['metadata']['namespace'],
+                  '--wait=false'])
+                for item in json.loads(services.stdout or '{}').get('items', [])
+                if item.get('spec', {}).get('type') == 'LoadBalancer'
+            ]
+            if commands:
+                self._run_parallel(commands, timeout=60)
         
-        # 3. 删除 webhook 配置
-        click.echo("\n3. 清理 webhook 配置...")
-        self._run_command("kubectl delete validatingwebhookconfiguration aws-load-balancer-webhook", check=False)
-        self._run_command("kubectl delete mutatingwebhookconfiguration aws-load-balancer-webhook", check=False)
+        # 2. 卸载 Controller 之前等待负载均衡资源真正删除，否则 Controller 无法移除 finalizer，
+        #    残留的 ENI 和安全组会导致 VPC 依赖错误
+        click.echo("\n2. 等待 AWS 资源清理...")
+        if resources is None:
+            CommandSimulator.sleep(30)
+        else:
+            self._release_load_balancers(resources)
         
-        # 4. 等待资源清理
-        click.echo("\n4. 等待 AWS 资源清理...")
-        time.sleep(30)
+        # 3. 负载均衡释放后再卸载 Controller；Helm Release 和 webhook 配置互不依赖，并行清理
+        click.echo("\n3. 删除 AWS Load Balancer Controller 和 webhook 配置...")
+        commands = [
+            ('卸载 AWS Load Balancer Controller', ['helm', 'uninstall', 'aws-load-balancer-controller', '-n', 'kube-system']),
+            ('删除 validating webhook', ['kubectl', 'delete', 'validatingwebhookconfiguration',
+                                        'aws-load-balancer-webhook', '--ignore-not-found']),
+            ('删除 mutating webhook', ['kubectl', 'delete', 'mutatingwebhookconfiguration',
+                                      'aws-load-balancer-webhook', '--ignore-not-found']),
+        ]
+        self._run_parallel(commands, timeout=300)
+        self._run_command("kubectl delete namespace higress-system --timeout=60s", check=False)
         
-        # 5. 删除 EKS 集群
-        click.echo("\n5. 删除 EKS 集群（预计需要 10-15 分钟）...")
+        # 4. 删除 EKS 集群
+        click.echo("\n4. 删除 EKS 集群（预计需要 10-15 分钟）...")
         cmd = f"eksctl delete cluster --name {cluster_name} --region {region} --wait"
         self._run_command(cmd)
         
-        # 6. 删除 IAM 策略
-        click.echo("\n6. 清理 IAM 策略...")
+        # 5. 删除 IAM 策略（集群删除后 IRSA 角色已解除关联）
+        click.echo("\n5. 清理 IAM 策略...")
         account_id = self._get_aws_account_id()
-        policy_arn = f"arn:aws:iam::{account_id}:policy/AWSLoadBalancerControllerIAMPolicy"
-        self._run_command(f"aws iam delete-policy --policy-arn {policy_arn}", check=False)
+        commands = [
+            (f"删除策略 {policy_name}",
+             ['aws', 'iam', 'delete-policy', '--policy-arn', f"arn:aws:iam::{account_id}:policy/{policy_name}"])
+            for policy_name in ('AWSLoadBalancerControllerIAMPolicy', 'AmazonEKS_EBS_CSI_Driver_Policy')
+        ]
+        for (step, _), result in zip(commands, self._run_parallel(commands, timeout=60)):
+            if result.ok:
+                click.echo(f"  ✓ {step}")
+            elif 'NoSuchEntity' in result.stderr:
+                click.echo(f"  - {step}: 不存在")
+            else:
+                click.echo(f"  ⚠ {step}失败: {result.stderr or result.returncode}")
         
         click.echo("\n" + "="*60)
         click.echo("✓ 集群删除完成")
         click.echo("="*60)
 
 
+def _export_trace(profile: bool, trace_file: Optional[str], otel_file: Optional[str]):
+    """命令结束时导出追踪数据"""
+    if not TRACER.spans:
+        return
+    if trace_file:
+        TRACER.export_json(trace_file)
+    if otel_file:
+        TRACER.export_otlp(otel_file)
+    if profile:
+        click.echo("\n" + "="*60)
+        click.echo("耗时最长的 10 个操作")
+        click.echo("="*60)
+        for span in TRACER.slowest(10):
+            name = span['name'] if len(span['name']) <= 70 else span['name'][:67] + '...'
+            click.echo(f"  {span['duration']:8.1f}s  {span['kind']:8} {name}")
+        if trace_file:
+            click.echo(f"\n完整时间线: {trace_file}")
+
+
 @click.group()
 @click.version_option(version='1.0.0')
-def cli():
+@click.option('--profile', is_flag=True, help='结束时打印耗时最长的 10 个操作')
+@click.option('--trace-file', default='higress-trace.json', help='JSON 时间线输出路径（空字符串表示不输出）')
+@click.option('--otel-file', default=None, help='OpenTelemetry（OTLP/JSON）格式追踪输出路径')
+@click.option('--simulate', is_flag=True, help='离线模拟：按场景文件回放 aws/kubectl/eksctl/helm 响应，不访问 AWS')
+@click.option('--sim-scenario', default=None, help=f'模拟场景文件（默认 {SIMULATION_SCENARIO_FILE}）')
+@click.option('--sim-time-scale', type=float, default=None, help='模拟延迟的缩放系数（如 0.01 表示加速 100 倍）')
+@click.option('--sim-keep-state', is_flag=True, help='沿用上次模拟运行的集群状态（默认每次运行从全新状态开始）')
+@click.pass_context
+def cli(ctx, profile, trace_file, otel_file, simulate, sim_scenario, sim_time_scale, sim_keep_state):
     """
     Higress EKS 部署工具
     
     自动化部署 Higress 到 AWS EKS 集群
     """
-    pass
+    if simulate:
+        scenario = sim_scenario or str(Path(__file__).resolve().parent / SIMULATION_SCENARIO_FILE)
+        CommandSimulator(scenario, sim_time_scale, sim_keep_state).activate()
+    ctx.call_on_close(lambda: _export_trace(profile, trace_file, otel_file))
 
 
 @cli.command()
@@ -1241,6 +5648,15 @@ def init(output):
     click.echo(f"\n请编辑 {output} 填入您的 AWS 资源信息")
 
 
+@cli.command()
+@click.option('--config', '-c', default='config.yaml', help='配置文件路径')
+def preflight(config):
+    """并行预检工具、凭证、配额和子网"""
+    deployer = HigressDeployer(config)
+    if not deployer.preflight():
+        sys.exit(1)
+
+
 @cli.command()
 @click.option('--config', '-c', default='config.yaml', help='配置文件路径')
 def create(config):
@@ -1257,6 +5673,14 @@ def install_ebs_csi(config):
     deployer._install_ebs_csi_driver()
 
 
+@cli.command()
+@click.option('--config', '-c', default='config.yaml', help='配置文件路径')
+def install_nth(config):
+    """安装 AWS Node Termination Handler（Spot 节点组，create 已包含）"""
+    deployer = HigressDeployer(config)
+    deployer.install_node_termination_handler()
+
+
 @cli.command()
 @click.option('--config', '-c', default='config.yaml', help='配置文件路径')
 def install_alb(config):
@@ -1278,10 +5702,9 @@ def fix_alb_permissions(config):
     account_id = deployer._get_aws_account_id()
     policy_arn = f"arn:aws:iam::{account_id}:policy/AWSLoadBalancerControllerIAMPolicy"
     
-    # 下载最新策略
-    click.echo("\n下载最新的 IAM 策略...")
-    policy_url = "https://raw.githubusercontent.com/kubernetes-sigs/aws-load-balancer-controller/v2.7.0/docs/install/iam_policy.json"
-    deployer._run_command(f"curl -o iam-policy.json {policy_url}")
+    # 获取策略（本地缓存）
+    click.echo("\n获取 IAM 策略...")
+    shutil.copyfile(deployer._artifact('alb-iam-policy'), 'iam-policy.json')
     
     # 添加缺失的权限
     click.echo("\n添加缺失的 ELB 权限...")
@@ -1289,14 +5712,6 @@ def fix_alb_permissions(config):
         with open('iam-policy.json', 'r') as f:
             policy = json.load(f)
         
-        # 需要添加的权限
-        additional_permissions = [
-            "elasticloadbalancing:DescribeListenerAttributes",
-            "elasticloadbalancing:ModifyListenerAttributes",
-            "elasticloadbalancing:DescribeListenerCertificates",
-            "elasticloadbalancing:ModifyListenerCertificates"
-        ]
-        
         # 只在第一个包含 elasticloadbalancing 权限的 Statement 中添加
         added = False
         for statement in policy.get('Statement', []):
@@ -1305,7 +5720,7 @@ def fix_alb_permissions(config):
                 if isinstance(actions, list):
                     has_elb = any('elasticloadbalancing' in action for action in actions)
                     if has_elb:
-                        for perm in additional_permissions:
+                        for perm in ALB_ADDITIONAL_PERMISSIONS:
                             if perm not in actions:
                                 actions.append(perm)
                                 click.echo(f"  添加权限: {perm}")
@@ -1353,10 +5768,11 @@ def fix_alb_permissions(config):
 
 @cli.command()
 @click.option('--config', '-c', default='config.yaml', help='配置文件路径')
-def deploy(config):
-    """部署 Higress"""
+@click.option('--force', is_flag=True, help='即使配置无变化也执行升级')
+def deploy(config, force):
+    """部署或升级 Higress（配置无变化时跳过）"""
     deployer = HigressDeployer(config)
-    deployer.deploy_higress()
+    deployer.deploy_higress(force=force)
 
 
 @cli.command()
@@ -1404,10 +5820,45 @@ def install_all(config):
 
 @cli.command()
 @click.option('--config', '-c', default='config.yaml', help='配置文件路径')
-def status(config):
+@click.option('--output', '-o', type=click.Choice(['text', 'json']), default='text', help='输出格式')
+@click.option('--watch', '-w', is_flag=True, help='实时面板：保持 watch 连接，只重绘变化的行')
+def status(config, output, watch):
     """查看部署状态"""
-    deployer = HigressDeployer(config)
-    deployer.get_status()
+    # 只读命令，不重新生成配置文件
+    deployer = HigressDeployer(config, regenerate=False, quiet=(output == 'json'))
+    if watch:
+        StatusDashboard(deployer).run()
+    else:
+        deployer.get_status(output)
+
+
+@cli.command('perf-report')
+@click.option('--config', '-c', default='config.yaml', help='配置文件路径')
+@click.option('--window', '-w', default='5m', help='统计窗口（Prometheus 时长，如 5m、1h）')
+@click.option('--prometheus-url', default=None, help='直接访问的 Prometheus 地址（如 http://localhost:9090），默认经 API Server 代理访问集群内 Prometheus')
+@click.option('--output', '-o', type=click.Choice(['text', 'json']), default='text', help='输出格式')
+def perf_report(config, window, prometheus_url, output):
+    """Gateway 性能报告：RPS、p50/p99 延迟、5xx、活跃连接、CPU 节流"""
+    if not re.fullmatch(r'\d+[smhdw]', window):
+        raise click.BadParameter(f"无效的时长: {window}", param_hint='--window')
+    deployer = HigressDeployer(config, regenerate=False, quiet=(output == 'json'))
+    deployer.perf_report(window, output, prometheus_url)
+
+
+@cli.command('config-latency')
+@click.option('--config', '-c', default='config.yaml', help='配置文件路径')
+@click.option('--rounds', '-r', default=5, help='测量轮数（每轮创建一条新的标记路由）')
+@click.option('--timeout', default=120.0, help='每轮等待所有 Gateway 生效的最长时间（秒）')
+@click.option('--interval', default=0.2, help='轮询间隔（秒）')
+@click.option('--max-p99', default=None, type=float, help='全部 Pod 生效时间的 p99 超过该值（秒）时以非零状态退出')
+@click.option('--output', '-o', type=click.Choice(['text', 'json']), default='text', help='输出格式')
+def config_latency(config, rounds, timeout, interval, max_p99, output):
+    """测量路由变更下发到每个 Gateway 的时间分布"""
+    deployer = HigressDeployer(config, regenerate=False, quiet=(output == 'json'))
+    report = deployer.config_latency(rounds, timeout, interval, output)
+    slowest = (report['all_pods_s'] or {}).get('p99')
+    if report['incomplete_rounds'] or (max_p99 is not None and (slowest is None or slowest > max_p99)):
+        sys.exit(1)
 
 
 @cli.command()
@@ -1514,11 +5965,15 @@ def fix_alb_security_group(config):
     node_sg = node_sg.strip()
     click.echo(f"✓ 节点 Security Group: {node_sg}")
     
-    # 3. 删除现有 Ingress
+    # 3. 删除现有 Ingress，并等待其 ALB 和目标组真正删除
     click.echo("\n【步骤 3】删除现有 Ingress...")
-    deployer._run_command("kubectl delete ingress higress-alb -n higress-system", check=False)
+    resources = deployer._find_owned_lb_resources(stack='higress-system/higress-alb')
+    deployer._run_command("kubectl delete ingress higress-alb -n higress-system --wait=false", check=False)
     click.echo("等待 AWS 资源清理...")
-    time.sleep(30)
+    if resources is None:
+        CommandSimulator.sleep(30)
+    else:
+        deployer._release_load_balancers(resources)
     
     # 4. 添加 Security Group 规则
     click.echo("\n【步骤 4】添加 Security Group 规则...")
@@ -1565,7 +6020,7 @@ def fix_alb_security_group(config):
         
         if (i + 1) % 3 == 0:
             click.echo(f"等待中... ({(i+1)*10}秒)")
-        time.sleep(10)
+        CommandSimulator.sleep(10)
     else:
         click.echo("\n⚠ ALB 创建超时，请检查 Ingress 状态:")
         deployer._run_command("kubectl describe ingress higress-alb -n higress-system")
@@ -1576,6 +6031,396 @@ def fix_alb_security_group(config):
     click.echo("="*60)
 
 
+@cli.group()
+def benchmark():
+    """压测、保存结果并比较不同部署之间的性能"""
+    pass
+
+
+@benchmark.command('run')
+@click.option('--config', '-c', default='config.yaml', help='配置文件路径')
+@click.option('--url', default=None, help='压测地址（默认使用 alb-endpoint.txt 中的 ALB）')
+@click.option('--concurrency', '-n', default=50, help='并发连接数')
+@click.option('--duration', '-d', default='30s', help='每轮时长')
+@click.option('--repeat', '-r', default=5, help='轮数（用于显著性检验，建议至少 5 轮）')
+@click.option('--label', '-l', default='', help='运行标签（如 baseline、chart-2.0.1）')
+@click.option('--store', default=BENCHMARK_STORE_FILE, help='结果库文件')
+def benchmark_run(config, url, concurrency, duration, repeat, label, store):
+    """执行多轮压测并保存结果"""
+    deployer = HigressDeployer(config, regenerate=False)
+    deployer.run_benchmark(url, concurrency, duration, repeat, label, BenchmarkStore(store))
+
+
+@benchmark.command('list')
+@click.option('--store', default=BENCHMARK_STORE_FILE, help='结果库文件')
+@click.option('--cluster', default=None, help='只显示指定集群')
+@click.option('--limit', '-n', default=20, help='显示最近 N 次运行')
+def benchmark_list(store, cluster, limit):
+    """列出已保存的压测结果"""
+    records = [r for r in BenchmarkStore(store).load() if not cluster or r['cluster'] == cluster][-limit:]
+    click.echo(f"{'ID':22} {'标签':14} {'集群':18} {'实例类型':10} {'Chart':10} {'配置':12} {'RPS':>9} {'p99(ms)':>8}")
+    for r in records:
+        summary = r['summary']
+        click.echo(f"{r['id']:22} {r['label'] or '-':16} {r['cluster']:20} {r['instance_type']:14} "
+                   f"{r['chart_version']:10} {r['config_hash']:14} {summary.get('rps', 0):9.1f} "
+                   f"{summary.get('p99_ms') or 0:8.1f}")
+
+
+@benchmark.command('compare')
+@click.argument('baseline_id', required=False)
+@click.argument('candidate_id', required=False)
+@click.option('--store', default=BENCHMARK_STORE_FILE, help='结果库文件')
+@click.option('--baseline', 'baseline_label', default=None, help='以带此标签的最近一次运行作为基线')
+@click.option('--threshold', default=5.0, help='判定回归的变化幅度（%）')
+@click.option('--alpha', default=0.05, help='显著性水平')
+@click.option('--output', '-o', type=click.Choice(['text', 'json']), default='text', help='输出格式')
+def benchmark_compare(baseline_id, candidate_id, store, baseline_label, threshold, alpha, output):
+    """比较两次运行，发现显著的 RPS/延迟回归（有回归时退出码为 1）
+    
+    默认比较最近一次运行与同一集群的上一次运行（或 --baseline 标签的最近一次运行）。
+    """
+    results = BenchmarkStore(store)
+    records = results.load()
+    candidate = results.get(candidate_id) if candidate_id else (records[-1] if records else None)
+    if candidate is None:
+        raise click.ClickException("结果库中没有运行记录")
+    if baseline_id:
+        baseline = results.get(baseline_id)
+    else:
+        earlier = [r for r in records if r['id'] != candidate['id'] and r['time'] <= candidate['time']]
+        if baseline_label:
+            earlier = [r for r in earlier if r['label'] == baseline_label]
+        else:
+            earlier = [r for r in earlier if r['cluster'] == candidate['cluster']]
+        if not earlier:
+            raise click.ClickException("找不到可作为基线的运行记录")
+        baseline = earlier[-1]
+    
+    rows = BenchmarkStore.compare(baseline, candidate, threshold, alpha)
+    regressed = any(row['regression'] for row in rows)
+    insufficient = any(row['insufficient'] for row in rows)
+    if output == 'json':
+        click.echo(json.dumps({'baseline': baseline['id'], 'candidate': candidate['id'],
+                               'regression': regressed, 'insufficient_trials': insufficient,
+                               'metrics': rows}, indent=2, ensure_ascii=False))
+    else:
+        click.echo("\n" + "="*60)
+        click.echo("压测结果比较")
+        click.echo("="*60)
+        for name, record in (('基线', baseline), ('候选', candidate)):
+            click.echo(f"{name}: {record['id']}  {record['label'] or '-'}  {record['cluster']}  "
+                       f"{record['instance_type']}  Chart {record['chart_version']}  配置 {record['config_hash']}")
+        click.echo(f"\n  {'指标':12} {'基线':>10} {'候选':>10} {'变化':>9} {'p 值':>7}")
+        for row in rows:
+            p_value = f"{row['p_value']:.3f}" if row['p_value'] is not None else '-'
+            icon = '✗ 回归' if row['regression'] else ('⚠ 试验次数不足' if row['insufficient'] else '✓')
+            click.echo(f"  {row['metric']:12} {row['baseline']:10.3f} {row['candidate']:10.3f} "
+                       f"{row['change_pct']:+8.1f}% {p_value:>7}  {icon}")
+        if regressed:
+            click.echo(f"\n✗ 发现显著回归（阈值 {threshold}%，显著性 {alpha}）")
+        else:
+            click.echo("\n✓ 未发现显著回归")
+        if insufficient:
+            click.echo("⚠ 部分指标变化超过阈值，但基线或候选少于 2 次试验，无法判断是否显著（增加 --repeat 后重新压测）")
+    if regressed:
+        sys.exit(1)
+
+
+def _echo_matrix_table(rows: List[Dict[str, Any]], output: str):
+    """输出实例类型排名表"""
+    if output == 'json':
+        click.echo(json.dumps(rows, indent=2, ensure_ascii=False))
+        return
+    
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else '-'
+    
+    click.echo("\n" + "="*60)
+    click.echo("实例类型性能矩阵（按每百万请求成本排名）")
+    click.echo("="*60)
+    click.echo(f"\n  {'#':>2} {'实例类型':12} {'节点':>4} {'vCPU':>5} {'RPS':>9} {'RPS/vCPU':>9} "
+               f"{'p99(ms)':>8} {'$/小时':>8} {'$/百万请求':>10}")
+    for row in rows:
+        hourly = row['hourly_price'] * row['nodes'] if row['hourly_price'] else None
+        click.echo(f"  {row['rank']:>2} {row['instance_type']:14} {row['nodes']:>4} {row['vcpus']:>5} "
+                   f"{row['rps']:9.1f} {fmt(row['rps_per_vcpu'], '9.1f'):>9} {fmt(row['p99_ms'], '8.1f'):>8} "
+                   f"{fmt(hourly, '8.3f'):>8} {fmt(row['cost_per_million'], '10.4f'):>10}")
+    if rows:
+        click.echo(f"\n✓ 推荐: {rows[0]['instance_type']}")
+
+
+@benchmark.command('matrix')
+@click.option('--config', '-c', default='config.yaml', help='配置文件路径')
+@click.option('--types', '-t', default=None,
+              help='候选实例类型，逗号分隔（默认 benchmark.instance_types 或内置候选列表）')
+@click.option('--nodes', default=None, type=int, help='每种实例类型的节点数（默认 benchmark.nodes 或 2）')
+@click.option('--url', default=None, help='压测地址（默认使用 alb-endpoint.txt 中的 ALB）')
+@click.option('--concurrency', '-n', default=50, help='并发连接数')
+@click.option('--duration', '-d', default='30s', help='每轮时长')
+@click.option('--repeat', '-r', default=5, help='每种实例类型的轮数')
+@click.option('--keep-nodegroups', is_flag=True, help='压测后保留节点组')
+@click.option('--store', default=BENCHMARK_STORE_FILE, help='结果库文件')
+@click.option('--output', '-o', type=click.Choice(['text', 'json']), default='text', help='输出格式')
+@click.option('--force', '-f', is_flag=True, help='不需要确认')
+def benchmark_matrix(config, types, nodes, url, concurrency, duration, repeat, keep_nodegroups, store, output,
+                     force):
+    """在候选实例类型上逐一部署 Gateway 并压测，按每 vCPU 的 RPS、p99 和每百万请求成本排名
+    
+    压测期间 Gateway 会迁移到临时节点组，只应在压测集群上运行。
+    """
+    deployer = HigressDeployer(config, regenerate=False)
+    benchmark_config = deployer.config.get('benchmark', {})
+    instance_types = [t.strip() for t in types.split(',') if t.strip()] if types \
+        else benchmark_config.get('instance_types') or BENCHMARK_CANDIDATE_TYPES
+    nodes = nodes or benchmark_config.get('nodes', 2)
+    
+    if not force:
+        click.echo("\n" + "="*60)
+        click.echo("警告：矩阵压测会把 Gateway 迁移到临时节点组")
+        click.echo("="*60)
+        click.echo(f"\n集群: {deployer.config['eks']['cluster_name']}")
+        click.echo(f"实例类型: {', '.join(instance_types)}（每种 {nodes} 个节点）")
+        click.echo("压测期间 Gateway 副本数固定、不再服务正常流量，结束后恢复原配置。")
+        if not click.confirm("\n确认开始矩阵压测？"):
+            click.echo("✗ 取消压测")
+            return
+    
+    rows = deployer.run_benchmark_matrix(instance_types, nodes, url, concurrency, duration, repeat,
+                                         keep_nodegroups, BenchmarkStore(store))
+    _echo_matrix_table(rows, output)
+
+
+@benchmark.command('rank')
+@click.argument('matrix_id', required=False)
+@click.option('--store', default=BENCHMARK_STORE_FILE, help='结果库文件')
+@click.option('--output', '-o', type=click.Choice(['text', 'json']), default='text', help='输出格式')
+def benchmark_rank(matrix_id, store, output):
+    """重新输出某次矩阵压测（默认最近一次）的排名表"""
+    records = [r for r in BenchmarkStore(store).load() if r.get('matrix')]
+    if not records:
+        raise click.ClickException("结果库中没有矩阵压测记录")
+    matrix_id = matrix_id or records[-1]['matrix']['id']
+    rows = [_matrix_row(r) for r in records if r['matrix']['id'] == matrix_id]
+    if not rows:
+        raise click.ClickException(f"找不到矩阵压测: {matrix_id}")
+    _echo_matrix_table(_rank_matrix(rows), output)
+
+
+@cli.group()
+def logs():
+    """访问日志分析"""
+    pass
+
+
+@logs.command('analyze')
+@click.argument('files', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'log_format', type=click.Choice(['auto', 'alb', 'envoy']), default='auto',
+              help='日志格式（auto 按行自动识别 ALB / Envoy JSON / Envoy 文本）')
+@click.option('--top', '-n', default=20, help='输出最慢的前 N 个路由')
+@click.option('--min-count', default=10, help='请求数少于该值的路由不参与排名')
+@click.option('--workers', '-j', default=None, type=int, help='并行进程数（默认 CPU 核数）')
+@click.option('--output', '-o', type=click.Choice(['text', 'json']), default='text', help='输出格式')
+def logs_analyze(files, log_format, top, min_count, workers, output):
+    """流式分析 ALB / Higress 访问日志（支持 gzip），按路由和上游统计延迟分位数"""
+    start = time.monotonic()
+    stats = LogStats()
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    if workers > 1:
+        # 每个文件在独立进程中流式解析，只把有界大小的草图传回主进程合并
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for file_stats in executor.map(_analyze_log_file, files, [log_format] * len(files)):
+                stats.merge(file_stats)
+    else:
+        for path in files:
+            stats.merge(_analyze_log_file(path, log_format))
+    elapsed = time.monotonic() - start
+    
+    routes = LogStats.summarize(stats.routes, min_count)[:top]
+    upstreams = LogStats.summarize(stats.upstreams, min_count)[:top]
+    requests = sum(bucket['count'] for bucket in stats.routes.values())
+    
+    if output == 'json':
+        click.echo(json.dumps({
+            'files': len(files), 'lines': stats.lines, 'skipped': stats.skipped, 'requests': requests,
+            'duration': round(elapsed, 2), 'routes': routes, 'upstreams': upstreams
+        }, indent=2, ensure_ascii=False))
+        return
+    
+    def fmt(value):
+        return f"{value:9.1f}" if value is not None else f"{'-':>9}"
+    
+    def print_rows(rows):
+        click.echo(f"  {'名称':54} {'请求数':>8} {'5xx':>7} {'p50(ms)':>9} {'p90(ms)':>9} {'p99(ms)':>9} {'max(ms)':>9}")
+        for row in rows:
+            name = row['name'] if len(row['name']) <= 56 else row['name'][:53] + '...'
+            click.echo(f"  {name:56} {row['count']:8d} {row['error_ratio'] * 100:6.2f}% "
+                       f"{fmt(row['p50_ms'])} {fmt(row['p90_ms'])} {fmt(row['p99_ms'])} {fmt(row['max_ms'])}")
+        if not rows:
+            click.echo("  无数据")
+    
+    click.echo("\n" + "="*60)
+    click.echo("访问日志分析")
+    click.echo("="*60)
+    click.echo(f"\n文件 {len(files)} 个，{stats.lines} 行（无法解析 {stats.skipped} 行），"
+               f"请求 {requests} 个，耗时 {elapsed:.1f}秒")
+    click.echo(f"\n【最慢路由 Top {top}（按 p99）】")
+    print_rows(routes)
+    click.echo(f"\n【上游 Top {top}（按 p99）】")
+    print_rows(upstreams)
+
+
+@cli.group()
+def routes():
+    """批量管理路由对象（Ingress、Higress CRD）"""
+    pass
+
+
+@routes.command('sync')
+@click.argument('sources', nargs=-1, required=True)
+@click.option('--config', '-c', default='config.yaml', help='配置文件路径')
+@click.option('--namespace', '-n', default='default', help='未指定命名空间的对象使用的命名空间')
+@click.option('--set', 'route_set', default='default', help=f'路由集合名称（写入 {ROUTE_SYNC_LABEL} 标签）')
+@click.option('--prune', is_flag=True, help='删除该路由集合中已不在输入里的对象')
+@click.option('--concurrency', '-j', default=ROUTE_SYNC_CONCURRENCY, help='同时执行的 apply 请求数')
+@click.option('--batch-size', default=ROUTE_SYNC_BATCH_SIZE, help='每次 apply 的对象数')
+@click.option('--coalesce', is_flag=True, help='所有变更合并为一次 apply，减少 Gateway 收到的配置推送次数')
+@click.option('--dry-run', is_flag=True, help='只输出差异，不做修改')
+@click.option('--force-conflicts', is_flag=True, help='接管其他字段管理者（如 kubectl apply）设置的字段')
+@click.option('--output', '-o', type=click.Choice(['text', 'json']), default='text', help='输出格式')
+def routes_sync(sources, config, namespace, route_set, prune, concurrency, batch_size, coalesce, dry_run,
+                force_conflicts, output):
+    """从文件、目录或标准输入（-）同步路由，只应用有变化的对象"""
+    if concurrency < 1 or batch_size < 1:
+        raise click.BadParameter("--concurrency 和 --batch-size 必须大于 0")
+    deployer = HigressDeployer(config, regenerate=False, quiet=(output == 'json'))
+    report = deployer.sync_routes(list(sources), namespace, route_set, prune, concurrency, batch_size,
+                                  coalesce, dry_run, force_conflicts, output)
+    if report['failed_batches']:
+        sys.exit(1)
+
+
+@cli.group()
+def artifacts():
+    """管理本地制品缓存（Helm Chart、IAM 策略文档）"""
+    pass
+
+
+@artifacts.command('prefetch')
+@click.option('--config', '-c', default='config.yaml', help='配置文件路径')
+@click.option('--refresh', is_flag=True, help='重新下载并更新锁文件（用于升级未固定版本的制品）')
+def artifacts_prefetch(config, refresh):
+    """预先下载所有制品，之后的部署可离线运行"""
+    deployer = HigressDeployer(config, regenerate=False)
+    higress_version = str(deployer.config.get('higress', {}).get('chart_version', '') or '').strip() or None
+    if not higress_version:
+        click.echo("⚠ 未配置 higress.chart_version：Higress Chart 锁定为当前最新版本，"
+                   "建议固定版本，确保所有集群和批次使用同一版本")
+    
+    click.echo("\n预下载制品...")
+    failed = False
+    for name in ARTIFACTS:
+        version = higress_version if name == 'higress-chart' else None
+        try:
+            path = deployer.artifacts.get(name, version, refresh=refresh)
+        except (ArtifactError, OSError) as e:
+            click.echo(f"  ✗ {name}: {e}")
+            failed = True
+            continue
+        entry = deployer.artifacts.entry(name, version)
+        click.echo(f"  ✓ {name:36} {entry['version'] or '-':10} sha256:{entry['sha256'][:12]}  {path}")
+    
+    if failed:
+        sys.exit(1)
+    click.echo(f"\n✓ 制品已缓存，校验和已写入 {deployer.artifacts.lock_file}")
+
+
+def _fleet_child_args(ctx: click.Context, args: List[str]) -> List[str]:
+    """沿命令组找到叶子命令，把 --config config.yaml 放在完整的子命令路径之后
+    
+    命令组本身不接受 --config；叶子命令没有 --config 选项（如 benchmark list）或已指定时不插入。
+    """
+    command, depth = ctx.find_root().command, 0
+    while isinstance(command, click.Group) and depth < len(args):
+        subcommand = command.get_command(ctx, args[depth])
+        if subcommand is None:
+            break
+        command, depth = subcommand, depth + 1
+    specified = any(arg in ('-c', '--config') or arg.startswith('--config=') for arg in args[depth:])
+    if specified or not any(param.name == 'config' for param in command.params):
+        return args
+    return [*args[:depth], '--config', 'config.yaml', *args[depth:]]
+
+
+def _fleet_global_args(ctx: click.Context) -> List[str]:
+    """转发给每个集群子进程的全局选项（模拟模式和耗时分析）；追踪文件写在各自的工作目录中"""
+    params = ctx.find_root().params
+    args = []
+    if params.get('profile'):
+        args.append('--profile')
+    if params.get('simulate'):
+        args.append('--simulate')
+        if params.get('sim_scenario'):
+            args += ['--sim-scenario', str(Path(params['sim_scenario']).resolve())]
+        if params.get('sim_time_scale') is not None:
+            args += ['--sim-time-scale', str(params['sim_time_scale'])]
+    return args
+
+
+@cli.group()
+def fleet():
+    """多集群编排：基于集群清单并行执行命令"""
+    pass
+
+
+@fleet.command('run', context_settings={'ignore_unknown_options': True, 'allow_interspersed_args': False})
+@click.option('--inventory', '-i', default='fleet.yaml', help='集群清单路径')
+@click.option('--parallelism', '-p', type=int, default=None, help='同时执行的集群数量上限')
+@click.option('--wave-size', type=int, default=None, help='按顺序每批执行的集群数量（清单未定义 waves 时生效）')
+@click.option('--halt-on-failure/--continue-on-failure', default=None, help='批次失败时是否停止后续批次')
+@click.option('--output', '-o', type=click.Choice(['text', 'json']), default='text', help='汇总结果输出格式')
+@click.argument('command_args', nargs=-1, required=True, type=click.UNPROCESSED)
+def fleet_run(inventory, parallelism, wave_size, halt_on_failure, output, command_args):
+    """
+    在清单中的所有集群上执行 CLI 命令
+    
+    \b
+    示例:
+      ./higress_deploy.py fleet run -i fleet.yaml install-all
+      ./higress_deploy.py fleet run -i fleet.yaml --wave-size 2 deploy
+      ./higress_deploy.py fleet run -i fleet.yaml status -o json
+      ./higress_deploy.py fleet run -i fleet.yaml clean higress --force
+    """
+    args = list(command_args)
+    ctx = click.get_current_context()
+    if args[0] in ('fleet', 'init'):
+        click.echo(f"✗ 不支持在 fleet 中执行 {args[0]}", err=True)
+        sys.exit(1)
+    # 子进程中无法交互确认
+    if args[0] in ('clean', 'delete') and not ({'--force', '-f'} & set(args)):
+        click.echo("✗ fleet 模式下清理资源必须指定 --force", err=True)
+        sys.exit(1)
+    
+    runner = FleetRunner(inventory, _fleet_global_args(ctx))
+    results = runner.run(_fleet_child_args(ctx, args), parallelism=parallelism, wave_size=wave_size, halt_on_failure=halt_on_failure)
+    
+    if output == 'json':
+        click.echo(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        click.echo("\n" + "="*60)
+        click.echo(f"Fleet 执行结果: {' '.join(args)}")
+        click.echo("="*60)
+        for result in results:
+            if result.get('skipped'):
+                state = '跳过'
+            else:
+                state = '成功' if result['ok'] else f"失败 (退出码 {result['exit_code']})"
+            click.echo(f"  {result['cluster']:25} 批次 {result['wave'] or '-':3} {state:16} "
+                       f"{result['duration']:7.1f}s  {result['log'] or ''}")
+    
+    if not all(result['ok'] for result in results):
+        sys.exit(1)
+
+
 @cli.command()
 @click.option('--config', '-c', default='config.yaml', help='配置文件路径')
 @click.option('--force', '-f', is_flag=True, help='强制删除，不需要确认')
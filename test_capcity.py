@@ -12,26 +12,37 @@ vpc_id = config['vpc']['vpc_id']
 
 ec2 = boto3.client('ec2', region_name=region)
 
-# 获取 AMI
+# 测试实例类型（含 Graviton arm64 实例）
+types = ['m5.large', 'm5.xlarge', 'm6i.large', 'm6i.xlarge','m6i.2xlarge','m7i.xlarge','m7i.2xlarge','m7a.xlarge',
+         'm7g.xlarge', 'm7g.2xlarge', 'c7g.xlarge']
+
+# 查询每种实例类型的 CPU 架构（按过滤条件查询，当前区域不支持的类型不会报错）
+type_archs = {}
+instance_types = ec2.describe_instance_types(Filters=[{'Name': 'instance-type', 'Values': types}])
+for item in instance_types['InstanceTypes']:
+    supported = item['ProcessorInfo']['SupportedArchitectures']
+    type_archs[item['InstanceType']] = 'arm64' if 'arm64' in supported else 'x86_64'
+
+# 按架构获取 AMI
 print("获取 AMI...")
-amis = ec2.describe_images(
-    Owners=['amazon'],
-    Filters=[
-        {'Name': 'name', 'Values': ['al2023-ami-*-x86_64']},
-        {'Name': 'state', 'Values': ['available']}
-    ]
-)
-ami_id = sorted(amis['Images'], key=lambda x: x['CreationDate'])[-1]['ImageId']
-print(f"AMI: {ami_id}\n")
+ami_ids = {}
+for arch in sorted(set(type_archs.values())):
+    amis = ec2.describe_images(
+        Owners=['amazon'],
+        Filters=[
+            {'Name': 'name', 'Values': [f'al2023-ami-*-{arch}']},
+            {'Name': 'state', 'Values': ['available']}
+        ]
+    )
+    ami_ids[arch] = sorted(amis['Images'], key=lambda x: x['CreationDate'])[-1]['ImageId']
+    print(f"AMI ({arch}): {ami_ids[arch]}")
+print()
 
 # 获取所有可用区
 azs = ec2.describe_availability_zones(
     Filters=[{'Name': 'state', 'Values': ['available']}]
 )
 
-# 测试实例类型
-types = ['m5.large', 'm5.xlarge', 'm6i.large', 'm6i.xlarge','m6i.2xlarge','m7i.xlarge','m7i.2xlarge','m7a.xlarge']
-
 print(f"区域: {region}")
 print(f"VPC: {vpc_id}\n")
 print("=" * 80)
@@ -59,9 +70,13 @@ for az_info in azs['AvailabilityZones']:
     results[az] = {'subnet_id': subnet_id, 'types': {}}
     
     for itype in types:
+        if itype not in type_archs:
+            print(f"  {itype:15} - 当前区域不支持")
+            results[az]['types'][itype] = None
+            continue
         try:
             ec2.run_instances(
-                ImageId=ami_id,
+                ImageId=ami_ids[type_archs[itype]],
                 InstanceType=itype,
                 MinCount=1,
                 MaxCount=1,
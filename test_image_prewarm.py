@@ -0,0 +1,112 @@
+"""镜像预热 DaemonSet 渲染的测试：python -m pytest -q test_image_prewarm.py"""
+import yaml
+
+from higress_deploy import CAPACITY_TYPE_LABEL, PREWARM_TOOLS_DIR, PREWARM_TOOLS_IMAGE, HigressDeployer
+
+# helm template 的输出片段：Controller 为 distroless 镜像，Gateway 带 initContainer，其余工作负载不预热
+MANIFEST = """
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: higress-controller
+spec:
+  template:
+    spec:
+      containers:
+        - name: discovery
+          image: higress-registry.example.com/higress/pilot:2.0.0
+        - name: higress-core
+          image: higress-registry.example.com/higress/higress:2.0.0
+---
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: higress-gateway
+spec:
+  template:
+    spec:
+      initContainers:
+        - name: init
+          image: higress-registry.example.com/higress/gateway:2.0.0
+      containers:
+        - name: higress-gateway
+          image: higress-registry.example.com/higress/gateway:2.0.0
+---
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: higress-console
+spec:
+  template:
+    spec:
+      containers:
+        - name: console
+          image: higress-registry.example.com/higress/console:2.0.0
+---
+apiVersion: v1
+kind: Service
+metadata:
+  name: higress-gateway
+"""
+
+
+def _deployer():
+    deployer = HigressDeployer.__new__(HigressDeployer)
+    deployer.config = {
+        'eks': {
+            'node_group_name': 'higress-nodes',
+            'instance_type': 'c6i.xlarge',
+            'desired_capacity': 2,
+            'min_size': 2,
+            'max_size': 4,
+            'volume_size': 50,
+            'additional_node_groups': [{'name': 'arm', 'instance_type': 'c7g.xlarge', 'min_size': 1, 'max_size': 2}],
+            'spot': {'enabled': True},
+        },
+        'higress': {'image_prewarm': True},
+    }
+    deployer._rendered_chart = MANIFEST
+    return deployer
+
+
+def test_chart_images_come_from_prewarm_workloads_only():
+    assert _deployer()._get_chart_images('higress-values.yaml') == [
+        'higress-registry.example.com/higress/pilot:2.0.0',
+        'higress-registry.example.com/higress/higress:2.0.0',
+        'higress-registry.example.com/higress/gateway:2.0.0',
+    ]
+
+
+def test_prewarm_containers_do_not_need_a_shell():
+    deployer = _deployer()
+    images = deployer._get_chart_images('higress-values.yaml')
+    pod_spec = deployer._render_image_prewarm_daemonset(images)['spec']['template']['spec']
+    
+    tools, *prewarm = pod_spec['initContainers']
+    assert tools['image'] == PREWARM_TOOLS_IMAGE
+    assert tools['command'] == ['cp', '/bin/busybox', f"{PREWARM_TOOLS_DIR}/true"]
+    assert [container['image'] for container in prewarm] == images
+    for container in pod_spec['initContainers']:
+        assert 'sh' not in container['command']
+        assert container['volumeMounts'] == [{'name': 'prewarm-tools', 'mountPath': PREWARM_TOOLS_DIR}]
+    for container in prewarm:
+        assert container['command'] == [f"{PREWARM_TOOLS_DIR}/true"]
+    assert pod_spec['volumes'] == [{'name': 'prewarm-tools', 'emptyDir': {'sizeLimit': '16Mi'}}]
+
+
+def test_prewarm_follows_gateway_scheduling():
+    deployer = _deployer()
+    pod_spec = deployer._render_image_prewarm_daemonset(['example/image:1'])['spec']['template']['spec']
+    terms = pod_spec['affinity']['nodeAffinity']['requiredDuringSchedulingIgnoredDuringExecution']['nodeSelectorTerms']
+    assert terms == [{'matchExpressions': [
+        {'key': 'kubernetes.io/arch', 'operator': 'In', 'values': ['amd64', 'arm64']},
+        {'key': CAPACITY_TYPE_LABEL, 'operator': 'In', 'values': ['ON_DEMAND']},
+    ]}]
+    assert pod_spec['affinity']['nodeAffinity'] == deployer._gateway_node_affinity()
+
+
+def test_rendered_manifest_has_no_yaml_aliases():
+    deployer = _deployer()
+    text = yaml.dump(deployer._render_image_prewarm_daemonset(['example/a:1', 'example/b:1']),
+                     default_flow_style=False)
+    assert '&id' not in text and '*id' not in text
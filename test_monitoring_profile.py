@@ -0,0 +1,66 @@
+"""监控档位 values 渲染检查的测试：python -m pytest -q test_monitoring_profile.py"""
+import base64
+
+import yaml
+
+from higress_deploy import HigressDeployer
+
+
+def _deployer(manifest):
+    deployer = HigressDeployer.__new__(HigressDeployer)
+    deployer.config = {'higress': {'enable_monitoring': True}, 'monitoring': {'profile': 'standard'}}
+    deployer._rendered_chart = manifest
+    return deployer
+
+
+def _templated_manifest(deployer):
+    """按 values 渲染出的 Prometheus、Loki、Promtail 配置（Loki 配置放在 Secret 中）"""
+    values = deployer._monitoring_values(deployer._monitoring_storage())
+    prometheus, loki, promtail = values['prometheus'], values['loki'], values['promtail']
+    prometheus_config = yaml.dump({
+        'global': {'scrape_interval': prometheus['scrapeInterval']},
+        'scrape_configs': [{'job_name': 'higress-gateway', 'metric_relabel_configs': prometheus['metricRelabelConfigs']}]
+    })
+    loki_config = yaml.dump({
+        'limits_config': {**loki['limits'], 'retention_period': loki['retention']}
+    })
+    promtail_config = yaml.dump({'scrape_configs': [{'job_name': 'pods', 'pipeline_stages': promtail['pipelineStages']}]})
+    return yaml.dump_all([
+        {'apiVersion': 'v1', 'kind': 'ConfigMap', 'metadata': {'name': 'higress-console-prometheus'},
+         'data': {'prometheus.yml': prometheus_config}},
+        {'apiVersion': 'apps/v1', 'kind': 'Deployment', 'metadata': {'name': 'higress-console-prometheus'},
+         'spec': {'template': {'spec': {'containers': [{'name': 'prometheus', 'args': [
+             f"--storage.tsdb.retention.time={prometheus['retention']}",
+             f"--storage.tsdb.retention.size={prometheus['retentionSize']}",
+         ]}]}}}},
+        {'apiVersion': 'v1', 'kind': 'Secret', 'metadata': {'name': 'higress-console-loki'},
+         'data': {'config.yaml': base64.b64encode(loki_config.encode()).decode()}},
+        {'apiVersion': 'v1', 'kind': 'ConfigMap', 'metadata': {'name': 'higress-console-promtail'},
+         'data': {'promtail.yaml': promtail_config}},
+    ])
+
+
+def test_retention_size_uses_binary_units():
+    deployer = _deployer('')
+    prometheus = deployer._monitoring_values(deployer._monitoring_storage())['prometheus']
+    assert prometheus['retentionSize'].endswith('GiB')
+
+
+def test_templated_settings_are_applied():
+    deployer = _deployer('')
+    deployer._rendered_chart = _templated_manifest(deployer)
+    assert deployer._check_monitoring_values('higress-values.yaml') == []
+
+
+def test_ignored_settings_are_reported():
+    deployer = _deployer('')
+    manifest = _templated_manifest(deployer).replace('sampling', 'match')
+    deployer._rendered_chart = manifest.replace('--storage.tsdb.retention.size', '--storage.tsdb.path')
+    assert deployer._check_monitoring_values('higress-values.yaml') == ['Prometheus 容量上限', '访问日志采样']
+
+
+def test_chart_without_monitoring_templates_applies_nothing():
+    deployer = _deployer(yaml.dump({'apiVersion': 'apps/v1', 'kind': 'Deployment',
+                                    'metadata': {'name': 'higress-gateway'}}))
+    labels = [label for label, _, _ in deployer._monitoring_render_checks()]
+    assert deployer._check_monitoring_values('higress-values.yaml') == labels
@@ -0,0 +1,90 @@
+"""routes sync 差异计算的测试：python -m pytest -q test_routes_sync.py"""
+import copy
+import json
+
+from higress_deploy import (
+    ROUTE_SYNC_HASH_ANNOTATION, CommandResult, HigressDeployer, _route_changed, _stamp_route
+)
+
+
+def _ingress(**metadata_extra):
+    return {
+        'apiVersion': 'networking.k8s.io/v1',
+        'kind': 'Ingress',
+        'metadata': {'name': 'route-a', 'namespace': 'default', **metadata_extra},
+        'spec': {
+            'ingressClassName': 'higress',
+            'tls': [{'hosts': ['a.example.com'], 'secretName': 'a-tls'}],
+            'rules': [{'host': 'a.example.com', 'http': {'paths': [{
+                'path': '/', 'pathType': 'Prefix',
+                'backend': {'service': {'name': 'svc-a', 'port': {'number': 80}}}
+            }]}}]
+        }
+    }
+
+
+def _live(desired):
+    """模拟 server-side apply 之后的线上对象：带服务端元数据和默认值"""
+    live = copy.deepcopy(desired)
+    live['metadata'].update({'resourceVersion': '1001', 'uid': 'abc', 'generation': 1})
+    live['status'] = {'loadBalancer': {}}
+    return live
+
+
+def test_unchanged_object_is_skipped():
+    desired = _stamp_route(_ingress(annotations={'higress.io/rewrite-target': '/'}), 'default')
+    live = _live(desired)
+    assert not _route_changed(_stamp_route(_ingress(annotations={'higress.io/rewrite-target': '/'}), 'default'), live)
+
+
+def test_removed_annotation_is_a_change():
+    live = _live(_stamp_route(_ingress(annotations={'higress.io/rewrite-target': '/'}), 'default'))
+    assert _route_changed(_stamp_route(_ingress(), 'default'), live)
+
+
+def test_removed_spec_field_is_a_change():
+    live = _live(_stamp_route(_ingress(), 'default'))
+    desired = _ingress()
+    del desired['spec']['tls']
+    assert _route_changed(_stamp_route(desired, 'default'), live)
+
+
+def test_live_drift_is_a_change():
+    desired = _stamp_route(_ingress(), 'default')
+    live = _live(desired)
+    live['spec']['rules'][0]['host'] = 'b.example.com'
+    assert _route_changed(desired, live)
+
+
+def test_object_without_hash_is_reapplied():
+    desired = _stamp_route(_ingress(), 'default')
+    live = _live(desired)
+    del live['metadata']['annotations'][ROUTE_SYNC_HASH_ANNOTATION]
+    assert _route_changed(desired, live)
+
+
+def test_prune_lists_route_set_kinds_missing_from_input(tmp_path, monkeypatch):
+    """输入为空时 prune 仍按集合标签列出默认类型和记录中的类型，删除其中的对象"""
+    (tmp_path / 'routes.yaml').write_text('', encoding='utf-8')
+    legacy = _live(_stamp_route(_ingress(), 'default'))
+    calls = []
+    
+    def run_parallel(commands, timeout=None, stream=None):
+        results = []
+        for _, argv in commands:
+            calls.append(argv)
+            if argv[:3] == ['kubectl', 'get', 'configmap']:
+                stdout = json.dumps({'data': {'resources': 'mcpbridge.networking.higress.io'}})
+            else:
+                stdout = json.dumps({'items': [legacy] if 'ingress.networking.k8s.io' in argv[2] else []})
+            results.append(CommandResult(argv, 0, stdout, '', 0.0))
+        return results
+    
+    deployer = HigressDeployer.__new__(HigressDeployer)
+    monkeypatch.setattr(deployer, '_run_parallel', run_parallel)
+    report = deployer.sync_routes([str(tmp_path / 'routes.yaml')], prune=True, dry_run=True, output='json')
+    
+    listed = [argv for argv in calls if '-l' in argv]
+    assert listed and listed[0][2] == 'ingress.networking.k8s.io,mcpbridge.networking.higress.io'
+    assert listed[0][listed[0].index('-l') + 1] == 'higress.io/route-set=default'
+    assert report['pruned'] == ['Ingress default/route-a']